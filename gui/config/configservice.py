@@ -0,0 +1,255 @@
+import os, time, weakref, threading
+from collections.abc import Mapping
+from configure import json_path, load_json, update_json
+
+'''
+    Configuration service.
+
+    config parses each configuration file (preferences.json, hwparams.json, styles.json) once per process and hands
+    out read-only views of it, e.g.
+
+        self.preferences = config.get('preferences.json')
+
+    so that reading a setting costs a dictionary lookup. A thread polls the files that were read and, when one changes
+    on disk, parses it again and pushes the new view to its subscribers; an object can also have one of its attributes
+    kept up to date with attach. Edits go through update or write, which store the file and notify the subscribers
+    at once, e.g. the temperature sensor configuration chosen in the Help tab. The acquisition process has its own
+    service, it sees the edits of the GUI when it polls the file.
+
+    A view is never modified: a new view replaces it, so that a reader holding the old one is not affected half way.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+WATCH_PERIOD = 1. # seconds between two checks of the files
+
+
+class FrozenConfig(Mapping):
+    '''
+        FrozenConfig is a read-only view of a parsed JSON object, nested objects are FrozenConfig and lists are tuples.
+
+        INPUTS
+        ----------
+        data (dict) - parsed JSON object
+    '''
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        self._data = {key: freeze(value) for key, value in data.items()}
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __setitem__(self, key, value):
+        raise TypeError('configuration views are read-only, use config.update to change {}'.format(key))
+
+    def __repr__(self):
+        return 'FrozenConfig({!r})'.format(self._data)
+
+    def __reduce__(self): # sent by the acquisition process like a dict
+        return (FrozenConfig, (self.thaw(),))
+
+    def thaw(self):
+        '''
+            RETURNS
+            ----------
+            data (dict) - modifiable deep copy of the view, e.g. to edit and write it
+        '''
+        return thaw(self)
+
+    def replace(self, **changes):
+        '''
+            RETURNS
+            ----------
+            view (FrozenConfig) - copy of the view with the top-level keys in changes replaced, the file is unchanged
+        '''
+        return FrozenConfig(dict(self.thaw(), **changes))
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return FrozenConfig(value)
+    if isinstance(value, list):
+        return tuple([freeze(item) for item in value])
+    return value
+
+def thaw(value):
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+class ConfigService:
+    '''
+        ConfigService caches the configuration files and notifies their subscribers when they change.
+
+        INPUTS
+        ----------
+        location (str) - directory of the configuration files, config in the working directory by default
+        period (float) - seconds between two checks of the files
+    '''
+    def __init__(self, location=None, period=WATCH_PERIOD):
+        self.location, self.period = location, period
+        self.mutex = threading.RLock()
+        self.files = {}       # path: {'fname', 'stamp' (mtime, size), 'view'}
+        self.subscribers = {} # path: list of callbacks
+        self.watcher = None
+
+    def getLocation(self):
+        return self.location if self.location is not None else os.getcwd()+'/config'
+
+    def getPath(self, fname):
+        return json_path(fname, self.getLocation())
+
+    def get(self, fname='preferences.json'):
+        '''
+            RETURNS
+            ----------
+            view (FrozenConfig) - content of the file, parsed the first time it is requested or after it changed
+        '''
+        entry = self.files.get(self.getPath(fname))
+        if entry is not None:
+            return entry['view']
+        with self.mutex:
+            path = self.getPath(fname)
+            if path not in self.files:
+                stamp = getStamp(path)
+                self.files[path] = {'fname': fname, 'stamp': stamp, 'view': FrozenConfig(load_json(fname, location=self.getLocation()))}
+                self.startWatcher()
+            return self.files[path]['view']
+
+    def subscribe(self, fname, callback):
+        '''
+            subscribe calls callback(view) each time fname changes. The callback runs in the thread that noticed the
+            change, Qt objects should forward it through a signal.
+
+            RETURNS
+            ----------
+            view (FrozenConfig) - current content of the file
+        '''
+        view = self.get(fname)
+        with self.mutex:
+            self.subscribers.setdefault(self.getPath(fname), []).append(callback)
+        return view
+
+    def unsubscribe(self, fname, callback):
+        with self.mutex:
+            callbacks = self.subscribers.get(self.getPath(fname), [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def attach(self, owner, attribute, fname='preferences.json'):
+        '''
+            attach sets owner.attribute to the view of fname and replaces it when the file changes, until owner is
+            garbage collected.
+
+            RETURNS
+            ----------
+            view (FrozenConfig) - current content of the file
+        '''
+        reference = weakref.ref(owner)
+        def update(view):
+            owner = reference()
+            if owner is None:
+                self.unsubscribe(fname, update)
+            else:
+                setattr(owner, attribute, view)
+        view = self.subscribe(fname, update)
+        setattr(owner, attribute, view)
+        return view
+
+    def write(self, fname, data):
+        '''
+            write stores data in fname and notifies the subscribers.
+
+            INPUTS
+            ----------
+            data (dict or FrozenConfig) - new content of the file
+        '''
+        data = thaw(data)
+        with self.mutex:
+            path = self.getPath(fname)
+            update_json(data, fname=os.path.basename(path), location=os.path.dirname(path))
+            self.files[path] = {'fname': fname, 'stamp': getStamp(path), 'view': FrozenConfig(data)}
+            self.startWatcher()
+        self.notify(path)
+
+    def update(self, fname='preferences.json', **changes):
+        '''
+            update changes top-level keys of fname, e.g. config.update('preferences.json', saverate=60)
+        '''
+        with self.mutex:
+            self.write(fname, dict(self.get(fname).thaw(), **changes))
+
+    def reload(self, fname=None):
+        '''
+            reload parses the files that changed on disk, fname only if it is given, and notifies their subscribers.
+
+            RETURNS
+            ----------
+            changed (list) - names of the files that changed
+        '''
+        changed = []
+        with self.mutex:
+            entries = [(path, entry) for path, entry in self.files.items() if (fname is None) or (path == self.getPath(fname))]
+        for path, entry in entries:
+            stamp = getStamp(path)
+            if stamp == entry['stamp']:
+                continue
+            try:
+                view = FrozenConfig(load_json(entry['fname'], location=self.getLocation()))
+            except Exception as e: # e.g. a file being written, parsed again at its next change
+                print('ConfigService::reload kept the previous {}: '.format(entry['fname']), e)
+                with self.mutex:
+                    self.files[path] = dict(entry, stamp=stamp)
+                continue
+            with self.mutex:
+                self.files[path] = dict(entry, stamp=stamp, view=view)
+            self.notify(path)
+            changed.append(entry['fname'])
+        return changed
+
+    def notify(self, path):
+        with self.mutex:
+            view, callbacks = self.files[path]['view'], list(self.subscribers.get(path, []))
+        for callback in callbacks:
+            try:
+                callback(view)
+            except Exception as e:
+                print('ConfigService::notify, a subscriber of {} raised: '.format(os.path.basename(path)), e)
+
+    def startWatcher(self):
+        if (self.watcher is None) and (self.period > 0):
+            self.watcher = threading.Thread(target=self.watch, name='ConfigService', daemon=True)
+            self.watcher.start()
+
+    def watch(self):
+        while True:
+            time.sleep(self.period)
+            try:
+                self.reload()
+            except Exception as e:
+                print('ConfigService::watch raised: ', e)
+
+
+def getStamp(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+config = ConfigService() # shared by the modules of a process
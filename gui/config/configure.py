@@ -84,6 +84,26 @@ def update_json(data, fname='preferences.json', location='config'):
         json.dump(data, f, indent=2, sort_keys=True)
 
 
+def json_path(fname='preferences.json', location='config'):
+    '''
+    json_path returns the path of a configuration file
+
+    Parameters
+    ----------
+    fname    - (str) name of the file
+    location - (str) parent directory, None if fname is a path
+
+    Returns
+    ----------
+    (str) path of the file, hwparams.json is replaced by $HTS_HWPARAMS when it is set (e.g. the instruments of emulator.py)
+    '''
+    if (fname == 'hwparams.json') and ('HTS_HWPARAMS' in os.environ):
+        return os.environ['HTS_HWPARAMS']
+    if location is None:
+        return fname
+    return location+'/{}'.format(fname)
+
+
 def load_json(fname='preferences.json', location='config'):
     '''
     read reads a json file as a dictionary
@@ -97,11 +117,10 @@ def load_json(fname='preferences.json', location='config'):
     ---------- 
     (dic) dictionary with data
     '''
+    path_to_json = json_path(fname, location)
+    if (fname == 'hwparams.json') and ('HTS_HWPARAMS' in os.environ):
+        fname, location = os.environ['HTS_HWPARAMS'], None
     try:
-        if location is not None:
-            path_to_json = location+'/{}'.format(fname)
-        else:
-            path_to_json = fname
         with open(path_to_json) as f:
             dictionary = json.load(f)
     except IOError:
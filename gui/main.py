@@ -1,4 +1,6 @@
-import sys, os, shutil
+import sys, os, time
+
+startTime = time.perf_counter()
 
 sys.path.append(os.getcwd())
 sys.path.append(os.getcwd()+'/config')
@@ -8,24 +10,81 @@ sys.path.append(os.getcwd()+'/src/gui')
 sys.path.append(os.getcwd()+'/src/gui/windows')
 sys.path.append(os.getcwd()+'/src/gui/pyqtsubclasses')
 
-def eliminateTempFiles(directory):
-	for d in [directory+'/'+d for d in os.listdir(directory) if (os.path.isdir(directory+'/'+d) and (d != '.git'))]:
-		if d.find('__pycache__') >= 0:
-			shutil.rmtree(d)
-		else:
-			eliminateTempFiles(d)
-
 from configure import configure_ports
-from guimanager import GUIManager
-from PyQt5.QtWidgets import QApplication, QSplashScreen
-from PyQt5 import QtGui, QtCore
+import argparse
 
 #configure_ports()
 
-ui = None
-app = QApplication(sys.argv)    	# create the app (event loop)
-ui = GUIManager(vb=False)              # create the GUI
-ui.show()                       	# show the GUI
-app.exec_()			     			# start the event loop
-eliminateTempFiles(os.getcwd()) 	# Remove python cache files
-sys.exit()                      	# End program
\ No newline at end of file
+if __name__ == '__main__':   		# the acquisition process (see acquisitionengine.py) re-imports this module
+	parser = argparse.ArgumentParser(description='HTS irradiation and measurement control')
+	parser.add_argument('--headless', action='store_true', help='run the acquisition daemon without GUI')
+	parser.add_argument('--address', default=None, help='Unix socket path or host:port of the acquisition daemon')
+	parser.add_argument('--attach', action='store_true', help='attach the GUI to a running acquisition daemon')
+	parser.add_argument('--dry-run', default=None, metavar='SEQUENCE', help='run a .seq file against simulated instruments and report the step durations')
+	parser.add_argument('--speed', type=float, default=60., help='virtual seconds per real second of a dry run or a rendering benchmark')
+	parser.add_argument('--emulator', action='store_true', help='serve emulated instruments, the GUI uses them when HTS_HWPARAMS is set to the printed path')
+	parser.add_argument('--no-throttle', action='store_true', help='do not limit the emulated serial ports to the baud rate of the instruments')
+	parser.add_argument('--record-io', default=None, metavar='FILE', help='record the I/O of the instruments to a trace file')
+	parser.add_argument('--replay-io', default=None, metavar='FILE', help='replay a trace file instead of talking to the instruments')
+	parser.add_argument('--no-replay-timing', action='store_true', help='answer replayed calls immediately instead of taking the recorded time')
+	parser.add_argument('--trace', default=None, metavar='FILE', help='trace the measurements and write the timeline to a Chrome trace file at exit')
+	parser.add_argument('--benchmark-acquisition', default=None, metavar='RESULTS', help='benchmark the acquisition loops against emulated instruments and write the results (JSON)')
+	parser.add_argument('--benchmark-duration', type=float, default=30., help='longest duration of each benchmark phase in seconds')
+	parser.add_argument('--latency-scale', type=float, default=1., help='factor applied to the latencies of the emulated instruments')
+	parser.add_argument('--baseline', default=None, metavar='RESULTS', help='previous benchmark results to compare with')
+	parser.add_argument('--benchmark-rendering', default=None, nargs=2, metavar=('SESSION', 'RESULTS'), help='replay a saved session through the plots and write the frame times (JSON)')
+	parser.add_argument('--profile-startup', default=None, nargs='?', const='', metavar='FILE', help='time the imports and the construction of the widgets until the window is shown, and write the report (JSON) to FILE if given')
+	parser.add_argument('--benchmark-window', type=float, default=600., help='session seconds per window of the rendering benchmark')
+	args, qtArgs = parser.parse_known_args()
+
+	if args.record_io is not None:		# set before the devices are imported, the acquisition process inherits them
+		os.environ['HTS_IO_RECORD'] = os.path.abspath(args.record_io)
+	if args.trace is not None:
+		os.environ['HTS_TRACE'] = os.path.abspath(args.trace)
+	if args.replay_io is not None:
+		os.environ['HTS_IO_REPLAY'] = os.path.abspath(args.replay_io)
+		os.environ['HTS_IO_REPLAY_TIMING'] = '0' if args.no_replay_timing else '1'
+
+	if args.emulator:
+		from emulator import runEmulator
+		runEmulator(throttle=not args.no_throttle)
+		sys.exit()
+
+	if args.benchmark_acquisition is not None:
+		from acquisitionbenchmark import runBenchmark
+		results = runBenchmark(args.benchmark_acquisition, duration=args.benchmark_duration, latencyScale=args.latency_scale, throttle=not args.no_throttle, baseline=args.baseline)
+		sys.exit(1 if (results.get('error') or results['failedTargets'] or results['regressions']) else 0)
+
+	if args.benchmark_rendering is not None:
+		from renderingbenchmark import runRenderingBenchmark
+		runRenderingBenchmark(*args.benchmark_rendering, speed=args.speed, window=args.benchmark_window)
+		sys.exit()
+
+	if args.dry_run is not None:
+		from simulation import dryRun
+		dryRun(args.dry_run, speed=args.speed)
+		sys.exit()
+
+	if args.headless:
+		from acquisitionengine import runHeadless, DEFAULT_ADDRESS
+		sys.exit(0 if runHeadless(address=args.address or DEFAULT_ADDRESS) else 1)
+
+	import startupprofiler
+	if args.profile_startup is not None:
+		startupprofiler.enable(startTime)
+
+	from guimanager import GUIManager
+	from acquisitionengine import DEFAULT_ADDRESS
+	from PyQt5.QtWidgets import QApplication, QSplashScreen
+	from PyQt5 import QtGui, QtCore
+	startupprofiler.mark('imports')
+
+	ui = None
+	app = QApplication(sys.argv[:1]+qtArgs)    	# create the app (event loop)
+	ui = GUIManager(attach=(args.address or DEFAULT_ADDRESS) if args.attach else None, vb=False)              # create the GUI
+	startupprofiler.mark('main window built')
+	ui.show()                       	# show the GUI
+	if startupprofiler.isEnabled():		# the first event loop iteration runs once the window is shown
+		QtCore.QTimer.singleShot(0, lambda: (startupprofiler.mark('time to window'), startupprofiler.disable(), startupprofiler.report(args.profile_startup or None)))
+	app.exec_()			     			# start the event loop
+	sys.exit()                      	# End program
\ No newline at end of file
@@ -0,0 +1,437 @@
+import os, sys, json, time, platform, datetime, tempfile, threading, collections
+import numpy as np
+
+from PyQt5.QtCore import QCoreApplication, QMetaObject, Qt
+
+from configservice import config
+from executors import Executors
+from emulator import InstrumentServer, LATENCIES
+from simulation import SimulatedMultimeter
+from taskmanager import TaskManager
+
+'''
+    Acquisition benchmark.
+
+    runBenchmark drives TaskManager.measureIc, measureTc and measureVt, with the telemetry timers running, against
+    the instrument emulator (see emulator.py), so that the real device classes, locks and thread pools are exercised
+    with the latency of each instrument scaled by latencyScale. Each measurement is a phase that runs for at most
+    duration seconds, after an idle phase in which only the telemetry timers run. For each phase it reports:
+
+        points        - number of points, points per second and the percentiles of the time between points
+        timers        - per telemetry timer, the percentiles of the deviation of the period from the preference
+                        (jitter, including the wait in the telemetry pool) and of the time spent in the update
+        locks         - per instrument, the percentiles of the time Device.read and write waited for the mutex,
+                        and the number of tryLock that gave up
+        threads       - CPU seconds and CPU fraction per thread (Linux only)
+        executors     - queue statistics of the thread pools, see Executors.getStats
+        cancelLatency - time between the stop and the end of the measurement
+
+    The results are written as JSON. TARGETS holds the throughput and latency targets for the default latencies;
+    results are also compared with a previous result file (baseline) and a metric that degrades by more than the
+    tolerance is reported as a regression. A phase that does not run or records no point, a missing metric, a missed
+    target, a regression or an exception make main.py exit with status 1.
+
+        python main.py --benchmark-acquisition results.json [--baseline previous.json]
+
+    The DMM6500 is not emulated (USBTMC), the transport current is read from a SimulatedMultimeter instead.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+MEASUREMENTS = { # phase: (TaskManager method, arguments), the measurements run as in a sequence (no per-point prints)
+    'Ic': ('measureIc', {'rampStart': 0., 'iStep': 1., 'maxV': 1e-5, 'tag': 'benchmark', 'vb': False}),
+    'Tc': ('measureTc', {'startT': 20., 'rampRate': 1., 'stopT': 95., 'transportCurrent': 1e-3, 'tag': 'benchmark'}),
+    'Vt': ('measureVt', {'maxV': 0., 'tag': 'benchmark'}),
+}
+TIMERS = { # telemetry update: preference holding its period in seconds
+    'updateTcReadings': 'sampling_period_tc',
+    'updatePmReadings': 'sampling_period_pm',
+    'updateMcReadings': 'sampling_period_mc',
+    'trackVoltageOffset': 'offset_tracking_period',
+}
+TARGETS = { # (phase, metric path, 'min' or 'max', value) for the default latencies
+    ('Ic', 'points.perSecond', 'min', 1.),
+    ('Tc', 'points.perSecond', 'min', 1.),
+    ('Vt', 'points.perSecond', 'min', 5.),
+    ('Ic', 'points.interval.p99', 'max', 1.),
+    ('Tc', 'points.interval.p99', 'max', 1.),
+    ('Vt', 'points.interval.p99', 'max', .25),
+    ('Idle', 'timers.updateTcReadings.jitter.p99', 'max', .2),
+    ('Ic', 'timers.updateTcReadings.jitter.p99', 'max', .5),
+}
+HIGHER_IS_BETTER = ('perSecond',)
+
+
+def percentiles(values):
+    '''
+        RETURNS
+        ----------
+        summary (dict) - count, mean, p50, p90, p99 and max of values, NaN when there are none
+    '''
+    values = np.asarray(values, dtype=float)
+    if not values.size:
+        return {'count': 0, 'mean': np.nan, 'p50': np.nan, 'p90': np.nan, 'p99': np.nan, 'max': np.nan}
+    return {'count': int(values.size), 'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)), 'p90': float(np.percentile(values, 90)),
+            'p99': float(np.percentile(values, 99)), 'max': float(values.max())}
+
+def getMetric(phase, path):
+    value = phase
+    for key in path.split('.'):
+        value = value.get(key, {}) if isinstance(value, dict) else {}
+    return value if isinstance(value, (int, float)) else None
+
+
+class TimedMutex:
+    '''
+        TimedMutex stands for the QMutex of a device and records how long each lock and tryLock waited.
+    '''
+    def __init__(self, mutex):
+        self.mutex = mutex
+        self.waits, self.failed = [], 0
+
+    def lock(self):
+        start = time.perf_counter()
+        self.mutex.lock()
+        self.waits.append(time.perf_counter()-start)
+
+    def tryLock(self, timeout=0):
+        start = time.perf_counter()
+        locked = self.mutex.tryLock(timeout)
+        if locked:
+            self.waits.append(time.perf_counter()-start)
+        else:
+            self.failed += 1
+        return locked
+
+    def unlock(self):
+        self.mutex.unlock()
+
+    def reset(self):
+        self.waits, self.failed = [], 0
+
+
+class PointList(list):
+    '''
+        PointList is the datapoints list of a measurement, it records the time of each point appended.
+    '''
+    def __init__(self, values, times):
+        super(PointList, self).__init__(values)
+        self.times = times
+
+    def append(self, value):
+        super(PointList, self).append(value)
+        self.times.append(time.perf_counter())
+
+
+def getThreadCpuTimes():
+    '''
+        RETURNS
+        ----------
+        times (dict) - {thread id: (name, CPU seconds)} of the threads of this process, empty where /proc is missing
+    '''
+    names = {thread.native_id: thread.name for thread in threading.enumerate()}
+    tick, times = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100, {}
+    try:
+        tids = os.listdir('/proc/self/task')
+    except OSError:
+        return times
+    for tid in tids:
+        try:
+            with open('/proc/self/task/{}/stat'.format(tid)) as f:
+                stat = f.read()
+        except OSError:
+            continue
+        comm, fields = stat[stat.index('(')+1:stat.rindex(')')], stat[stat.rindex(')')+2:].split()
+        times[int(tid)] = (names.get(int(tid), comm), (int(fields[11])+int(fields[12]))/tick) # utime and stime
+    return times
+
+
+class BenchmarkTaskManager(TaskManager):
+    '''
+        BenchmarkTaskManager records the time of the points of the measurements and of the telemetry updates.
+        The temperature stabilization before Tc is skipped, the benchmark is about the acquisition loop.
+    '''
+    def __init__(self, *args, **kwargs):
+        self.pointTimes, self.timerTicks = [], collections.defaultdict(list)
+        super(BenchmarkTaskManager, self).__init__(*args, **kwargs)
+
+    @property
+    def datapoints(self):
+        return self._datapoints
+
+    @datapoints.setter
+    def datapoints(self, values):
+        self._datapoints = PointList(values, self.pointTimes)
+
+    @property
+    def vtStream(self):
+        return self._vtStream
+
+    @vtStream.setter
+    def vtStream(self, stream):
+        if stream is not None:
+            append = stream.append
+            def timedAppend(datapoint):
+                append(datapoint)
+                self.pointTimes.append(time.perf_counter())
+            stream.append = timedAppend
+        self._vtStream = stream
+
+    def stabilizeTemperature(self, *args, **kwargs):
+        pass
+
+    def timeUpdate(self, name, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return getattr(super(BenchmarkTaskManager, self), name)(*args, **kwargs)
+        finally:
+            self.timerTicks[name].append((start, time.perf_counter()-start))
+
+    def updateTcReadings(self):
+        return self.timeUpdate('updateTcReadings')
+
+    def updatePmReadings(self, ln2Measurements=False):
+        return self.timeUpdate('updatePmReadings', ln2Measurements)
+
+    def updateMcReadings(self):
+        return self.timeUpdate('updateMcReadings')
+
+    def trackVoltageOffset(self):
+        return self.timeUpdate('trackVoltageOffset')
+
+    def resetProbes(self):
+        del self.pointTimes[:]
+        self.timerTicks.clear()
+
+
+class AcquisitionBenchmark:
+    '''
+        AcquisitionBenchmark runs the phases of the benchmark against a running InstrumentServer.
+
+        INPUTS
+        ----------
+        server (InstrumentServer) - emulated instruments, started
+        measurements (list) - keys of MEASUREMENTS to run
+        duration (float) - longest duration of each phase in seconds
+    '''
+    def __init__(self, server, measurements=('Ic', 'Tc', 'Vt'), duration=30.):
+        from hardwaremanager import HardwareManager
+        from datamanager import DataManager
+
+        self.measurements, self.duration = measurements, duration
+        self.preferences = config.get('preferences.json')
+        self.folder = tempfile.mkdtemp(prefix='hts-benchmark-')
+        self.executors = Executors(self.preferences)
+        self.hm = HardwareManager()
+        self.hm.dmm = SimulatedMultimeter(server.sample)
+        self.mutexes = {}
+        for attribute, device in sorted(vars(self.hm).items()):
+            if hasattr(device, 'mutex') and hasattr(device, 'settings') and not isinstance(device.mutex, TimedMutex):
+                device.mutex = TimedMutex(device.mutex)
+                self.mutexes[device.settings['name']] = device.mutex
+        self.dm = DataManager(self.executors, saveFolder=self.folder+'/')
+        self.tm = BenchmarkTaskManager(self.dm, self.hm, self.executors)
+        self.tm.sequenceRunning = True
+
+    def run(self):
+        '''
+            RETURNS
+            ----------
+            phases (dict) - results of each phase, see runPhase
+        '''
+        phases = {'Idle': self.runPhase('Idle')}
+        for name in self.measurements:
+            phases[name] = self.runPhase(name)
+        return phases
+
+    def runPhase(self, name):
+        self.tm.resetProbes()
+        for mutex in self.mutexes.values():
+            mutex.reset()
+        cpu, start = getThreadCpuTimes(), time.perf_counter()
+
+        if name == 'Idle':
+            time.sleep(self.duration)
+            completed = True
+        else:
+            method, arguments = MEASUREMENTS[name]
+            stop = threading.Timer(self.duration, self.tm.stopAcquiring)
+            stop.start()
+            getattr(self.tm, method)(**arguments)
+            completed = stop.is_alive() # the measurement ended before it was stopped
+            stop.cancel()
+        elapsed = time.perf_counter()-start
+        print('Benchmark {}: {:.1f} s, {} points'.format(name, elapsed, len(self.tm.pointTimes)))
+
+        points = list(self.tm.pointTimes)
+        results = {
+            'duration': elapsed,
+            'completed': completed,
+            'points': {
+                'count': len(points),
+                'perSecond': (len(points)-1)/(points[-1]-points[0]) if len(points) > 1 else np.nan,
+                'interval': percentiles(np.diff(points)),
+            },
+            'timers': self.getTimerStats(),
+            'locks': {device: dict(percentiles(mutex.waits), failed=mutex.failed) for device, mutex in self.mutexes.items()},
+            'threads': self.getThreadStats(cpu, getThreadCpuTimes(), elapsed),
+            'executors': self.executors.getStats(),
+        }
+        if name != 'Idle':
+            latencies = self.tm.cancelLatency.latencies.get(MEASUREMENTS[name][0][0].upper()+MEASUREMENTS[name][0][1:])
+            results['cancelLatency'] = float(latencies[-1]) if (not completed) and latencies else np.nan
+        return results
+
+    def getTimerStats(self):
+        stats = {}
+        for name, preference in TIMERS.items():
+            ticks = self.tm.timerTicks.get(name, [])
+            starts, durations = [start for start, duration in ticks], [duration for start, duration in ticks]
+            stats[name] = {
+                'period': self.preferences[preference],
+                'jitter': percentiles(np.abs(np.diff(starts)-self.preferences[preference])),
+                'update': percentiles(durations),
+            }
+        return stats
+
+    @staticmethod
+    def getThreadStats(before, after, elapsed):
+        stats = collections.defaultdict(float)
+        for tid, (name, seconds) in after.items():
+            stats[name] += seconds - before.get(tid, (name, 0.))[1]
+        return {name: {'cpu': seconds, 'fraction': seconds/elapsed} for name, seconds in sorted(stats.items())}
+
+    def close(self):
+        self.tm.stopReadings()
+        self.executors.waitForDone(5000)
+
+
+def checkTargets(phases, measurements=('Ic', 'Tc', 'Vt'), targets=TARGETS, latencyScale=1.):
+    '''
+        checkTargets fails a phase that is missing or recorded no point, and a target whose metric is missing or NaN.
+        With slower instruments (latencyScale > 1) the targets are relaxed in proportion, with faster ones they are
+        kept as they are.
+
+        INPUTS
+        ----------
+        phases (dict) - results of each phase, see AcquisitionBenchmark.run
+        measurements (list) - phases that were run besides Idle
+
+        RETURNS
+        ----------
+        failures (list) - description of each target that is not met
+    '''
+    scale, failures = max(latencyScale, 1.), []
+    for phase in ['Idle']+list(measurements):
+        if phase not in phases:
+            failures.append('{} did not run'.format(phase))
+        elif (phase != 'Idle') and not getMetric(phases[phase], 'points.count'):
+            failures.append('{} recorded no point'.format(phase))
+
+    for phase, path, kind, target in sorted(targets):
+        if phase not in phases:
+            continue
+        value = getMetric(phases[phase], path)
+        target = target/scale if kind == 'min' else target*scale
+        if (value is None) or np.isnan(value):
+            failures.append('{} {} is missing, target {} {:g}'.format(phase, path, kind, target))
+        elif ((kind == 'min') and (value < target)) or ((kind == 'max') and (value > target)):
+            failures.append('{} {} = {:.4g}, target {} {:g}'.format(phase, path, value, kind, target))
+    return failures
+
+def compareWithBaseline(phases, baseline, tolerance=.2):
+    '''
+        compareWithBaseline compares the throughput and the latencies of two results.
+
+        INPUTS
+        ----------
+        phases, baseline (dict) - phases of the new and of the previous results
+        tolerance (float) - relative degradation reported as a regression
+
+        RETURNS
+        ----------
+        regressions (list) - description of each metric that degraded by more than tolerance
+    '''
+    paths = ['points.perSecond', 'points.interval.p50', 'points.interval.p99'] + ['timers.{}.jitter.p99'.format(name) for name in TIMERS]
+    regressions = []
+    for phase in sorted(set(phases) & set(baseline)):
+        for path in paths + ['locks.{}.p99'.format(device) for device in phases[phase].get('locks', {})]:
+            new, old = getMetric(phases[phase], path), getMetric(baseline[phase], path)
+            if (new is None) or (old is None) or np.isnan(new) or np.isnan(old) or (old == 0):
+                continue
+            change = (new-old)/abs(old)
+            if path.split('.')[-1] in HIGHER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                regressions.append('{} {}: {:.4g} -> {:.4g} ({:+.0%})'.format(phase, path, old, new, (new-old)/abs(old)))
+    return regressions
+
+
+def runBenchmark(output=None, measurements=('Ic', 'Tc', 'Vt'), duration=30., latencyScale=1., throttle=True, baseline=None, tolerance=.2):
+    '''
+        runBenchmark starts the instrument emulator, runs the benchmark and writes the results.
+
+        INPUTS
+        ----------
+        output (str) - JSON file of the results, not written if None
+        measurements (list) - keys of MEASUREMENTS to run
+        duration (float) - longest duration of each phase in seconds
+        latencyScale (float) - factor applied to the latencies of the emulated instruments
+        throttle (bool) - limit the emulated serial ports to the baud rate of the instruments
+        baseline (str) - JSON file of previous results to compare with
+        tolerance (float) - relative degradation reported as a regression
+
+        RETURNS
+        ----------
+        results (dict) - configuration, phases, failed targets, regressions and the error that stopped the run, if any
+    '''
+    latencies = {key: latency*latencyScale for key, latency in LATENCIES.items()}
+    server = InstrumentServer(latencies=latencies, throttle=throttle)
+    server.start()
+    os.environ['HTS_HWPARAMS'] = server.writeHardwareParameters()
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+
+    benchmark = AcquisitionBenchmark(server, measurements=measurements, duration=duration)
+    results = {
+        'date': str(datetime.datetime.now()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latencies': latencies,
+        'throttle': throttle,
+        'duration': duration,
+    }
+
+    def run():
+        try:
+            results['phases'] = benchmark.run()
+        except Exception as e:
+            results['error'] = '{}: {}'.format(type(e).__name__, e)
+            print('runBenchmark raised: ', e)
+        finally:
+            QMetaObject.invokeMethod(app, 'quit', Qt.QueuedConnection)
+    benchmark.tm.startReadings() # the timers belong to the thread of the event loop
+    threading.Thread(target=run, name='Benchmark', daemon=True).start()
+    app.exec_()
+    benchmark.close()
+    server.stop()
+
+    phases = results.get('phases', {})
+    results['failedTargets'] = checkTargets(phases, measurements=measurements, latencyScale=latencyScale)
+    results['regressions'] = []
+    if baseline is not None:
+        with open(baseline, 'r') as f:
+            results['regressions'] = compareWithBaseline(phases, json.load(f).get('phases', {}), tolerance=tolerance)
+
+    for name, phase in phases.items():
+        print('{:5s} {:8.2f} points/s  interval p50 {:.3f} s p99 {:.3f} s  tc jitter p99 {:.3f} s'.format(name, phase['points']['perSecond'], phase['points']['interval']['p50'],
+              phase['points']['interval']['p99'], phase['timers']['updateTcReadings']['jitter']['p99']))
+    for line in results['failedTargets']:
+        print('Target missed: '+line)
+    for line in results['regressions']:
+        print('Regression: '+line)
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2, default=float)
+        print('Results written to {}'.format(output))
+    return results
@@ -0,0 +1,596 @@
+import os, sys, time, pickle, socket, datetime, ipaddress, threading, itertools, collections, multiprocessing
+from multiprocessing.connection import Listener, Client
+import numpy as np
+
+from PyQt5.QtCore import QObject, QCoreApplication, QThreadPool, QTimer, pyqtSignal, pyqtSlot
+
+from task import Task
+from executors import Executors
+from configservice import config
+from ringbuffer import SharedRingBuffer
+from metrics import startExporter
+
+'''
+    Out-of-process acquisition.
+
+    The AcquisitionHost owns the HardwareManager, DataManager and TaskManager in a process of its own, so
+    that instrument I/O and measurement loops never wait on the GUI interpreter lock. Readings are published
+    through SharedRingBuffer blocks and everything else goes through a command channel
+    (a multiprocessing Connection) carrying call/getattr/setattr requests and forwarded Qt signals.
+
+    The host either runs as a child of the GUI (AcquisitionClient.spawn) or as a headless daemon listening on
+    a local socket (runHeadless, started with main.py --headless). Any number of clients may attach to a daemon:
+    the GUI through AcquisitionClient, scripts and notebooks through EngineConnection.
+
+    A request may run any method of the managers, so a daemon only listens on loopback addresses and generates
+    a random authentication key when it starts. The key is written to a file that only its user can read
+    (see getKeyPath), where the clients of the same user find it.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+CALLABLE, REMOTE_OBJECT = '__callable__', '__remote_object__'
+MAIN_THREAD_CALLS = ('startReadings', 'stopReadings', 'initializeHardware') # create or start QTimers owned by the host event loop
+ENVIRONMENT_COLUMNS = {
+    'tc': ['time_s', 'setpt_K', 'sampleT_K', 'targetT_K', 'holderT_K', 'spareT_K', 'heaterPower_W'],
+    'pm': ['time_s', 'pressure_torr'],
+    'mc': ['time_s', 'setpoint_field', 'field_T'],
+}
+SIGNAL_CODES = {'tc': 0, 'pm': 1, 'mc': 2}
+DEFAULT_ADDRESS = '/tmp/hts-acquisition.sock'
+
+
+KEY_DIRECTORY = os.path.join(os.path.expanduser('~'), '.hts-acquisition')
+
+
+def getKeyPath(address):
+    '''
+        RETURNS
+        ----------
+        path (str) - file holding the authentication key of the daemon listening on address
+    '''
+    name = ''.join([c if c.isalnum() else '_' for c in address.strip('/')])
+    return os.path.join(KEY_DIRECTORY, name+'.key')
+
+def createAuthKey(address):
+    '''
+        createAuthKey generates the key of a daemon and stores it in a file readable by its user only. The
+        HTS_DAEMON_AUTHKEY environment variable, when set, is used instead of a random key.
+
+        RETURNS
+        ----------
+        key (bytes) - authentication key
+    '''
+    key = os.environ['HTS_DAEMON_AUTHKEY'].encode() if os.environ.get('HTS_DAEMON_AUTHKEY') else os.urandom(32)
+    os.makedirs(KEY_DIRECTORY, mode=0o700, exist_ok=True)
+    os.chmod(KEY_DIRECTORY, 0o700)
+    path = getKeyPath(address)
+    if os.path.lexists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key.hex().encode())
+    return key
+
+def getAuthKey(address):
+    '''
+        RETURNS
+        ----------
+        key (bytes) - authentication key of the daemon listening on address, from HTS_DAEMON_AUTHKEY or its key file
+    '''
+    if os.environ.get('HTS_DAEMON_AUTHKEY'):
+        return os.environ['HTS_DAEMON_AUTHKEY'].encode()
+    path = getKeyPath(address)
+    try:
+        with open(path, 'rb') as f:
+            return bytes.fromhex(f.read().decode())
+    except (OSError, ValueError) as e:
+        raise PermissionError('no authentication key for the acquisition daemon on {} ({}), is it running under this user?'.format(address, e))
+
+def parseAddress(address):
+    '''
+        parseAddress checks that a 'host:port' address is a loopback address, since the command channel must not
+        be reachable from other machines.
+
+        RETURNS
+        ----------
+        address (str or tuple) - Unix socket path, or (host, port) of a TCP socket
+        family (str) - 'AF_UNIX' or 'AF_INET'
+    '''
+    if ':' not in address:
+        return address, 'AF_UNIX'
+    hostname, port = address.rsplit(':', 1)
+    try:
+        loopback = ipaddress.ip_address(socket.gethostbyname(hostname)).is_loopback
+    except (OSError, ValueError):
+        loopback = False
+    if not loopback:
+        raise ValueError('{} is not a loopback address, the acquisition daemon only accepts local clients'.format(address))
+    return (hostname, int(port)), 'AF_INET'
+
+
+class AcquisitionHost(QObject):
+    '''
+        AcquisitionHost serves the acquisition managers to its clients.
+
+        INPUTS
+        ----------
+        slots (int) - number of rows in each ring buffer
+        publishPeriod (float) - period in seconds at which new transport datapoints are copied to the ring buffers
+        logEvents (bool) - write the log signals to the session logfile, for daemons which keep running without a GUI
+    '''
+    mainThreadCall = pyqtSignal(object, object)
+    finished = pyqtSignal()
+
+    def __init__(self, slots=65536, publishPeriod=0.05, logEvents=False, parent=None, vb=False):
+        super(AcquisitionHost, self).__init__(parent)
+        from hardwaremanager import HardwareManager
+        from datamanager import DataManager
+        from taskmanager import TaskManager
+
+        self.vb, self.publishPeriod, self.logEvents = vb, publishPeriod, logEvents
+        self.connections, self.sendLock, self.running = [], threading.Lock(), True
+        self.startTime = time.time()
+        preferences = config.get('preferences.json')
+        self.executors = Executors(preferences)
+        self.requestPool = QThreadPool() # requests get their own pool so that a running measurement cannot starve them
+        self.requestPool.setMaxThreadCount(16)
+        self.hm = HardwareManager(vb=vb)
+        self.dm = DataManager(self.executors, vb=vb)
+        self.tm = TaskManager(self.dm, self.hm, self.executors, vb=vb)
+        self.targets = {'host': self, 'hm': self.hm, 'dm': self.dm, 'tm': self.tm}
+        self.metrics = startExporter(self.dm, self.hm, self.tm, self.executors, preferences)
+
+        self.rings = {
+            'environment': SharedRingBuffer(slots=slots, width=8),
+            'transport': SharedRingBuffer(slots=slots, width=12),
+            'vt': SharedRingBuffer(slots=slots, width=8),
+        }
+        self.dm.addSampleListener(self.publishSample)
+        self.tm.plotTimer.timeout.disconnect() # plots are rendered by the clients from the environment ring buffer
+
+        for name in ('hm', 'dm', 'tm'):
+            self.targets[name].log_signal.connect(lambda what, comment, name=name: self.forwardLog(name, what, comment))
+        self.tm.plotSignal.connect(lambda x, y, label: self.broadcast(('signal', 'tm', 'plotSignal', (x, y, label))))
+        self.executors.log_signal.connect(lambda what, comment: self.forwardLog('tm', what, comment))
+        self.mainThreadCall.connect(self.execute)
+        self.finished.connect(self.close)
+
+    def getRingNames(self):
+        return {key: ring.name for key, ring in self.rings.items()}
+
+    def getStatus(self):
+        '''
+            RETURNS
+            ----------
+            status (dict) - state of the acquisition and last environment readings, safe to send to any client
+        '''
+        status = {
+            'uptime_s': time.time()-self.startTime,
+            'clients': len(self.connections),
+            'acquiring': self.tm.acquiring,
+            'annealing': self.tm.annealing,
+            'sequenceRunning': self.tm.sequenceRunning,
+            'datapoints': len(self.tm.datapoints),
+            'save_directory': self.dm.save_directory,
+        }
+        for key in ENVIRONMENT_COLUMNS:
+            status[key] = None
+        for row in self.rings['environment'].readAll()[::-1]:
+            for key, code in SIGNAL_CODES.items():
+                if (row[0] == code) and (status[key] is None):
+                    status[key] = dict(zip(ENVIRONMENT_COLUMNS[key], row[1:].tolist()))
+        return status
+
+    def send(self, conn, message):
+        try:
+            with self.sendLock:
+                conn.send(message)
+        except (OSError, EOFError, BrokenPipeError) as e:
+            print('AcquisitionHost::send raised: ', e)
+
+    def broadcast(self, message):
+        for conn in list(self.connections):
+            self.send(conn, message)
+
+    def forwardLog(self, target, what, comment):
+        if self.logEvents:
+            self.dm.log_event(str(datetime.datetime.now()), what, comment.split('/')[0])
+        self.broadcast(('signal', target, 'log_signal', (what, comment)))
+
+    def publishSample(self, signal, values):
+        self.rings['environment'].write([SIGNAL_CODES[signal]]+[values[c] for c in ENVIRONMENT_COLUMNS[signal]])
+
+    def publishDatapoints(self):
+        '''
+            publishDatapoints copies the transport datapoints appended by the TaskManager since the last call to the
+            transport ring buffer, and the points stored by the Vt stream to the vt ring buffer.
+        '''
+        datapoints, published, stream, streamed = None, 0, None, 0
+        while self.running:
+            try:
+                if (self.tm.datapoints is not datapoints) or (len(self.tm.datapoints) < published):
+                    datapoints, published = self.tm.datapoints, 0
+                    self.rings['transport'].reset()
+                new = datapoints[published:]
+                if new:
+                    if published == 0:
+                        self.rings['transport'].reset(columns=len(new[0]))
+                    for datapoint in new:
+                        self.rings['transport'].write(datapoint)
+                    published += len(new)
+
+                if self.tm.vtStream is not stream:
+                    stream, streamed = self.tm.vtStream, 0
+                    self.rings['vt'].reset()
+                if stream is not None and stream.count > streamed:
+                    tail = stream.getTail()
+                    for datapoint in tail[max(len(tail)-(stream.count-streamed), 0):]:
+                        self.rings['vt'].write(datapoint)
+                    streamed = stream.count
+            except Exception as e:
+                print('AcquisitionHost::publishDatapoints raised: ', e)
+            time.sleep(self.publishPeriod)
+
+    def resolve(self, target):
+        obj = self.targets[target.split('.')[0]]
+        for attribute in target.split('.')[1:]:
+            obj = getattr(obj, attribute)
+        return obj
+
+    @pyqtSlot(object, object)
+    def execute(self, message, conn):
+        '''
+            execute runs one request and sends the reply to the connection it came from.
+            Requests are ('call', id, target, name, args, kwargs), ('getattr', id, target, name) or ('setattr', id, target, name, value).
+        '''
+        kind, requestId, target, name = message[:4]
+        try:
+            obj = self.resolve(target)
+            if kind == 'call':
+                result = getattr(obj, name)(*message[4], **message[5])
+            elif kind == 'getattr':
+                result = getattr(obj, name)
+                if callable(result):
+                    result = CALLABLE
+                else:
+                    try:
+                        pickle.dumps(result)
+                    except Exception:
+                        result = REMOTE_OBJECT
+            elif kind == 'setattr':
+                result = setattr(obj, name, message[4])
+            try:
+                pickle.dumps(result)
+            except Exception:
+                result = None
+            self.send(conn, ('result', requestId, result))
+        except Exception as e:
+            self.send(conn, ('error', requestId, '{}: {}'.format(type(e).__name__, e)))
+
+    def serve(self, conn):
+        '''
+            serve answers the requests of one client until it disconnects or requests a shutdown.
+
+            RETURNS
+            ----------
+            shutdown (bool) - True when the client asked the host to stop
+        '''
+        self.send(conn, ('hello', self.getRingNames(), {'logEvents': self.logEvents}))
+        self.connections.append(conn)
+        try:
+            while self.running:
+                message = conn.recv()
+                if message[0] == 'shutdown':
+                    return True
+                elif message[0] == 'call' and message[3] in MAIN_THREAD_CALLS:
+                    self.mainThreadCall.emit(message, conn)
+                else:
+                    self.requestPool.start(Task(self.execute, message, conn))
+        except (EOFError, OSError):
+            print('AcquisitionHost::serve client disconnected')
+        finally:
+            self.connections.remove(conn)
+        return False
+
+    @pyqtSlot()
+    def close(self):
+        '''
+            close stops the measurements and timers and releases the ring buffers. The managers are expected to have
+            been shut down by the client (see GUIManager.closeEvent).
+        '''
+        self.running = False
+        self.tm.stopSequence()
+        if hasattr(self.tm, 'ln2Measurements'): # set by startReadings
+            self.tm.stopReadings()
+        if self.metrics is not None:
+            self.metrics.stop()
+        self.executors.waitForDone(10000)
+        self.requestPool.waitForDone(10000)
+        for ring in self.rings.values():
+            ring.close()
+        QCoreApplication.quit()
+
+
+def runAcquisitionHost(conn, vb=False):
+    '''
+        Entry point of the acquisition process started by AcquisitionClient.spawn.
+    '''
+    app = QCoreApplication(sys.argv[:1])
+    host = AcquisitionHost(vb=vb)
+    threading.Thread(target=host.publishDatapoints, daemon=True).start()
+
+    def serveClient():
+        host.serve(conn)
+        host.finished.emit()
+    threading.Thread(target=serveClient, daemon=True).start()
+    app.exec_()
+
+
+def runHeadless(address=DEFAULT_ADDRESS, vb=False):
+    '''
+        runHeadless runs the acquisition managers without any widget and accepts clients on a local socket until
+        one of them requests a shutdown. address is a Unix socket path, or 'host:port' for a TCP socket on localhost.
+        Clients must use the key stored by createAuthKey. The daemon refuses to start when the address is not a
+        loopback address or the key cannot be stored.
+
+        RETURNS
+        ----------
+        started (bool) - False when the daemon refused to start
+    '''
+    try:
+        location, family = parseAddress(address)
+        key = createAuthKey(address)
+        if (family == 'AF_UNIX') and os.path.exists(address):
+            os.remove(address)
+        umask = os.umask(0o077) # the socket file is created by bind, it must never be accessible to other users
+        try:
+            listener = Listener(location, family=family, authkey=key)
+        finally:
+            os.umask(umask)
+    except Exception as e:
+        print('runHeadless: the acquisition daemon did not start: ', e)
+        return False
+
+    app = QCoreApplication(sys.argv[:1])
+    host = AcquisitionHost(logEvents=True, vb=vb)
+    threading.Thread(target=host.publishDatapoints, daemon=True).start()
+    print('Acquisition daemon listening on {}'.format(address))
+
+    def serveClient(conn):
+        if host.serve(conn):
+            host.finished.emit()
+
+    def accept():
+        while host.running:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print('runHeadless: connection refused: ', e)
+                continue
+            threading.Thread(target=serveClient, args=(conn,), daemon=True).start()
+    threading.Thread(target=accept, daemon=True).start()
+
+    app.exec_()
+    listener.close()
+    if os.path.exists(getKeyPath(address)):
+        os.remove(getKeyPath(address))
+    return True
+
+
+class EngineConnection:
+    '''
+        EngineConnection is a client of an AcquisitionHost that does not need Qt, for scripts and notebooks.
+
+            engine = EngineConnection.connect('/tmp/hts-acquisition.sock')
+            engine.status()
+            engine.call('tm', 'runSequence', sequence=[...])
+            engine.subscribe(lambda target, name, args: print(args))
+    '''
+    def __init__(self, conn, timeout=60.):
+        self.conn, self.timeout = conn, timeout
+        self.sendLock, self.ids = threading.Lock(), itertools.count()
+        self.pending, self.replies, self.listeners = {}, {}, []
+
+        kind, ringNames, self.options = conn.recv()
+        self.rings = {key: SharedRingBuffer(name=name, create=False) for key, name in ringNames.items()}
+        self.receiver = threading.Thread(target=self.receive, daemon=True)
+        self.receiver.start()
+
+    @classmethod
+    def connect(cls, address=DEFAULT_ADDRESS, timeout=60.):
+        location, family = parseAddress(address)
+        conn = Client(location, family=family, authkey=getAuthKey(address))
+        return cls(conn, timeout=timeout)
+
+    def request(self, *message):
+        requestId = next(self.ids)
+        event = threading.Event()
+        self.pending[requestId] = event
+        with self.sendLock:
+            self.conn.send((message[0], requestId)+message[1:])
+        if not event.wait(self.timeout if message[0] != 'call' else None):
+            self.pending.pop(requestId, None)
+            raise TimeoutError('EngineConnection::request {} {}.{} timed out'.format(*message[:3]))
+        kind, value = self.replies.pop(requestId, ('error', 'connection lost'))
+        if kind == 'error':
+            raise RuntimeError('Acquisition process raised {}'.format(value))
+        return value
+
+    def call(self, target, name, *args, **kwargs):
+        return self.request('call', target, name, args, kwargs)
+
+    def get(self, target, name):
+        return self.request('getattr', target, name)
+
+    def set(self, target, name, value):
+        return self.request('setattr', target, name, value)
+
+    def status(self):
+        return self.call('host', 'getStatus')
+
+    def subscribe(self, listener):
+        '''
+            subscribe registers a function called with (target, signalName, args) for every signal of the host.
+            It runs on the receiver thread and must return quickly.
+        '''
+        self.listeners.append(listener)
+
+    def read(self, ring='transport', count=0, epoch=None):
+        '''
+            read returns the rows of a ring buffer ('environment', 'transport' or 'vt') written since count,
+            see SharedRingBuffer.readSince.
+        '''
+        return self.rings[ring].readSince(count, epoch)
+
+    def receive(self):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                for event in list(self.pending.values()):
+                    event.set()
+                return
+            if message[0] == 'signal':
+                for listener in self.listeners:
+                    try:
+                        listener(*message[1:])
+                    except Exception as e:
+                        print('EngineConnection::receive listener raised: ', e)
+            elif message[0] in ('result', 'error'):
+                self.replies[message[1]] = (message[0], message[2])
+                event = self.pending.pop(message[1], None)
+                if event is not None:
+                    event.set()
+
+    def close(self, shutdown=False):
+        '''
+            close detaches from the host, and stops it when shutdown is True.
+        '''
+        try:
+            if shutdown:
+                with self.sendLock:
+                    self.conn.send(('shutdown',))
+            self.conn.close()
+        except OSError:
+            pass
+        for ring in self.rings.values():
+            ring.close()
+
+
+class RemoteSignals(QObject):
+    '''
+        Local Qt signals re-emitted by the client for the signals of a remote manager.
+    '''
+    log_signal = pyqtSignal(str, str)
+    plotSignal = pyqtSignal(float, float, str)
+    plot_signal = pyqtSignal(np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray)
+
+
+class RemoteObject:
+    '''
+        RemoteObject forwards attribute reads, writes and method calls to an object of the acquisition process.
+        Names in overrides are answered locally, which is how datapoints are served from the ring buffers.
+    '''
+    def __init__(self, connection, target, signals=None, overrides=None):
+        object.__setattr__(self, '_connection', connection)
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_signals', signals)
+        object.__setattr__(self, '_overrides', overrides or {})
+        object.__setattr__(self, '_callables', set())
+
+    def __getattr__(self, name):
+        if name in self._overrides:
+            return self._overrides[name]()
+        if (self._signals is not None) and hasattr(type(self._signals), name):
+            return getattr(self._signals, name)
+        if name in self._callables:
+            return lambda *args, **kwargs: self._connection.call(self._target, name, *args, **kwargs)
+
+        value = self._connection.get(self._target, name)
+        if value == CALLABLE:
+            self._callables.add(name)
+            return getattr(self, name)
+        elif value == REMOTE_OBJECT:
+            return RemoteObject(self._connection, self._target+'.'+name)
+        return value
+
+    def __setattr__(self, name, value):
+        self._connection.set(self._target, name, value)
+
+
+class AcquisitionClient(QObject):
+    '''
+        AcquisitionClient connects the GUI to an AcquisitionHost and exposes the hm, dm and tm proxies.
+
+        INPUTS
+        ----------
+        connection (EngineConnection) - connection to the host
+        process (multiprocessing Process) - acquisition process, None when attached to a daemon
+        plotLength (int) - number of environment samples used for the plots
+    '''
+    def __init__(self, connection, process=None, plotLength=3600, parent=None):
+        super(AcquisitionClient, self).__init__(parent)
+        self.connection, self.process = connection, process
+        self.hostLogsEvents = connection.options['logEvents']
+        self.environment = {key: collections.deque(maxlen=plotLength) for key in ENVIRONMENT_COLUMNS}
+        self.environmentCount = 0
+
+        self.signals = {name: RemoteSignals() for name in ('hm', 'dm', 'tm')}
+        self.hm = RemoteObject(connection, 'hm', self.signals['hm'])
+        self.dm = RemoteObject(connection, 'dm', self.signals['dm'])
+        self.tm = RemoteObject(connection, 'tm', self.signals['tm'], overrides={
+            'datapoints': lambda: connection.rings['transport'].readAll().tolist(),
+            'getVtTail': lambda: (lambda: connection.rings['vt'].readAll().tolist()),
+        })
+        connection.subscribe(lambda target, name, args: getattr(self.signals[target], name).emit(*args))
+
+        self.plotTimer = QTimer()
+        self.plotTimer.timeout.connect(self.updateEnvironmentPlots)
+        self.plotTimer.start(1000)
+
+    @classmethod
+    def spawn(cls, plotLength=3600, vb=False):
+        '''
+            spawn starts the acquisition process and returns a client connected to it.
+        '''
+        context = multiprocessing.get_context('spawn') # forking would copy the GUI QApplication into the host
+        conn, childConn = context.Pipe(duplex=True)
+        process = context.Process(target=runAcquisitionHost, args=(childConn,), kwargs={'vb': vb}, daemon=True, name='acquisition')
+        process.start()
+        return cls(EngineConnection(conn), process, plotLength=plotLength)
+
+    @classmethod
+    def attach(cls, address=DEFAULT_ADDRESS, plotLength=3600):
+        '''
+            attach connects to a daemon started with main.py --headless.
+        '''
+        return cls(EngineConnection.connect(address), plotLength=plotLength)
+
+    def isAttached(self):
+        return self.process is None
+
+    def updateEnvironmentPlots(self):
+        '''
+            updateEnvironmentPlots rebuilds the arrays of DataManager.updateEnvironmentPlots from the environment ring buffer.
+        '''
+        rows, self.environmentCount, epoch = self.connection.read('environment', self.environmentCount)
+        for row in rows:
+            for key, code in SIGNAL_CODES.items():
+                if row[0] == code:
+                    self.environment[key].append(row[1:1+len(ENVIRONMENT_COLUMNS[key])])
+        if not all(self.environment.values()):
+            return
+
+        tc, pm, mc = [np.array(self.environment[key]).T for key in ('tc', 'pm', 'mc')]
+        self.signals['dm'].plot_signal.emit(tc[0], pm[0], mc[0], tc[1], tc[2], tc[3], tc[4], tc[5], pm[1], tc[6], mc[1], mc[2])
+
+    def close(self, shutdown=True):
+        '''
+            close disconnects from the host. A spawned host is always stopped, a daemon only when shutdown is True.
+        '''
+        self.plotTimer.stop()
+        self.connection.close(shutdown=shutdown or not self.isAttached())
+        if self.process is not None:
+            self.process.join(timeout=10)
@@ -0,0 +1,95 @@
+import threading, collections
+import numpy as np
+import clock, tracing
+
+class CancellationToken:
+    '''
+        CancellationToken replaces time.sleep in loops that must stop as soon as the user asks them to.
+
+        wait sleeps until the timeout expires or until cancel is called, whichever comes first. The token
+        does not stay cancelled: the stop flags (acquiring, sequenceRunning, ...) remain the source of truth
+        and every cancel only wakes the threads that were waiting at that moment. A loop that wakes up for a
+        stop that does not concern it re-checks its flags and simply waits again, without spinning.
+
+        A stop that happens after the caller checked its flag but before it starts waiting would not wake it,
+        so wait takes the flag as a predicate, e.g. until=lambda: not self.acquiring, and checks it under the
+        lock of the token. The flag is set before cancel is called, so the stop is seen either by the check or
+        by the wake-up.
+
+        The time of the last cancel is kept so that the cancel-to-idle latency of the code that was
+        interrupted can be measured (see CancelLatency).
+
+        @author Alexis Devitre devitre@mit.edu
+        @lastModified October 2026
+    '''
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.generation = 0
+        self.cancelTime = None
+        self.reason = ''
+
+    def cancel(self, reason=''):
+        with self.condition:
+            self.generation += 1
+            self.cancelTime, self.reason = clock.now(), reason
+            self.condition.notify_all()
+
+    def wait(self, timeout, until=None):
+        '''
+            INPUTS
+            ----------
+            timeout (float) - longest wait in seconds
+            until (callable) - returns True when the caller must stop, the wait then returns at once
+
+            RETURNS
+            ----------
+            cancelled (bool) - True when the wait was interrupted by cancel or until returned True
+        '''
+        stopped = until if until is not None else (lambda: False)
+        with tracing.span('wait', 'sleep', seconds=timeout), self.condition:
+            generation = self.generation
+            return self.condition.wait_for(lambda: (self.generation != generation) or stopped(), timeout=clock.toReal(max(timeout, 0.)))
+
+    def getCancelTime(self):
+        return self.cancelTime
+
+
+class CancelLatency:
+    '''
+        CancelLatency records, per step type, the time between a cancel and the moment the interrupted
+        step returned control. The latencies are reported in the log when they are recorded.
+
+        INPUTS
+        ----------
+        token (CancellationToken) - token whose cancel time is used as the start of the latency
+        maxSamples (int) - number of latencies kept per step type
+    '''
+    def __init__(self, token, maxSamples=100):
+        self.token = token
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=maxSamples))
+        self.mutex = threading.Lock()
+
+    def record(self, step):
+        '''
+            record stores the latency of a step that just stopped after a cancel.
+
+            RETURNS
+            ----------
+            latency (float) - seconds since the last cancel, NaN if the token was never cancelled
+        '''
+        cancelTime = self.token.getCancelTime()
+        if cancelTime is None:
+            return np.nan
+        latency = clock.now() - cancelTime
+        with self.mutex:
+            self.latencies[step].append(latency)
+        return latency
+
+    def getStats(self):
+        '''
+            RETURNS
+            ----------
+            stats (dict) - {step: {'count', 'p50_s', 'max_s'}} over the recorded latencies
+        '''
+        with self.mutex:
+            return {step: {'count': len(values), 'p50_s': float(np.percentile(values, 50)), 'max_s': float(np.max(values))} for step, values in self.latencies.items() if values}
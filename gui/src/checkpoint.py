@@ -0,0 +1,119 @@
+import os, json, copy, datetime, threading
+
+class SequenceCheckpoint:
+    '''
+        SequenceCheckpoint records the progress of the running sequence in a small JSON file so that
+        it can be resumed after a crash or a restart of the GUI.
+
+        The file holds the compiled lines of the sequence (subsequences expanded), the items of the sequence
+        list they come from, the index of the next step to run, the current Label, the number of IVs done by
+        a MeasureIc step in progress and the steps of a parallel group in progress that already finished.
+        It is rewritten atomically (write to a temporary file, fsync, rename) after each step, so a crash
+        leaves either the previous or the new state on disk.
+
+        @author Alexis Devitre devitre@mit.edu
+        @lastModified October 2026
+    '''
+    RESUMABLE = ('running', 'failed')
+
+    def __init__(self, path):
+        self.path = path
+        self.state = None
+        self.mutex = threading.Lock() # the branches of a parallel group update the checkpoint concurrently
+
+    def begin(self, sequence):
+        '''
+            begin records a new sequence, replacing any previous checkpoint.
+
+            INPUTS
+            ----------
+            sequence (CompiledSequence) - the sequence about to run
+        '''
+        with self.mutex:
+            self.state = {
+                'started': str(datetime.datetime.now()),
+                'status': 'running',
+                'items': sequence.items,
+                'lines': [step.line for step in sequence],
+                'stepItems': [step.item for step in sequence],
+                'index': 0,
+                'label': '',
+                'repeatsDone': {},
+                'parallelDone': [],
+            }
+            self.write()
+
+    def resume(self, state):
+        with self.mutex:
+            self.state = copy.deepcopy(state) # the runner keeps reading the resumed state
+            self.state['status'] = 'running'
+            self.write()
+
+    def update(self, index=None, label=None):
+        '''
+            update records that the steps before index are done and the Label in use.
+        '''
+        with self.mutex:
+            if self.state is None:
+                return
+            if index is not None:
+                self.state['index'], self.state['repeatsDone'], self.state['parallelDone'] = index, {}, []
+            if label is not None:
+                self.state['label'] = label
+            self.write()
+
+    def repeatDone(self, index, count):
+        '''
+            repeatDone records that count IVs of the MeasureIc step at index are done.
+        '''
+        with self.mutex:
+            if self.state is not None:
+                self.state['repeatsDone'][str(index)] = count
+                self.write()
+
+    def parallelStepDone(self, index):
+        with self.mutex:
+            if self.state is not None:
+                self.state['parallelDone'].append(index)
+                self.write()
+
+    def finish(self, status):
+        '''
+            finish closes the checkpoint, status is 'completed', 'stopped' (by the user, not resumable) or 'failed'.
+        '''
+        with self.mutex:
+            if self.state is not None:
+                self.state['status'] = status
+                self.write()
+                self.state = None
+
+    def write(self):
+        self.state['updated'] = str(datetime.datetime.now())
+        temporary = self.path+'.tmp'
+        try:
+            with open(temporary, 'w') as f:
+                f.write(json.dumps(self.state, indent=2))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print('SequenceCheckpoint::write raised: ', e)
+
+    def load(self):
+        '''
+            RETURNS
+            ----------
+            state (dict) - checkpoint of an interrupted sequence, None if there is none or the last sequence ended normally
+        '''
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return state if state.get('status') in self.RESUMABLE else None
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,78 @@
+import time
+import tracing
+
+class Clock:
+    '''
+        Clock is the time source of the task, data and hardware managers. The real clock simply wraps the time module;
+        the code that paces the setup asks the clock for the time and sleeps through it, so that a dry run can replace
+        it with an AcceleratedClock and play a sequence many times faster than real time.
+
+        @author Alexis Devitre devitre@mit.edu
+        @lastModified October 2026
+    '''
+    speed = 1.
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(max(seconds, 0.))
+
+    def toReal(self, seconds):
+        '''
+            toReal converts a duration of the clock into real seconds, e.g. for the timeout of a wait on a condition.
+        '''
+        return None if seconds is None else seconds/self.speed
+
+
+class AcceleratedClock(Clock):
+    '''
+        AcceleratedClock runs speed times faster than real time. It starts at the current epoch time,
+        so timestamps stay plausible and can be formatted as dates.
+
+        INPUTS
+        ----------
+        speed (float) - virtual seconds per real second
+    '''
+    def __init__(self, speed=60.):
+        self.speed = float(speed)
+        self.realStart = time.perf_counter()
+        self.start = time.time()
+
+    def time(self):
+        return self.start + (time.perf_counter()-self.realStart)*self.speed
+
+    def sleep(self, seconds):
+        time.sleep(max(seconds, 0.)/self.speed)
+
+    def getElapsed(self):
+        '''
+            RETURNS
+            ----------
+            virtual, real (float) - seconds elapsed on the clock and in real time since it was created
+        '''
+        real = time.perf_counter()-self.realStart
+        return real*self.speed, real
+
+
+_clock = Clock()
+
+def setClock(clock):
+    '''
+        setClock replaces the clock used by the whole application, it must be called before any measurement starts.
+    '''
+    global _clock
+    _clock = clock
+
+def getClock():
+    return _clock
+
+def now():
+    return _clock.time()
+
+def sleep(seconds):
+    with tracing.span('sleep', 'sleep', seconds=seconds):
+        _clock.sleep(seconds)
+
+def toReal(seconds):
+    return _clock.toReal(seconds)
@@ -0,0 +1,76 @@
+import clock
+
+class CurrentReversalEngine:
+    '''
+        CurrentReversalEngine produces the forward/reverse bias voltage pairs of a Tc measurement.
+
+        The LakeShore 121 needs up to 300 ms to settle after a change of polarity, the settle time
+        (0.4 s by default, the delay of the driver) keeps a margin over it. Instead of sleeping it after
+        every SETI command, the engine commands the next polarity as soon as the previous voltage has been
+        read, and uses the settle window to take the temperature snapshot, read the current on the DMM and
+        let the caller store the previous point. Each voltage read waits until settleTime has elapsed since
+        the SETI command returned.
+
+        @author Alexis Devitre devitre@mit.edu
+        @lastModified October 2026
+    '''
+    def __init__(self, hardwareManager, dataManager, settleTime=0.4):
+        self.hm = hardwareManager
+        self.dm = dataManager
+        self.settleTime = settleTime
+        self.commandTime = None
+
+    def command(self, current):
+        '''
+            command requests a new current without waiting for the output to settle.
+
+            INPUTS
+            ----------
+            current (float) - signed transport current in amps
+        '''
+        self.hm.setSmallCurrent(current, settle=False)
+        self.commandTime = clock.now()
+
+    def readVoltage(self):
+        '''
+            readVoltage waits until the settle window of the last command is over, then reads the voltage.
+
+            RETURNS
+            ----------
+            voltage (float) - raw voltage in volts (offset not removed)
+            timestamp (float) - epoch time at which the read was requested
+        '''
+        remaining = self.commandTime + self.settleTime - clock.now()
+        if remaining > 0:
+            clock.sleep(remaining)
+        timestamp = clock.now()
+        return self.hm.getVoltageReading(removeOffset=False), timestamp
+
+    def start(self, transportCurrent):
+        '''
+            start commands the forward bias of the first pair.
+        '''
+        self.command(transportCurrent)
+
+    def nextPair(self, transportCurrent):
+        '''
+            nextPair measures one forward/reverse pair. The forward bias must already have been commanded,
+            either by start or by the previous call, and the forward bias of the next pair is commanded
+            before returning so that it settles while the caller processes this one.
+
+            RETURNS
+            ----------
+            current (float) - DMM current reading in amps, taken during the forward settle window
+            vpos, tpos (float) - forward bias voltage and the epoch time of its read
+            vneg, tneg (float) - reverse bias voltage and the epoch time of its read
+            temperatures (tuple) - sample, target, holder and spare temperatures in kelvin
+        '''
+        temperatures = self.dm.getLatestTemperatureReading()
+        current = self.hm.getCurrentReading(useDMM=True)
+        vpos, tpos = self.readVoltage()
+
+        self.command(-1*transportCurrent)
+        vneg, tneg = self.readVoltage()
+
+        self.command(transportCurrent)
+        return current, vpos, tpos, vneg, tneg, temperatures
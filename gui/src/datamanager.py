@@ -4,26 +4,45 @@ from PyQt5.QtCore import pyqtSignal, QObject, QThreadPool, QMutex
 
 from fittingFunctions import linear, powerLaw, inverseExponential, fitIV, fitTV
 from task import Task
+from measurementstream import MeasurementStream
+import clock, tracing
 
-import time, datetime, sys, os, shutil, gc
+import time, datetime, sys, os, shutil, gc, threading
 import numpy as np
-import matplotlib.pyplot as plt
 import pandas as pd
 sys.path.append('config')
 
-from configure import update_json, load_json
+from configservice import config
+
+# signal name (see getLatestValue) -> (reading group, column of the stored row)
+SIGNAL_COLUMNS = {
+    'Target Temperature': ('tc', 'targetT_K'),
+    'Sample Temperature': ('tc', 'sampleT_K'),
+    'Holder Temperature': ('tc', 'holderT_K'),
+    'Spare Temperature': ('tc', 'spareT_K'),
+    'power': ('tc', 'heaterPower_W'),
+    'Setpoint Temperature': ('tc', 'setpt_K'),
+    'pressure': ('pm', 'pressure_torr'),
+    'Magnetic Field': ('mc', 'field_T'),
+    'Magnet Holding': ('mc', 'holding'),
+}
 
 class DataManager(QObject):
     
     log_signal = pyqtSignal(str, str)
     plot_signal = pyqtSignal(np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray)
     
-    def __init__(self, threadpool, parent=None, vb=False):
+    def __init__(self, executors, saveFolder=None, parent=None, vb=False):
         super(DataManager, self).__init__(parent)
         
-        self.preferences = load_json(fname='preferences.json', location=os.getcwd()+'/config')
-        self.threadpool = threadpool
+        config.attach(self, 'preferences', 'preferences.json')
+        self.temporarySaveFolder = saveFolder if saveFolder is not None else self.preferences['temporary_savefolder'] # e.g. a dry run keeps its data away from the session folders
+        self.executors = executors
         self.mutexTc, self.mutexPm, self.mutexMc, self.mutexPlots = QMutex(), QMutex(), QMutex(), QMutex()
+        self.sampleListeners = []
+        self.sampleCondition = threading.Condition() # notified by notifySampleListeners and wakeWaiters, see waitUntil
+        self.latestSamples, self.sampleCounts, self.wakeups = {}, {'tc': 0, 'pm': 0, 'mc': 0}, 0
+        self.acquiredSignals = () # groups polled by the readings timers, see setAcquiredSignals
         self.initialize()
         
     def __del__(self):
@@ -39,7 +58,7 @@ class DataManager(QObject):
         self.tcData, self.pmData, self.paData, self.mcData = None, None, None, None
 
         # create the save directory and subdirectories
-        self.save_directory = self.preferences["temporary_savefolder"]+str(datetime.datetime.now()).replace(' ', '_').replace(':', '-').replace('.', '')
+        self.save_directory = self.temporarySaveFolder+str(datetime.datetime.now()).replace(' ', '_').replace(':', '-').replace('.', '')
         if os.path.exists(self.save_directory):
             shutil.rmtree(self.save_directory)
         os.mkdir(self.save_directory)
@@ -87,16 +106,107 @@ class DataManager(QObject):
         self.log_signal.emit('SessionStart', comment)
     
     def startTime(self):
-        self.t0 = time.time()
+        self.t0 = clock.now()
         self.tcData, self.pmData, self.paData, self.mcData = None, None, None, None
 
-    def updateMcReadings(self, setpoint_field, field):
+    def addSampleListener(self, listener):
+        '''
+            addSampleListener registers a function called with (signal, values) after each environment reading is stored.
+            signal is 'tc', 'pm' or 'mc' and values is the dictionary of the stored row.
+        '''
+        self.sampleListeners.append(listener)
+    
+    def notifySampleListeners(self, signal, values):
+        with self.sampleCondition:
+            self.latestSamples[signal] = values
+            self.sampleCounts[signal] += 1
+            self.sampleCondition.notify_all()
+        for listener in self.sampleListeners:
+            try:
+                listener(signal, values)
+            except Exception as e:
+                print('DataManager::notifySampleListeners raised: ', e)
+
+    def setAcquiredSignals(self, groups):
+        '''
+            setAcquiredSignals tells waitUntil which groups of signals ('tc', 'pm', 'mc') are polled by the readings
+            timers, a wait on any other group would never end. The waits in progress are woken to check it again.
+        '''
+        with self.sampleCondition:
+            self.acquiredSignals = tuple(groups)
+            self.wakeups += 1
+            self.sampleCondition.notify_all()
+
+    def wakeWaiters(self):
+        '''
+            wakeWaiters makes every waitUntil in progress re-evaluate its keepWaiting function, it is called when the user stops.
+        '''
+        with self.sampleCondition:
+            self.wakeups += 1
+            self.sampleCondition.notify_all()
+
+    @tracing.traced('wait')
+    def waitUntil(self, signal, predicate, holdFor=0., timeout=None, keepWaiting=lambda: True, fresh=False, callback=None):
+        '''
+            waitUntil blocks until predicate holds for the latest value of signal, and has held on every sample
+            published during the last holdFor seconds. The condition is evaluated each time a new reading of the
+            signal is stored, so the wait ends with the first sample that satisfies it instead of at the next poll.
+            
+            INPUTS
+            -------------------------------------------------------------------------
+            signal (str) - one of SIGNAL_COLUMNS, e.g. 'Sample Temperature', 'pressure' or 'Magnet Holding'
+            predicate (function) - called with the value of the signal, returns True when the condition is met
+            holdFor (float) - time in seconds during which the condition must hold without interruption
+            timeout (float) - longest wait in seconds, None waits as long as the signal is acquired
+            keepWaiting (function) - the wait is abandoned as soon as it returns False, re-evaluated on wakeWaiters
+            fresh (bool) - ignore the sample stored before the call, e.g. after sending a new setpoint
+            callback (function) - called with each evaluated value, to report progress
+            
+            RETURNS
+            -------------------------------------------------------------------------
+            reached (bool) - True if the condition was met, False on timeout, when keepWaiting returned False or
+                             when the signal is not acquired (see setAcquiredSignals), e.g. in LN2 mode
+        '''
+        group, column = SIGNAL_COLUMNS[signal]
+        deadline = None if timeout is None else clock.now()+timeout
+        holdStart = None
+        with self.sampleCondition:
+            seen, wakeups = (self.sampleCounts[group] if fresh else -1), self.wakeups
+            while keepWaiting():
+                if group not in self.acquiredSignals:
+                    print('DataManager::waitUntil gave up: {} is not being acquired'.format(signal))
+                    return False
+                if self.sampleCounts[group] != seen:
+                    seen, now = self.sampleCounts[group], clock.now()
+                    try:
+                        value = self.latestSamples[group][column]
+                        met = bool(predicate(value))
+                        if callback is not None:
+                            callback(value)
+                    except (KeyError, TypeError):
+                        met = False
+                    if not met:
+                        holdStart = None
+                    elif holdStart is None:
+                        holdStart = now
+                    if (holdStart is not None) and (now-holdStart >= holdFor):
+                        return True
+                
+                remaining = None if deadline is None else deadline-clock.now()
+                if (remaining is not None) and (remaining <= 0):
+                    return False
+                wakeups = self.wakeups
+                self.sampleCondition.wait_for(lambda: (self.sampleCounts[group] != seen) or (self.wakeups != wakeups), timeout=clock.toReal(remaining))
+        return False
+
+    def updateMcReadings(self, setpoint_field, field, holding=np.nan):
         try:
             dt = datetime.datetime.now()
             data = {
-                'time_s': time.time()-self.t0,
+                'time_s': clock.now()-self.t0,
                 'setpoint_field': setpoint_field,
                 'field_T': field,
+                'holding': holding,
                 'backedup': False
             }
             print('The last read setpoint for the magnet is: ', setpoint_field)
@@ -105,6 +215,7 @@ class DataManager(QObject):
                 self.mcData.loc[dt] = data
             else:
                 self.mcData = pd.DataFrame(data, index=[dt])
+            self.notifySampleListeners('mc', data)
         except Exception as e:
             print('Exception while updating magnet controller readings: ', e)
         finally:
@@ -114,7 +225,7 @@ class DataManager(QObject):
         try:
             dt = datetime.datetime.now()
             data = {
-                'time_s': time.time()-self.t0,
+                'time_s': clock.now()-self.t0,
                 'pressure_torr': pressure,
                 'backedup': False
             }
@@ -123,6 +234,7 @@ class DataManager(QObject):
                 self.pmData.loc[dt] = data
             else:
                 self.pmData = pd.DataFrame(data, index=[dt])
+            self.notifySampleListeners('pm', data)
         except Exception as e:
             print('Exception while updating pressure monitor readings: ', e)
         finally:
@@ -132,7 +244,7 @@ class DataManager(QObject):
         try:
             dt = datetime.datetime.now()
             data = {
-                'time_s': time.time()-self.t0,
+                'time_s': clock.now()-self.t0,
                 'setpt_K': setpointT,
                 'sampleT_K': sampleT,
                 'targetT_K': targetT,
@@ -146,11 +258,13 @@ class DataManager(QObject):
                 self.tcData.loc[dt] = data
             else:
                 self.tcData = pd.DataFrame(data, index=[dt])
+            self.notifySampleListeners('tc', data)
         except Exception as e:
             print('Exception while updating temperature controller readings: ', e)
         finally:
             self.mutexTc.unlock()
    
+    @tracing.traced('file')
     def saveMeasurementToFile(self, datapoints, measurement='Ic', **kwargs):
         timestamp = kwargs['timestamp']
         with open(self.save_directory+'/'+measurement[0:2]+'/{}_'.format(measurement)+timestamp.replace(' ', '_').replace(':', '-').replace('.', '')+'_'+kwargs['tag']+'.txt', 'w') as f:
@@ -164,9 +278,13 @@ class DataManager(QObject):
                 f.write('# Tavg = {:4.2f} K, {}\n'.format(kwargs['tavg'], kwargs['tag']))
                 
             f.write('#{:30}  {:6}  {:20}  {:20}  {:6}  {:6}  {:6}  {:6}'.format('datetime', 't_s', 'iHTS_A', 'vHTS_V', 'tHTS_K', 'tTAR_K', 'tHOL_K', 'tSPA_K'))
+            if measurement == 'Tc': # forward and reverse bias voltages of each point and the times of their reads
+                f.write('  {:20}  {:20}  {:10}  {:10}'.format('vPOS_V', 'vNEG_V', 'tPOS_s', 'tNEG_s'))
             
             for datapoint in datapoints:
                 f.write('\n{:<30}  {:6.2f}  {:20.8e}  {:20.8e}  {:6.4f}  {:6.4f}  {:6.4f}  {:6.4f}'.format(self.float2datetime(datapoint[0]), datapoint[1], datapoint[2], datapoint[3], datapoint[4], datapoint[5],  datapoint[-2],  datapoint[-1]))
+                if measurement == 'Tc':
+                    f.write('  {:20.8e}  {:20.8e}  {:10.3f}  {:10.3f}'.format(datapoint[6], datapoint[7], datapoint[8], datapoint[9]))
             f.close()
         
         with open(self.save_directory+'/fittedParameters.txt', 'a') as f:
@@ -177,6 +295,40 @@ class DataManager(QObject):
                 f.write('{:15} {:15} {:15} {:10.4f} {:>10}\n'.format(timestamp, 'Tc', kwargs['tag'], kwargs['tc'], '1 mA'))
             f.close()
     
+    def getMeasurementDurations(self, measurement='Ic'):
+        '''
+            getMeasurementDurations returns the duration of each measurement of the given type saved in this session,
+            from the first and last times of the data files. It is used to estimate the duration of sequences.
+            
+            RETURNS
+            -------------------------------------------------------------------------
+            durations (float, list) - durations in seconds
+        '''
+        durations = []
+        folder = self.save_directory+'/'+measurement[0:2]
+        for fname in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+            try:
+                t = np.genfromtxt((line for line in open(folder+'/'+fname, 'rb') if line[0:1] != b'#'), usecols=[1], ndmin=1)
+                if t.size > 1:
+                    durations.append(float(t[-1]-t[0]))
+            except Exception as e:
+                print('DataManager::getMeasurementDurations skipped {}: {}'.format(fname, e))
+        return durations
+
+    @tracing.traced('file')
+    def openMeasurementStream(self, measurement='Vt', tag='Pristine'):
+        '''
+            openMeasurementStream creates the data file of a measurement that is written while it is acquired,
+            with the same name and columns as saveMeasurementToFile.
+
+            measurement - (str) Measurement type, used for the subdirectory and the file name
+            tag         - (str) Data file label
+        '''
+        timestamp = str(datetime.datetime.now())
+        path = self.save_directory+'/'+measurement[0:2]+'/{}_'.format(measurement)+timestamp.replace(' ', '_').replace(':', '-').replace('.', '')+'_'+tag+'.txt'
+        return MeasurementStream(path, tag, self.float2datetime, chunkSize=self.preferences['vt_chunk_size'], targetRate=self.preferences['vt_target_rate'], reduction=self.preferences['vt_reduction'], tailLength=self.preferences['vt_plot_tail'])
+
+    @tracing.traced('analysis')
     def fitIcMeasurement(self, current, voltage, noiseThreshold=1e-7):
         try:
             ic, n, voltage = fitIV(current, voltage, vc=self.vc, vThreshold=noiseThreshold, fitType='logarithmic')
@@ -185,6 +337,7 @@ class DataManager(QObject):
             print(type(e), e)
         return ic, n, voltage
     
+    @tracing.traced('analysis')
     def fitTcMeasurement(self, temperature, voltage, tag):
         return fitTV(temperature, voltage, tag, fitType='electric-field', vb=False)
     
@@ -192,11 +345,9 @@ class DataManager(QObject):
         popt, pcov = curve_fit(linear, set_voltage[voltage>0], voltage[voltage>0])
         a, b = popt[0], popt[1]
         
-        data = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
-        data["a"] = a
-        data["b"] = b
-        update_json(data=data, fname='hwparams.json', location=os.getcwd()+'/config')
+        config.update('hwparams.json', a=a, b=b)
         
+        import matplotlib.pyplot as plt # only the calibration uses pyplot, not worth loading at startup
         fig, ax = plt.subplots(figsize=(9.5, 5))
         ax.plot(set_voltage, voltage, color='k', marker='+', linestyle='None', label='raw data')
         ax.plot((voltage-b)/a, voltage, color='b', label='setV = {:4.2e} V + {:4.2e}'.format(a, b))
@@ -208,6 +359,7 @@ class DataManager(QObject):
          
         return a, b
      
+    @tracing.traced('analysis')
     def updateEnvironmentPlots(self):
         self.mutexPlots.lock()
         self.mutexPm.lock()
@@ -238,7 +390,7 @@ class DataManager(QObject):
             
             INPUTS
             -------------------------------------------------------------------------
-            signal (str) - options: Target Temperature (default), Sample Temperature, qPid (power output of the PID controlled heater), CG (low vacuum gauge pressure).
+            signal (str) - options: Target Temperature (default), Sample Temperature, qPid (power output of the PID controlled heater), CG (low vacuum gauge pressure), Magnet Holding.
             
             RETURNS
             -------------------------------------------------------------------------
@@ -260,11 +412,29 @@ class DataManager(QObject):
             value = self.tcData.setpt_K.iloc[-1]
         elif signal == 'Magnetic Field':
             value = self.mcData.field_T.iloc[-1]
+        elif signal == 'Magnet Holding':
+            value = self.mcData.holding.iloc[-1]
         return value
     
     def getLatestTemperatureReading(self):
         return self.tcData.sampleT_K.iloc[-1], self.tcData.targetT_K.iloc[-1], self.tcData.holderT_K.iloc[-1], self.tcData.spareT_K.iloc[-1] 
+
+    def getTemperatureReadingsSince(self, since):
+        '''
+            RETURNS
+            -------------------------------------------------------------------------
+            sampleT, targetT, holderT, spareT (float, arrays) - temperatures stored since the epoch time since, at least the latest reading
+        '''
+        self.mutexTc.lock()
+        try:
+            recent = self.tcData[self.tcData.time_s >= since-self.t0]
+            if recent.empty:
+                recent = self.tcData.iloc[-1:]
+            return recent.sampleT_K.values, recent.targetT_K.values, recent.holderT_K.values, recent.spareT_K.values
+        finally:
+            self.mutexTc.unlock()
     
+    @tracing.traced('file')
     def saveEnvironmentData(self):
         try:
             self.mutexPlots.lock()
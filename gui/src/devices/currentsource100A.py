@@ -1,8 +1,8 @@
 import numpy, time, os
-from configure import load_json
-from uldaq import get_daq_device_inventory, DaqDevice, InterfaceType, AOutFlag
+from configservice import config
+from daqscan import UldaqScanBackend, SimulatedScanBackend, HardwareRamp
 
-hwparams = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
+hwparams = config.get('hwparams.json')
 
 class CurrentSource100A:
     '''
@@ -14,10 +14,13 @@ class CurrentSource100A:
         self.vs = voltageSource
         self.csCAEN = currentSourceCAEN
         self.csTDK = currentSourceTDK
+        self.daq = None
 
         self.updateCalibration(a, b)
 
     def __del__(self):
+        if self.daq is not None:
+            self.daq.release()
         print('Current source 100 A disconnected and released')
         
     def setCurrent(self, current, currentSource=hwparams['LABEL_CS100A'], useCalibration=True, vb=False):
@@ -65,6 +68,45 @@ class CurrentSource100A:
 
         return control_voltage
     
+    def startHardwareRamp(self, currents, dwell, simulated=False):
+        '''
+            startHardwareRamp precomputes the control voltage of every current step from the (a, b) calibration
+            and plays the waveform with a hardware-paced analog output scan of the DAQ.
+
+            INPUTS
+            ------------------------------------------
+            currents (float, array) - requested current of each step in amps
+            dwell (float)           - duration of each step in seconds
+            simulated (bool)        - time the ramp with SimulatedScanBackend instead of the DAQ
+            RETURNS
+            ------------------------------------------
+            ramp (HardwareRamp) - the running ramp, or None if the DAQ is not available
+        '''
+        if (self.daq is None) or (isinstance(self.daq, SimulatedScanBackend) != simulated):
+            if self.daq is not None:
+                self.daq.release()
+            if simulated:
+                self.daq = SimulatedScanBackend(channel=hwparams['daq_ao_channel'])
+            else:
+                self.daq = UldaqScanBackend(channel=hwparams['daq_ao_channel'])
+        
+        if not self.daq.isConnected():
+            return None
+
+        currents = numpy.asarray(currents)
+        control_voltages = (currents*self.shuntR-self.b)/self.a
+        inRange = (control_voltages >= 0) & (control_voltages <= .75)
+        if not inRange.all(): # Truncate the ramp before the first step that the calibration cannot produce safely
+            last = numpy.argmin(inRange)
+            print('Control voltage out of range above {:4.2f} A, the ramp was truncated.'.format(currents[last]))
+            currents, control_voltages = currents[:last], control_voltages[:last]
+
+        ramp = None
+        if len(currents) > 0:
+            ramp = HardwareRamp(self.daq, currents, control_voltages, dwell)
+            ramp.start()
+        return ramp
+
     def enableParallelMode(self, enabled=False):
         self.vs.enableParallelMode(enabled=enabled)
 
@@ -22,12 +22,13 @@ class CurrentSource100mA(Device):
         self.write('IENBL 1') # closes the circuit and enables current to flow. An external relay was added because there was an issue having the live still connected to the load.
         time.sleep(.4)
         
-    def setCurrent(self, value=0):
+    def setCurrent(self, value=0, settle=True):
         '''
             Changes the value of the current output. The minimum current is 100 nA. Setting the current to zero sets it to 100 nA.
             
             @inputs:
                 value (str) - setpoint for the current in amps (A)
+                settle (bool) - wait for the output to settle; pass False when the caller schedules its own reads
         '''
         #self.write('IENBL 0') # disable the output before changing
 
@@ -41,7 +42,8 @@ class CurrentSource100mA(Device):
         else:
             command="SETI {:3.0e}".format(value) # negative floats come with a - sign
         self.write(command)
-        time.sleep(.4) # takes < 300 ms for full-scale change in current (manual page 3)
+        if settle:
+            time.sleep(.4) # takes < 300 ms for full-scale change in current (manual page 3)
 
         #if numpy.abs(value) >= 100e-6: # if we want to apply something greater than the minimum (100 nA) we must enable the output.
         #    self.write('IENBL 1')
@@ -0,0 +1,199 @@
+import numpy
+import clock
+
+'''
+    Hardware-paced analog output for the control voltage of the 100 A current source.
+
+    A HardwareRamp holds a precomputed control-voltage waveform, one sample per current step, which the
+    DAQ plays out with its own clock. Reads of the sample voltage and current are then scheduled against
+    the known start time of every step instead of following serial round trips.
+
+    The step on the output is derived from the start time of the scan and the sample rate accepted by the DAQ
+    (see HardwareRamp.currentStep), both on the application clock that also stamps the measurement points.
+    The index reported in the scan status is not used: it counts the samples moved into the FIFO of the device,
+    which runs ahead of the DAC by the depth of the FIFO. The status only tells whether the scan is still playing.
+
+    @author Alexis Devitre
+    @lastModified October 2026
+'''
+
+class UldaqScanBackend:
+    '''
+        UldaqScanBackend drives the first Measurement Computing DAQ found by uldaq.
+    '''
+    def __init__(self, channel=0):
+        from uldaq import get_daq_device_inventory, DaqDevice, InterfaceType
+
+        self.channel = channel
+        self.daq, self.ao = None, None
+        try:
+            devices = get_daq_device_inventory(InterfaceType.ANY)
+            self.daq = DaqDevice(devices[0])
+            self.daq.connect()
+            self.ao = self.daq.get_ao_device()
+            self.range = self.ao.get_info().get_ranges()[0]
+        except Exception as e:
+            print('UldaqScanBackend::__init__ raised: ', e)
+            print('WARNING: DAQ not connected')
+
+    def isConnected(self):
+        return self.ao is not None
+
+    def startScan(self, voltages, rate):
+        '''
+            startScan copies the waveform into a DAQ buffer and starts a hardware-paced scan.
+
+            RETURNS
+            ----------
+            rate (float) - actual sample rate in Hz, as accepted by the device
+        '''
+        from uldaq import create_float_buffer, ScanOption, AOutScanFlag
+
+        self.count = len(voltages)
+        self.buffer = create_float_buffer(1, len(voltages))
+        for k, v in enumerate(voltages):
+            self.buffer[k] = v
+        return self.ao.a_out_scan(self.channel, self.channel, self.range, len(voltages), rate, ScanOption.DEFAULTIO, AOutScanFlag.DEFAULT, self.buffer)
+
+    def isScanning(self):
+        '''
+            RETURNS
+            ----------
+            scanning (bool) - False once the scan failed or was stopped, a scan that played all its samples holds
+                              the last one and is still scanning
+        '''
+        from uldaq import ScanStatus
+        try:
+            status, transfer = self.ao.get_scan_status()
+        except Exception as e: # e.g. an underrun ended the scan
+            print('UldaqScanBackend::isScanning raised: ', e)
+            return False
+        return (status == ScanStatus.RUNNING) or (transfer.current_total_count >= self.count)
+
+    def stopScan(self):
+        try:
+            self.ao.scan_stop()
+        except Exception as e:
+            print('UldaqScanBackend::stopScan raised: ', e)
+
+    def output(self, voltage):
+        from uldaq import AOutFlag
+        self.ao.a_out(self.channel, self.range, AOutFlag.DEFAULT, voltage)
+
+    def release(self):
+        if self.daq is not None:
+            if self.daq.is_connected():
+                self.daq.disconnect()
+            self.daq.release()
+            self.daq, self.ao = None, None
+
+
+class SimulatedScanBackend:
+    '''
+        SimulatedScanBackend reproduces the timing of a hardware-paced scan with the application clock.
+        The voltage currently on the output is available in self.voltage.
+    '''
+    def __init__(self, channel=0):
+        self.channel = channel
+        self.voltages, self.rate, self.t0 = [], 1., None
+        self.voltage = 0.
+
+    def isConnected(self):
+        return True
+
+    def startScan(self, voltages, rate):
+        self.voltages, self.rate, self.t0 = list(voltages), rate, clock.now()
+        return rate
+
+    def isScanning(self):
+        if self.t0 is None:
+            return False
+        self.voltage = self.voltages[min(int((clock.now()-self.t0)*self.rate), len(self.voltages)-1)]
+        return True
+
+    def stopScan(self):
+        if self.t0 is not None:
+            self.isScanning()
+        self.t0 = None
+
+    def output(self, voltage):
+        self.voltage = voltage
+
+    def release(self):
+        self.t0 = None
+
+
+class HardwareRamp:
+    '''
+        HardwareRamp plays a staircase of control voltages, one step per current setpoint.
+
+        INPUTS
+        ----------
+        backend (UldaqScanBackend or SimulatedScanBackend) - device that paces the output
+        currents (float, array) - requested current of each step in amps
+        controlVoltages (float, array) - control voltage of each step in volts
+        dwell (float) - duration of each step in seconds
+    '''
+    def __init__(self, backend, currents, controlVoltages, dwell):
+        self.backend = backend
+        self.currents = numpy.asarray(currents)
+        self.controlVoltages = numpy.asarray(controlVoltages)
+        self.dwell = dwell
+        self.t0, self.overruns, self.stopped = None, 0, False
+
+    def start(self):
+        rate = self.backend.startScan(self.controlVoltages, 1./self.dwell)
+        self.t0 = clock.now() # taken when the scan has started, later than the first sample by the start latency of the DAQ
+        self.dwell = 1./rate
+
+    def stepStartTime(self, step):
+        return self.t0 + step*self.dwell
+
+    def waitForStep(self, step, delay=0.):
+        '''
+            waitForStep blocks until the requested delay has elapsed since the start of a step.
+
+            RETURNS
+            ----------
+            onTime (bool) - False when the step had already ended, i.e. the reads of the previous step overran
+        '''
+        target = self.stepStartTime(step)+delay
+        remaining = target-clock.now()
+        if remaining > 0:
+            clock.sleep(remaining)
+
+        onTime = (clock.now() < self.stepStartTime(step+1))
+        if not onTime:
+            self.overruns += 1
+        return onTime
+
+    def currentStep(self):
+        '''
+            RETURNS
+            ----------
+            step (int) - step on the output from the time elapsed since the start of the scan and its sample rate,
+                         -1 before the start, the last step once the whole waveform was played
+        '''
+        if self.t0 is None:
+            return -1
+        return min(int((clock.now()-self.t0)/self.dwell), len(self.currents)-1)
+
+    def isOnStep(self, step):
+        '''
+            RETURNS
+            ----------
+            onStep (bool) - True while the DAQ is still scanning and holds the control voltage of step on the output
+        '''
+        return (not self.stopped) and self.backend.isScanning() and (self.currentStep() == step)
+
+    def stop(self):
+        '''
+            stop ends the scan and sets the control voltage to zero, further calls do nothing.
+        '''
+        if self.stopped:
+            return
+        self.stopped = True
+        try:
+            self.backend.stopScan()
+        finally:
+            self.backend.output(0.)
@@ -1,6 +1,8 @@
-from configure import load_json
-import os, re, serial, socket
+from configservice import config
+import re, time, serial, socket
 from PyQt5.QtCore import QMutex
+import iotrace
+from iometrics import IOMetrics, isTimeout
 
 '''
     A generic class for reading data and sending commands with hardware devices.
@@ -18,11 +20,12 @@ class Device:
         self.waitLock = waitLock
         self.ser, self.serialDevice = None, serialDevice
         self.mutex = QMutex()
-        self.settings = load_json('hwparams.json', location=os.getcwd()+'/config')['devices'][device]
+        self.settings = config.get('hwparams.json')['devices'][device]
+        self.metrics = IOMetrics(self.settings['name'])
 
         if self.serialDevice:
             try:
-                self.ser = serial.Serial(self.settings['port'], baudrate=self.settings['baudrate'], bytesize=self.settings['bytesize'], stopbits=self.settings['stopbits'], parity=self.settings['parity'], xonxoff=self.settings['xonxoff'], timeout=self.settings['timeout'])
+                self.ser = iotrace.openPort(self.settings['name'], lambda: serial.Serial(self.settings['port'], baudrate=self.settings['baudrate'], bytesize=self.settings['bytesize'], stopbits=self.settings['stopbits'], parity=self.settings['parity'], xonxoff=self.settings['xonxoff'], timeout=self.settings['timeout']))
                 if not self.testConnection(vb=vb):
                     self.ser.close()
                     self.ser = None
@@ -31,7 +34,7 @@ class Device:
                 print('WARNING: port {} was not connected'.format(self.settings['port']))
         else:
             try:
-                self.ser = socket.socket(socket.AF_INET, socket.SOCK_STREAM)     # TCP
+                self.ser = iotrace.openPort(self.settings['name'], lambda: socket.socket(socket.AF_INET, socket.SOCK_STREAM))     # TCP
                 self.ser.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
                 self.ser.connect((self.settings['ip'], self.settings['ethernet_port']))
                 self.closeSocket()
@@ -82,7 +85,10 @@ class Device:
             command (str) - the device specific serial communication command without ending characters.
     '''
     def write(self, command):
+        start = time.perf_counter()
         self.mutex.lock()
+        self.metrics.recordLock(time.perf_counter()-start)
+        start = time.perf_counter()
         try:
             if self.ser is not None:
                 if self.serialDevice:
@@ -91,7 +97,9 @@ class Device:
                     self.openSocket()
                     self.ser.sendall(bytes(command+self.settings['ending'], 'utf-8'))
                     self.closeSocket()
+                self.metrics.recordCall(command, time.perf_counter()-start)
         except Exception as e:
+            self.metrics.recordCall(command, time.perf_counter()-start, timedOut=isTimeout(e), failed=not isTimeout(e))
             print("{} {}".format(self.settings['name'], e))
         finally:
             #pass
@@ -105,8 +113,11 @@ class Device:
             response (str) - the expected reply from the hardware device or an empty string.
     '''
     def read(self, command):
-        response = ''
-        if self.mutex.tryLock(self.waitLock):
+        response, start = '', time.perf_counter()
+        locked = self.mutex.tryLock(self.waitLock)
+        self.metrics.recordLock(time.perf_counter()-start, acquired=locked)
+        if locked:
+            start = time.perf_counter()
             try:
                 if self.ser is not None:
                     if self.serialDevice:
@@ -122,7 +133,9 @@ class Device:
                                 response = response.strip()
                                 listening = False
                         self.closeSocket()
+                    self.metrics.recordCall(command, time.perf_counter()-start, timedOut=(response == ''))
             except Exception as e:
+                self.metrics.recordCall(command, time.perf_counter()-start, timedOut=isTimeout(e), failed=not isTimeout(e))
                 print('While reading {} from {}, SerialDevice:read raised:'.format(command, self.settings['name']), e)
                 response = ''
             finally:
@@ -132,8 +145,28 @@ class Device:
             print('{} not locking while attempting {}'.format(self.settings['name'], command))
         return response
     
+    def fullmatch(self, pattern, response, command=''):
+        '''
+            fullmatch checks a response against one of the *_pattern regular expressions of the device and counts the
+            responses that do not match.
+
+            INPUTS
+            ----------
+            pattern (str) - key of the pattern in the settings of the device, e.g. krdg0_pattern
+            response (str) - response of the device
+            command (str) - command that got the response, the pattern name by default
+
+            RETURNS
+            ----------
+            match (re.Match) - None if the response does not match
+        '''
+        match = re.fullmatch(self.settings[pattern], response)
+        if match is None:
+            self.metrics.recordMalformed(command or pattern)
+        return match
+
     def openSocket(self):
-        self.ser = socket.socket(socket.AF_INET, socket.SOCK_STREAM)     # TCP
+        self.ser = iotrace.openPort(self.settings['name'], lambda: socket.socket(socket.AF_INET, socket.SOCK_STREAM))     # TCP
         self.ser.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.ser.connect((self.settings['ip'], self.settings['ethernet_port']))
     
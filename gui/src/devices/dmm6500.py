@@ -1,6 +1,8 @@
-import usbtmc, numpy, re
+import usbtmc, numpy, re, time
 import inspect
 from PyQt5.QtCore import QMutex
+import iotrace
+from iometrics import IOMetrics
 
 class DMM6500:
     '''
@@ -19,8 +21,9 @@ class DMM6500:
         self.rshunt = rshunt
         self.inUse = False
         self.mutex = QMutex()
+        self.metrics, self.ser = IOMetrics('DMM6500'), None
         try:
-            self.ser = usbtmc.Instrument(1510, 25856)
+            self.ser = iotrace.openPort('DMM6500', lambda: usbtmc.Instrument(1510, 25856))
             print('DMM6500 connected!')
             
         except Exception as e:
@@ -50,7 +53,7 @@ class DMM6500:
             command (str) - the device specific serial communication command without ending characters.
     '''
     def write(self, command):
-        self.ser.ask(command)
+        self.metrics.timeCall(command, self.ser.write, command)
             
     '''
         Sends a command that expects a reply.
@@ -60,8 +63,20 @@ class DMM6500:
             response (str) - the expected reply from the hardware device or an empty string.
     '''
     def read(self, command):
-        return self.ser.ask(command)
+        return self.metrics.timeCall(command, self.ser.ask, command)
     
+    def lock(self):
+        '''
+            lock waits at most waitLock ms for the mutex and records the wait.
+
+            @returns:
+                locked (bool) - the mutex was acquired.
+        '''
+        start = time.perf_counter()
+        locked = self.mutex.tryLock(self.waitLock)
+        self.metrics.recordLock(time.perf_counter()-start, acquired=locked)
+        return locked
+
     '''
         Requests a current measurement. The DMM6500 measures a voltage which
         is divided by resistance of the shunt resistor to give a current.
@@ -71,12 +86,13 @@ class DMM6500:
     '''
     def measure(self):
         r, current = '', numpy.nan
-        if self.mutex.tryLock(self.waitLock):
+        if self.lock():
             try:
                 r = self.read(':READ?')
                 if re.fullmatch("[-+]?[0-9]\\.[0-9]*E[-+][0-9][0-9]", r) is not None:
                     current = float(r)/self.rshunt
                 else:
+                    self.metrics.recordMalformed(':READ?')
                     print('DMM6500::measure received string with incorrect format')
                     print('Value returned by :READ? is ', r, 'of type ', type(r))
             except Exception as e:
@@ -88,3 +104,70 @@ class DMM6500:
                 #pass
                 self.mutex.unlock()
         return current
+
+    def armTriggerLink(self, count, software=False, period=0.):
+        '''
+            Loads a trigger model that takes count readings into defbuffer1. Before each reading the
+            model pulses the external trigger output, which triggers the 2182A through the trigger link
+            so that the current and the voltage of a pair are sampled together.
+
+            @inputs:
+                count (int) - number of pairs
+                software (bool) - wait for *TRG before each reading instead of pacing with period
+                period (float) - delay between readings in seconds when software is False
+        '''
+        commands = [':ABOR', ':TRAC:CLE "defbuffer1"', ':TRIG:LOAD "Empty"', ':TRIG:BLOC:BUFF:CLE 1']
+        if software:
+            commands.append(':TRIG:BLOC:WAIT 2, COMM')
+        else:
+            commands.append(':TRIG:BLOC:DEL:CONS 2, {:f}'.format(period))
+        commands += [':TRIG:BLOC:NOT 3, 1', ':TRIG:BLOC:MEAS 4, "defbuffer1"', ':TRIG:BLOC:BRAN:COUN 5, {}, 2'.format(count), ':TRIG:EXT:OUT:STIM NOT1']
+        for command in commands:
+            self.write(command)
+
+    def rearmTriggerLink(self):
+        '''
+            Clears the buffer so that the trigger model loaded by armTriggerLink can run again after initiate.
+        '''
+        self.write(':TRAC:CLE "defbuffer1"')
+
+    def initiate(self):
+        self.write(':INIT')
+
+    def trigger(self):
+        self.write('*TRG')
+
+    def fetchTriggerLink(self, count, timeout=5.):
+        '''
+            Waits for the trigger model to complete and returns the buffer in one transfer.
+
+            @returns:
+                currents (float, array) - currents in amps, NaN if the buffer did not fill in time.
+                times (float, array) - time of each reading in seconds, relative to the first one.
+        '''
+        currents, times = numpy.full(count, numpy.nan), numpy.full(count, numpy.nan)
+        if self.lock():
+            try:
+                t0 = time.time()
+                while (time.time()-t0) < timeout:
+                    r = self.read(':TRAC:ACT? "defbuffer1"')
+                    if r.isdigit() and (int(r) >= count):
+                        break
+                    time.sleep(.01)
+                r = self.read(':TRAC:DATA? 1, {}, "defbuffer1", READ, REL'.format(count)).split(',')
+                for k in range(min(count, len(r)//2)):
+                    if re.fullmatch("[-+]?[0-9]\\.[0-9]*E[-+][0-9][0-9]", r[2*k]) is not None:
+                        currents[k] = float(r[2*k])/self.rshunt
+                        times[k] = float(r[2*k+1])
+                    else:
+                        self.metrics.recordMalformed(':TRAC:DATA?')
+                        print('DMM6500::fetchTriggerLink received string with incorrect format: ', r[2*k])
+            except Exception as e:
+                print('DMM6500::fetchTriggerLink raised: ', e)
+            finally:
+                self.mutex.unlock()
+        return currents, times
+
+    def disarmTriggerLink(self):
+        self.write(':ABOR')
+        self.write(':TRIG:EXT:OUT:STIM NONE')
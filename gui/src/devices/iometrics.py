@@ -0,0 +1,149 @@
+import re, time, socket, threading, collections
+import numpy as np
+import tracing
+
+'''
+    I/O and lock metrics of the devices.
+
+    Each device holds an IOMetrics that records, per command, the round-trip time of its calls in a histogram, the
+    timeouts, the errors and the responses rejected by the *_pattern checks, and for the device the time spent waiting
+    for its mutex and the tryLock calls that gave up. The counters are cheap enough to stay on during measurements;
+    getSnapshot returns them as plain Python types so that they can be sent by the acquisition process. The calls and
+    the contended locks are also spans of the timeline, see tracing.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+LATENCY_EDGES = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000] # ms, upper edges of the histogram bins, the last bin is open
+
+
+def getCommandKey(command):
+    '''
+        getCommandKey groups the commands that differ only by their numerical arguments, e.g. SETP 1,20.5 and SETP 1,4.2
+
+        RETURNS
+        ----------
+        key (str) - command with each number replaced by #
+    '''
+    if isinstance(command, (bytes, bytearray)):
+        command = bytes(command).decode('utf-8', 'replace')
+    return re.sub(r'[-+]?\d+(\.\d*)?([eE][-+]?\d+)?', '#', str(command).strip())
+
+def isTimeout(exception):
+    return isinstance(exception, (socket.timeout, TimeoutError)) or ('timed out' in str(exception).lower()) or ('timeout' in str(exception).lower())
+
+def getPercentile(histogram, q):
+    '''
+        RETURNS
+        ----------
+        latency (float) - upper edge in ms of the bin that holds the q-th percentile, inf if it is the open bin
+    '''
+    counts = np.cumsum(histogram)
+    if not counts[-1]:
+        return np.nan
+    index = int(np.searchsorted(counts, q/100.*counts[-1]))
+    return float(LATENCY_EDGES[index]) if index < len(LATENCY_EDGES) else np.inf
+
+
+class IOMetrics:
+    '''
+        IOMetrics collects the metrics of one device.
+
+        INPUTS
+        ----------
+        device (str) - name of the device
+    '''
+    def __init__(self, device):
+        self.device = device
+        self.mutex = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.mutex:
+            self.commands = collections.defaultdict(lambda: {'count': 0, 'histogram': [0]*(len(LATENCY_EDGES)+1), 'total': 0., 'max': 0., 'timeouts': 0, 'errors': 0, 'malformed': 0})
+            self.lockWait, self.lockWaitMax, self.locks, self.failedLocks = 0., 0., 0, 0
+
+    def recordCall(self, command, seconds, timedOut=False, failed=False):
+        '''
+            recordCall records the round trip of a command.
+
+            INPUTS
+            ----------
+            command (str) - command sent to the device
+            seconds (float) - time from sending the command to the end of the response
+            timedOut (bool) - the device did not answer in time
+            failed (bool) - the call raised
+        '''
+        ms = 1e3*seconds
+        tracing.complete(str(command).strip(), 'io', seconds, device=self.device, timedOut=timedOut, failed=failed)
+        with self.mutex:
+            stats = self.commands[getCommandKey(command)]
+            stats['count'] += 1
+            stats['histogram'][int(np.searchsorted(LATENCY_EDGES, ms))] += 1
+            stats['total'] += ms
+            stats['max'] = max(stats['max'], ms)
+            stats['timeouts'] += int(timedOut)
+            stats['errors'] += int(failed)
+
+    def recordMalformed(self, command):
+        '''
+            recordMalformed counts a response of command that did not match its pattern.
+        '''
+        with self.mutex:
+            self.commands[getCommandKey(command)]['malformed'] += 1
+
+    def recordLock(self, seconds, acquired=True):
+        '''
+            recordLock records the time spent waiting for the mutex of the device, and whether it was acquired.
+        '''
+        if (seconds > 1e-3) or not acquired: # uncontended locks would crowd the timeline
+            tracing.complete('lock', 'lock', seconds, device=self.device, acquired=acquired)
+        with self.mutex:
+            self.lockWait += seconds
+            self.lockWaitMax = max(self.lockWaitMax, seconds)
+            self.locks += 1
+            self.failedLocks += int(not acquired)
+
+    def timeCall(self, command, call, *args, **kwargs):
+        '''
+            timeCall runs call(*args, **kwargs) and records it as a round trip of command; exceptions are recorded and raised.
+        '''
+        start = time.perf_counter()
+        try:
+            result = call(*args, **kwargs)
+        except Exception as e:
+            self.recordCall(command, time.perf_counter()-start, timedOut=isTimeout(e), failed=not isTimeout(e))
+            raise
+        self.recordCall(command, time.perf_counter()-start)
+        return result
+
+    def getSnapshot(self):
+        '''
+            RETURNS
+            ----------
+            snapshot (dict) - 'device', 'commands' (command: count, histogram, mean, p50, p95, max in ms, timeouts, errors,
+                              malformed), the totals over the commands and the lock metrics (wait in ms)
+        '''
+        with self.mutex:
+            commands = {}
+            for command, stats in self.commands.items():
+                commands[command] = dict(stats, histogram=list(stats['histogram']),
+                                         mean=stats['total']/stats['count'] if stats['count'] else np.nan,
+                                         p50=getPercentile(stats['histogram'], 50), p95=getPercentile(stats['histogram'], 95))
+            histogram = np.sum([stats['histogram'] for stats in commands.values()], axis=0) if commands else np.zeros(len(LATENCY_EDGES)+1, dtype=int)
+            return {
+                'device': self.device,
+                'commands': commands,
+                'calls': int(np.sum([stats['count'] for stats in commands.values()])),
+                'p50': getPercentile(histogram, 50),
+                'p95': getPercentile(histogram, 95),
+                'max': max([stats['max'] for stats in commands.values()] + [0.]),
+                'timeouts': int(np.sum([stats['timeouts'] for stats in commands.values()])),
+                'errors': int(np.sum([stats['errors'] for stats in commands.values()])),
+                'malformed': int(np.sum([stats['malformed'] for stats in commands.values()])),
+                'locks': self.locks,
+                'failedLocks': self.failedLocks,
+                'lockWait': 1e3*self.lockWait,
+                'lockWaitMax': 1e3*self.lockWaitMax,
+            }
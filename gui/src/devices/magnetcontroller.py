@@ -1,4 +1,4 @@
-import numpy, re, time
+import numpy, time
 from device import Device
 
 '''
@@ -39,12 +39,12 @@ class MagnetController(Device):
         except Exception as e:
             print('MagneticFieldController::set_magnetic_field raised: ', e)
 
-    def get_setpoint_magnetic_field(self, vb):
+    def get_setpoint_magnetic_field(self, vb=False):
         setpoint = numpy.nan
         try:
             r = self.read("FIELD:TARGet?")
             if vb: print('DEBUG: The read setpoint command read: ', r)
-            if re.fullmatch(self.settings["setp_pattern"], r) is not None:
+            if self.fullmatch("setp_pattern", r, "FIELD:TARGet?") is not None:
                 setpoint = float(r)
             if vb: print('DEBUG: The stripped value is: ', setpoint)
         except Exception as e:
@@ -57,7 +57,7 @@ class MagnetController(Device):
         try:
             r = self.read("CURRent:MAGnet?")
             if vb: print('The read field command read: ', r)
-            if re.fullmatch(self.settings["setp_pattern"], r) is not None:
+            if self.fullmatch("setp_pattern", r, "CURRent:MAGnet?") is not None:
                 central_field = float(r)*self.coil_constant
             if vb: print('The stripped value is ', central_field)
         except Exception as e:
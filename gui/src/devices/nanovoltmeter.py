@@ -1,4 +1,4 @@
-import numpy, re, time
+import numpy, time
 from device import Device
 
 '''
@@ -62,7 +62,20 @@ class NanoVoltmeter(Device):
         @returns:
             voltage (float) - voltage in volts.
         """
-        voltages, n = [], 20
+        offset, std = self.measureOffset(n=20)
+        if not numpy.isnan(offset):
+            self.offset = offset
+        return self.offset
+    
+    def measureOffset(self, n=20):
+        """
+        measureOffset averages n voltage measurements at zero current without changing the offset in use.
+        
+        @returns:
+            offset (float) - mean voltage in volts, NaN if all measurements failed.
+            std (float) - standard deviation of the measurements in volts.
+        """
+        voltages = []
         
         for k in range(n):
             try:
@@ -70,17 +83,16 @@ class NanoVoltmeter(Device):
                 if v is not numpy.nan:
                     voltages.append(v)
             except Exception as e:
-                print('Exception raised in setOffset:', e)
+                print('Exception raised in measureOffset:', e)
                 print(type(voltages), voltages)
 
-        if voltages is not []:
+        if len(voltages) > 0:
             voltages = numpy.array(voltages)*self.polarity
             std = numpy.nanstd(voltages)
             median = numpy.nanmedian(voltages)
-            self.offset = numpy.nanmean(voltages[((median - std) < voltages) & (voltages < (median+std))]) # prevents abnormal offsets due to large fluctuations
-        else:
-            print('NanoVoltmeter::setOffset raised: all voltage measurements failed')
-        return self.offset
+            return numpy.nanmean(voltages[((median - std) < voltages) & (voltages < (median+std))]), std # prevents abnormal offsets due to large fluctuations
+        print('NanoVoltmeter::measureOffset raised: all voltage measurements failed')
+        return numpy.nan, numpy.nan
     
     def measure(self, removeOffset=True, vb=True):    
         """
@@ -95,7 +107,7 @@ class NanoVoltmeter(Device):
         r, voltage = '', numpy.nan
         try:
             r = self.read(':sense:data:fresh?')
-            if re.fullmatch(self.settings["fresh_pattern"], r) is not None:
+            if self.fullmatch("fresh_pattern", r, ":sense:data:fresh?") is not None:
                 voltage = float(r)
                 if removeOffset:
                     voltage -= self.offset
@@ -111,6 +123,73 @@ class NanoVoltmeter(Device):
 
         return voltage*self.polarity
     
+    def armTriggerLink(self, count, source='ext'):
+        """
+        Prepares the nanovoltmeter to store one reading per trigger in its buffer, instead of free running.
+        With source='ext' the readings are triggered by the DMM6500 through the trigger link cable,
+        with source='bus' they are triggered by *TRG (see trigger).
+
+        @inputs:
+            count (int) - number of readings to store before the buffer is fetched.
+            source (str) - 'ext' or 'bus'
+        """
+        self.write(':init:cont off;:abor')
+        self.write(':trac:cle')
+        self.write(':trac:poin {}'.format(count))
+        self.write(':trac:feed sens')
+        self.write(':trac:feed:cont next')
+        self.write(':trig:sour {}'.format(source))
+        self.write(':trig:coun {}'.format(count))
+        self.write(':init')
+
+    def rearmTriggerLink(self):
+        """
+        Clears the buffer and waits for the triggers again, keeping the configuration of armTriggerLink.
+        """
+        self.write(':abor')
+        self.write(':trac:cle')
+        self.write(':trac:feed:cont next')
+        self.write(':init')
+
+    def trigger(self):
+        self.write('*trg')
+
+    def fetchTriggerLink(self, count, removeOffset=True, timeout=5.):
+        """
+        Waits for the buffer armed by armTriggerLink to fill and returns all readings in one transfer.
+
+        @returns:
+            voltages (float, array) - voltages in volts, NaN if the buffer did not fill in time.
+        """
+        voltages, t0 = numpy.full(count, numpy.nan), time.time()
+        try:
+            while (time.time()-t0) < timeout:
+                r = self.read(':trac:poin:act?')
+                if r.isdigit() and (int(r) >= count):
+                    break
+                time.sleep(.01)
+            r = self.read(':trac:data?').split(',')
+            for k, value in enumerate(r[:count]):
+                if self.fullmatch("fresh_pattern", value, ":trac:data?") is not None:
+                    voltages[k] = float(value)
+                else:
+                    print('Nanovoltmeter::fetchTriggerLink received string with incorrect format: ', value)
+            if removeOffset:
+                voltages -= self.offset
+        except Exception as e:
+            print('Nanovoltmeter::fetchTriggerLink raised: ', e)
+        return voltages*self.polarity
+
+    def disarmTriggerLink(self):
+        """
+        Returns the nanovoltmeter to the free running mode set by initialize.
+        """
+        self.write(':abor')
+        self.write(':trac:feed:cont nev')
+        self.write(':trig:sour imm')
+        self.write(':trig:coun inf')
+        self.write(':init')
+
     def display_text(self, text, delay):
         """
         Displays a text on the physical display, scrolling left.
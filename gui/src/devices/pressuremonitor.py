@@ -1,4 +1,4 @@
-import numpy, re
+import numpy
 from device import Device
 
 '''
@@ -26,7 +26,7 @@ class PressureMonitor(Device):
         self.igOn = False
         try:
             r = self.read("#01IG4S")
-            if re.fullmatch(self.settings["ig3s_pattern"], r) is not None:
+            if self.fullmatch("ig3s_pattern", r, "#01IG4S") is not None:
                 self.igOn = bool(float(r[4])) # the pattern is 0 or 1 preceeded by * and three whitespaces
             else:
                 print('PressureMonitor::testIgOn received string with incorrect format')
@@ -49,7 +49,7 @@ class PressureMonitor(Device):
             if self.igOn:
                 command = "#01RDIG4"
             r = self.read(command)
-            if re.fullmatch(self.settings["RD_pattern"], r) is not None:
+            if self.fullmatch("RD_pattern", r, command) is not None:
                 pressure = float(r[3:]) # float value preceeded by * and three whitespaces
             else:
                 print('PressureMonitor::getPressure received string with incorrect format')
@@ -1,4 +1,7 @@
 import serial, time
+from configservice import config
+import iotrace
+from iometrics import IOMetrics
 
 RELAYBOARD_ADDR_100A_SAMPLE = 0   # checked 14/03/2023
 RELAYBOARD_ADDR_100mA_SAMPLE = 1  # checked 14/03/2023
@@ -19,7 +22,9 @@ class Relays:
         '''
             __init__ instantiates an object of class Relays
         '''
-        self.ser = serial.Serial('/dev/ttyACM0', 19200, timeout=1)
+        port = config.get('hwparams.json').get('relays_port', '/dev/ttyACM0')
+        self.metrics = IOMetrics('Relays')
+        self.ser = iotrace.openPort('Relays', lambda: serial.Serial(port, 19200, timeout=1))
         
         self.measureSampleWith(device='nanovoltmeter')
         self.connectCurrentSource100mATo(device='hallSensor')
@@ -52,7 +57,8 @@ class Relays:
         else:
             index = chr(55 + int(index))
 
-        self.ser.write(bytes("relay {} {}\r".format(state, index), 'utf-8'))
+        command = "relay {} {}\r".format(state, index)
+        self.metrics.timeCall(command, self.ser.write, bytes(command, 'utf-8'))
     
     def getRelayState(self, index):
         '''
@@ -69,9 +75,15 @@ class Relays:
         else:
             index = chr(55 + int(index))
 
-        state = -1
-        self.ser.write(bytes('relay read {}\r'.format(index), 'utf-8'))
-        r = str(self.ser.read(200).decode('utf-8').strip()).split('\n\r')[-2]
+        state, command = -1, 'relay read {}\r'.format(index)
+        start = time.perf_counter()
+        self.ser.write(bytes(command, 'utf-8'))
+        response = self.ser.read(200).decode('utf-8').strip()
+        self.metrics.recordCall(command, time.perf_counter()-start, timedOut=(response == ''))
+        lines = str(response).split('\n\r')
+        if response and (len(lines) < 2):
+            self.metrics.recordMalformed(command)
+        r = lines[-2]
         if 'on' in r:
             state = 0
         elif 'off' in r:
@@ -1,4 +1,4 @@
-import numpy, time, re
+import numpy, time
 from device import Device
 
 class TemperatureController(Device):
@@ -23,7 +23,7 @@ class TemperatureController(Device):
         d = [numpy.nan, numpy.nan, numpy.nan, numpy.nan]
         try:
             r = self.read("KRDG? 0") # 
-            if re.fullmatch(self.settings["krdg0_pattern"], r) is not None:
+            if self.fullmatch("krdg0_pattern", r, "KRDG? 0") is not None:
                 d = [float(s) for s in r.split(',')]
         except Exception as e:
             print('TemperatureController::getTemperatureReadings raised:', e)
@@ -49,7 +49,7 @@ class TemperatureController(Device):
         temperature = numpy.nan
         try:
             r = self.read("KRDG? a")
-            if re.fullmatch(self.settings["krdga_pattern"], r) is not None:
+            if self.fullmatch("krdga_pattern", r, "KRDG? a") is not None:
                 temperature = float(r)
         except Exception as e:
             print('TemperatureController::getSampleTemperature raised:', e)
@@ -65,7 +65,7 @@ class TemperatureController(Device):
         temperature = numpy.nan
         try:
             r = self.read("KRDG? b")
-            if re.fullmatch(self.settings["krdga_pattern"], r) is not None:
+            if self.fullmatch("krdga_pattern", r, "KRDG? b") is not None:
                 temperature = float(r)
         except Exception as e:
             print('TemperatureController::getTargetTemperature raised:', e)
@@ -81,7 +81,7 @@ class TemperatureController(Device):
         power = numpy.nan
         try:
             r = self.read('AOUT? 3') # heaterVoltagePercent
-            if re.fullmatch(self.settings["aout_pattern"], r) is not None:
+            if self.fullmatch("aout_pattern", r, "AOUT? 3") is not None:
                 power = (120.*float(r)/100.)**2/36 # R_eff = 36 Ohm, V_lim = 120 V
         except Exception as e:
             print('TemperatureController::getHeatingPower raised:', e)
@@ -97,7 +97,7 @@ class TemperatureController(Device):
         setpoint = numpy.nan
         try:
             r = self.read("SETP? 3")
-            if re.fullmatch(self.settings["setp_pattern"], r) is not None:
+            if self.fullmatch("setp_pattern", r, "SETP? 3") is not None:
                 setpoint = float(r)
         except Exception as e:
             print('TemperatureController::getSetpointTemperature raised:', e)
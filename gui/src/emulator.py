@@ -0,0 +1,465 @@
+import os, re, sys, json, time, errno, select, socket, termios, tempfile, threading
+import numpy as np
+
+from configure import load_json
+from simulation import ThermalModel, MagnetModel, VacuumModel, SampleModel, SENSORS
+
+'''
+    Instrument emulator.
+
+    InstrumentServer answers the command sets used by the device classes (TemperatureController, NanoVoltmeter,
+    CurrentSource100mA, PressureMonitor, VoltageSource, CurrentSourceCAEN, MagnetController and Relays) with the
+    physical models of simulation.py. Each serial instrument is served on a pseudo-terminal pair and each instrument
+    with an ethernet port on a localhost socket. Responses are delayed by the latency of the instrument and, on the
+    pseudo-terminals, by the transmission time of the request and the response at the baud rate of hwparams.json.
+
+    The server writes a copy of hwparams.json whose ports and addresses point to the emulated instruments. The GUI
+    and the acquisition daemon use it when the HTS_HWPARAMS environment variable holds its path, e.g.
+
+        python main.py --emulator &                    # prints the path of the emulated hwparams.json
+        HTS_HWPARAMS=/tmp/.../hwparams.json python main.py
+
+    The DMM6500 is a USBTMC instrument and is not emulated.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+LATENCIES = { # s, typical time between the end of a query and the start of the response
+    'temperature_controller': .05,
+    'nanovoltmeter': .1,        # one reading at 1 NPLC with front autozero
+    'current_source_tc': .02,
+    'pressure_monitor': .03,
+    'voltagesource': .02,
+    'current_source_caen': .005,
+    'magnet_controller': .02,
+    'relays': .005,
+}
+RELAYS_BAUDRATE = 19200
+
+
+class EmulatedInstrument:
+    '''
+        EmulatedInstrument answers the commands of one instrument. handle returns the response to a query,
+        or None for commands that do not reply.
+
+        INPUTS
+        ----------
+        settings (dict) - entry of the instrument in hwparams.json
+        latency (float) - delay before each response in seconds
+    '''
+    identity = ''
+
+    def __init__(self, settings, latency=0.):
+        self.settings, self.latency = settings, latency
+        self.ending = settings.get('ending', '\n')
+
+    def handle(self, command):
+        if command == self.settings.get('greeting'):
+            return self.identity
+        return self.query(command)
+
+    def query(self, command):
+        return None
+
+    def frame(self, command, response):
+        '''
+            frame returns the bytes sent back for a command, the response followed by the line ending.
+        '''
+        return None if response is None else (response+self.ending).encode()
+
+
+class EmulatedTemperatureController(EmulatedInstrument):
+    identity = 'LSCI,MODEL336,EMULATED,1.0'
+
+    def __init__(self, settings, thermal, latency=0.):
+        super().__init__(settings, latency)
+        self.thermal = thermal
+
+    def query(self, command):
+        thermal, words = self.thermal, re.split(r'[\s,]+', command)
+        if command == 'KRDG? 0':
+            return ','.join(['{:+08.3f}'.format(t) for t in thermal.getReadings()])
+        if command.upper() in ('KRDG? A', 'KRDG? B', 'KRDG? C', 'KRDG? D'):
+            return '{:+08.3f}'.format(thermal.getReadings()[SENSORS[command[-1].upper()]-1])
+        if command == 'AOUT? 3':
+            return '{:.1f}'.format(np.sqrt(36*thermal.getHeatingPower())/1.2) # percent of the 120 V output across 36 ohm
+        if command == 'SETP? 3':
+            with thermal.mutex:
+                thermal.update()
+                return '{:+08.3f}'.format(thermal.rampSetpoint)
+        if command == 'OUTMODE? 3':
+            return '1,{},0'.format(thermal.pidSensor)
+        if command == 'RAMPST? 3':
+            return '1' if thermal.ramping and (thermal.rampSetpoint != thermal.setpoint) else '0'
+        if command.startswith('INCRV?'):
+            return '21'
+        with thermal.mutex:
+            thermal.update()
+            if words[0] == 'SETP':
+                thermal.setpoint = float(words[2])
+            elif words[0] == 'OUTMODE':
+                thermal.pidSensor = int(words[3])
+            elif words[0] == 'RANGE':
+                thermal.heaterOn = int(words[2]) > 0
+            elif words[0] == 'RAMP':
+                thermal.ramping, thermal.rampRate = words[2] == '1', float(words[3])
+        return None
+
+
+class EmulatedNanoVoltmeter(EmulatedInstrument):
+    identity = 'KEITHLEY INSTRUMENTS INC.,MODEL 2182A,EMULATED,1.0'
+
+    def __init__(self, settings, sample, latency=0.):
+        super().__init__(settings, latency)
+        self.sample, self.points = sample, 1
+
+    def query(self, command):
+        command = command.lower()
+        if command == ':sense:data:fresh?':
+            return '{:+.9E}'.format(self.sample.getVoltage())
+        if command == ':trac:poin:act?':
+            return str(self.points)
+        if command == ':trac:data?':
+            return ','.join(['{:+.9E}'.format(self.sample.getVoltage()) for k in range(self.points)])
+        if command.startswith(':trac:poin '):
+            self.points = int(command.split()[1])
+        return None
+
+
+class EmulatedCurrentSource100mA(EmulatedInstrument):
+    identity = 'LSCI,MODEL121,EMULATED,1.0'
+
+    def __init__(self, settings, sample, latency=0.):
+        super().__init__(settings, latency)
+        self.sample = sample
+
+    def query(self, command):
+        words = command.split()
+        if command == 'IENBL?':
+            return '1' if self.sample.smallEnabled else '0'
+        if words[0] == 'SETI':
+            self.sample.smallCurrent = float(words[1])
+        elif words[0] == 'IPOL':
+            self.sample.smallPolarity = 1 if words[1] == '0' else -1
+        elif words[0] == 'IENBL':
+            self.sample.smallEnabled = words[1] == '1'
+        return None
+
+
+class EmulatedPressureMonitor(EmulatedInstrument):
+    identity = '?   SYNTX ER' # the FlexRax answers the greeting with a syntax error
+
+    def __init__(self, settings, vacuum, latency=0.):
+        super().__init__(settings, latency)
+        self.vacuum = vacuum
+
+    def query(self, command):
+        if command == '#01IG4S':
+            return '*   1 IG ON' if self.vacuum.update() < 1e-3 else '*   0 IG OFF'
+        if command in ('#01RDIG4', '#01RDCG1'):
+            return '*   {:.2E}'.format(self.vacuum.update())
+        return '?   SYNTX ER'
+
+
+class EmulatedVoltageSource(EmulatedInstrument):
+    '''
+        EmulatedVoltageSource drives the large current of the sample: channel 3 is the control voltage of the HP6260B,
+        turned into a current with the calibration of hwparams.json, and channel 1 at 30 V is the 6 A supply.
+    '''
+    identity = 'Keithley instruments, 2231A-30-3, EMULATED, 1.0'
+
+    def __init__(self, settings, sample, calibration, latency=0.):
+        super().__init__(settings, latency)
+        self.sample, (self.a, self.b, self.shuntR) = sample, calibration
+
+    def query(self, command):
+        match = re.fullmatch(r'APPLY CH(\d),([-+.\d]+)(?:,([-+.\d]+))?', command)
+        if match is not None:
+            channel, value, current = int(match.group(1)), float(match.group(2)), match.group(3)
+            if current is not None:
+                self.sample.largeCurrent = float(current)
+            elif channel == 3:
+                self.sample.largeCurrent = max((self.a*value+self.b)/self.shuntR, 0.)
+        return None
+
+
+class EmulatedCurrentSourceCAEN(EmulatedInstrument):
+    identity = '#VER:FAST-PS-M 10006:EMULATED'
+
+    def __init__(self, settings, sample, latency=0.):
+        super().__init__(settings, latency)
+        self.sample, self.on, self.current = sample, False, 0.
+
+    def query(self, command):
+        if command == 'MRI':
+            return '#MRI:{:.4f}'.format(self.current if self.on else 0.)
+        if command.startswith('MWI:'):
+            self.current = float(command[4:])
+        elif command in ('MON', 'MOFF'):
+            self.on = (command == 'MON')
+        else:
+            return None
+        self.sample.largeCurrent = self.current if self.on else 0.
+        return None
+
+
+class EmulatedMagnetController(EmulatedInstrument):
+    identity = 'AMERICAN MAGNETICS INC.,MODEL 430,EMULATED'
+    COIL_CONSTANT = .1 # T/A
+
+    def __init__(self, settings, magnet, latency=0.):
+        super().__init__(settings, latency)
+        self.magnet, self.pendingTarget = magnet, 0.
+
+    def query(self, command):
+        if command == 'COILconst?':
+            return '{:.4f}'.format(self.COIL_CONSTANT)
+        if command == 'FIELD:TARGet?':
+            return '{:.4f}'.format(self.magnet.target)
+        if command == 'CURRent:MAGnet?':
+            return '{:.4f}'.format(self.magnet.update()/self.COIL_CONSTANT)
+        if command == 'STATE?':
+            return str(self.magnet.getState())
+        if command.startswith('CONFigure:FIELD:TARGet '):
+            self.pendingTarget = float(command.split()[1])
+        elif command == 'RAMP':
+            self.magnet.update()
+            self.magnet.target = self.pendingTarget
+        return None
+
+
+class EmulatedRelayBoard(EmulatedInstrument):
+    '''
+        EmulatedRelayBoard follows the Numato protocol: every command is echoed, 'relay read' also returns the
+        state, and each answer ends with the '>' prompt.
+    '''
+    def __init__(self, thermal, vacuum, sample, latency=0.):
+        super().__init__({'ending': '\r'}, latency)
+        self.thermal, self.vacuum, self.sample = thermal, vacuum, sample
+        self.states = {}
+
+    def handle(self, command):
+        words = command.split()
+        if (len(words) != 3) or (words[0] != 'relay'):
+            return ''
+        index = int(words[2]) if words[2].isdigit() else ord(words[2])-55
+        if words[1] == 'read':
+            return 'on' if self.states.get(index, False) else 'off'
+        on = (words[1] == 'on')
+        self.states[index] = on
+        if index == 0:
+            self.sample.connected100A = on
+        elif index == 1:
+            self.sample.smallSourceOnSample = on
+        elif index == 2:
+            self.sample.connected6A = on
+        elif index == 3:
+            self.vacuum.update()
+            self.vacuum.pumping = on
+        elif index == 10: # the compressor runs while the relay is off
+            with self.thermal.mutex:
+                self.thermal.update()
+                self.thermal.coolerOn = not on
+        return ''
+
+    def frame(self, command, response):
+        return (command+'\n\r'+(response+'\n\r' if response else '')+'>').encode()
+
+
+class SerialEndpoint:
+    '''
+        SerialEndpoint serves an instrument on a pseudo-terminal. Clients open the slave device, e.g. /dev/pts/3,
+        like a serial port. Requests and responses are throttled to the time their bytes take at baudrate.
+
+        The endpoint does not keep the slave open, so it sees each client close the port (reads of the master fail
+        with EIO). It then restores the default terminal settings, which the next client configures again. Linux
+        refuses to configure a pseudo-terminal left e.g. in 7 bits with odd parity by the previous client.
+    '''
+    def __init__(self, instrument, baudrate=None, bitsPerCharacter=10):
+        self.instrument = instrument
+        self.secondsPerByte = bitsPerCharacter/float(baudrate) if baudrate else 0.
+        self.master, slave = os.openpty()
+        self.path = os.ttyname(slave)
+        self.settings = termios.tcgetattr(self.master) # settings of the slave, the device classes set raw mode when they open it
+        os.close(slave)
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.serve, name='Emulator '+self.path, daemon=True).start()
+
+    def serve(self):
+        terminator, buffer, closed = self.instrument.ending[-1].encode(), b'', False
+        while self.running:
+            if not select.select([self.master], [], [], .2)[0]:
+                continue
+            try:
+                buffer += os.read(self.master, 1024)
+                closed = False
+            except OSError as e:
+                if e.errno != errno.EIO:
+                    break
+                if not closed: # the client closed the port
+                    termios.tcsetattr(self.master, termios.TCSANOW, self.settings)
+                    buffer, closed = b'', True
+                time.sleep(.05)
+                continue
+            while terminator in buffer:
+                request, buffer = buffer.split(terminator, 1)
+                command = request.decode('utf-8', errors='replace').strip()
+                if not command:
+                    continue
+                response = self.instrument.frame(command, self.instrument.handle(command))
+                time.sleep((len(request)+1)*self.secondsPerByte) # the request is on the wire until its last byte
+                if response is not None:
+                    time.sleep(self.instrument.latency + len(response)*self.secondsPerByte)
+                    os.write(self.master, response)
+
+    def stop(self):
+        self.running = False
+        try:
+            os.close(self.master)
+        except OSError:
+            pass
+
+
+class SocketEndpoint:
+    '''
+        SocketEndpoint serves an instrument on a localhost TCP port. Like the instruments, it accepts one command per
+        line and any number of connections, the device classes open a connection for each command.
+    '''
+    def __init__(self, instrument, port=0):
+        self.instrument = instrument
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', port))
+        self.server.listen(8)
+        self.port = self.server.getsockname()[1]
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.accept, name='Emulator :{}'.format(self.port), daemon=True).start()
+
+    def accept(self):
+        while self.running:
+            try:
+                connection, address = self.server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+    def serve(self, connection):
+        terminator, buffer = self.instrument.ending[-1].encode(), b''
+        with connection:
+            while self.running:
+                try:
+                    data = connection.recv(1024)
+                except OSError:
+                    break
+                if not data:
+                    break
+                buffer += data
+                while terminator in buffer:
+                    request, buffer = buffer.split(terminator, 1)
+                    command = request.decode('utf-8', errors='replace').strip()
+                    response = self.instrument.frame(command, self.instrument.handle(command)) if command else None
+                    if response is not None:
+                        time.sleep(self.instrument.latency)
+                        connection.sendall(response)
+
+    def stop(self):
+        self.running = False
+        self.server.close()
+
+
+class InstrumentServer:
+    '''
+        InstrumentServer emulates the instruments of the setup on pseudo-terminals and localhost sockets.
+
+        INPUTS
+        ----------
+        latencies (dict) - response latency in seconds per device key of hwparams.json, defaults to LATENCIES
+        throttle (bool) - limit the pseudo-terminals to the baud rate of each instrument
+        temperature (float) - initial temperature of the stage in K
+    '''
+    def __init__(self, latencies=None, throttle=True, temperature=20.):
+        self.hardwareParameters = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
+        latencies = dict(LATENCIES, **(latencies or {}))
+        devices = self.hardwareParameters['devices']
+
+        self.thermal, self.magnet, self.vacuum = ThermalModel(temperature), MagnetModel(), VacuumModel()
+        self.sample = SampleModel(self.thermal, self.magnet)
+        calibration = (self.hardwareParameters['a'], self.hardwareParameters['b'], self.hardwareParameters['shuntR'])
+        self.instruments = {
+            'temperature_controller': EmulatedTemperatureController(devices['temperature_controller'], self.thermal, latencies['temperature_controller']),
+            'nanovoltmeter': EmulatedNanoVoltmeter(devices['nanovoltmeter'], self.sample, latencies['nanovoltmeter']),
+            'current_source_tc': EmulatedCurrentSource100mA(devices['current_source_tc'], self.sample, latencies['current_source_tc']),
+            'pressure_monitor': EmulatedPressureMonitor(devices['pressure_monitor'], self.vacuum, latencies['pressure_monitor']),
+            'voltagesource': EmulatedVoltageSource(devices['voltagesource'], self.sample, calibration, latencies['voltagesource']),
+            'current_source_caen': EmulatedCurrentSourceCAEN(devices['current_source_caen'], self.sample, latencies['current_source_caen']),
+            'magnet_controller': EmulatedMagnetController(devices['magnet_controller'], self.magnet, latencies['magnet_controller']),
+        }
+        self.relays = EmulatedRelayBoard(self.thermal, self.vacuum, self.sample, latencies['relays'])
+
+        self.endpoints = []
+        for key, instrument in self.instruments.items():
+            settings = devices[key]
+            if isinstance(settings.get('baudrate'), int):
+                endpoint = SerialEndpoint(instrument, baudrate=settings['baudrate'] if throttle else None, bitsPerCharacter=self.getBitsPerCharacter(settings))
+                settings['port'] = endpoint.path
+                self.endpoints.append(endpoint)
+            if settings.get('ethernet_port', -1) > 0:
+                endpoint = SocketEndpoint(instrument)
+                settings['ip'], settings['ethernet_port'] = '127.0.0.1', endpoint.port
+                self.endpoints.append(endpoint)
+        endpoint = SerialEndpoint(self.relays, baudrate=RELAYS_BAUDRATE if throttle else None)
+        self.hardwareParameters['relays_port'] = endpoint.path
+        self.endpoints.append(endpoint)
+
+    @staticmethod
+    def getBitsPerCharacter(settings):
+        return 1 + int(settings['bytesize']) + (0 if settings.get('parity', 'N') == 'N' else 1) + int(settings['stopbits'])
+
+    def start(self):
+        for endpoint in self.endpoints:
+            endpoint.start()
+
+    def stop(self):
+        for endpoint in self.endpoints:
+            endpoint.stop()
+
+    def writeHardwareParameters(self, folder=None):
+        '''
+            writeHardwareParameters writes the hwparams.json of the emulated instruments.
+
+            RETURNS
+            ----------
+            path (str) - path of the file, to be set in the HTS_HWPARAMS environment variable
+        '''
+        folder = folder if folder is not None else tempfile.mkdtemp(prefix='hts-emulator-')
+        path = os.path.join(folder, 'hwparams.json')
+        with open(path, 'w') as f:
+            json.dump(self.hardwareParameters, f, indent=2, sort_keys=True)
+        return path
+
+
+def runEmulator(latencies=None, throttle=True):
+    '''
+        runEmulator serves the emulated instruments until interrupted with Ctrl+C.
+    '''
+    server = InstrumentServer(latencies=latencies, throttle=throttle)
+    server.start()
+    path = server.writeHardwareParameters()
+    for key, settings in sorted(server.hardwareParameters['devices'].items()):
+        if key in server.instruments:
+            print('{:45s} {:12s} {}'.format(settings['name'], settings['port'] if isinstance(settings.get('baudrate'), int) else '', '127.0.0.1:{}'.format(settings['ethernet_port']) if settings.get('ethernet_port', -1) > 0 else ''))
+    print('{:45s} {}'.format('Relay board', server.hardwareParameters['relays_port']))
+    print('export HTS_HWPARAMS={}'.format(path))
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(1.)
+    except KeyboardInterrupt:
+        server.stop()
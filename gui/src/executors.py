@@ -0,0 +1,124 @@
+import time, threading, collections
+import numpy as np
+
+from PyQt5.QtCore import QObject, QThreadPool, pyqtSignal
+
+class Executor:
+    '''
+        Executor is a QThreadPool with its own concurrency limit that keeps queue metrics and reports saturation.
+        It accepts Task objects through start, like QThreadPool, so it can be passed wherever a threadpool is expected.
+
+        INPUTS
+        ----------
+        name (str) - workload class, used in warnings
+        maxThreads (int) - number of tasks that can run at the same time
+        warnWait (float) - a task waiting longer than warnWait seconds in the queue triggers a saturation warning
+        warn (function) - called with the warning message, at most once every warnInterval seconds
+    '''
+    def __init__(self, name, maxThreads, warnWait=1., warn=print, warnInterval=60.):
+        self.name, self.maxThreads, self.warnWait = name, maxThreads, warnWait
+        self.warn, self.warnInterval, self.lastWarning = warn, warnInterval, 0.
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(maxThreads)
+        self.mutex = threading.Lock()
+        self.submitted, self.started, self.completed, self.maxQueued = 0, 0, 0, 0
+        self.waitTimes = collections.deque(maxlen=1000)
+        self.runTimes = collections.deque(maxlen=1000)
+
+    def start(self, task):
+        with self.mutex:
+            self.submitted += 1
+            queued = self.submitted - self.started
+            self.maxQueued = max(self.maxQueued, queued)
+        task.submitTime = time.time()
+        task.onStart, task.onFinish = self.taskStarted, self.taskFinished
+        self.pool.start(task)
+        if queued > self.maxThreads:
+            self.reportSaturation('{} tasks waiting for {} threads'.format(queued, self.maxThreads))
+
+    def taskStarted(self, task):
+        task.startTime = time.time()
+        wait = task.startTime - task.submitTime
+        with self.mutex:
+            self.started += 1
+            self.waitTimes.append(wait)
+        if wait > self.warnWait:
+            self.reportSaturation('{} waited {:4.2f} s in the queue'.format(getattr(task.fn, '__name__', 'task'), wait))
+
+    def taskFinished(self, task):
+        with self.mutex:
+            self.completed += 1
+            self.runTimes.append(time.time()-task.startTime)
+
+    def reportSaturation(self, message):
+        now = time.time()
+        if now-self.lastWarning > self.warnInterval:
+            self.lastWarning = now
+            self.warn('Executor {} saturated: {}'.format(self.name, message))
+
+    def getQueueLength(self):
+        return max(self.submitted - self.started, 0)
+
+    def getStats(self):
+        '''
+            RETURNS
+            ----------
+            stats (dict) - counters, current queue length and wait/run time percentiles in seconds
+        '''
+        with self.mutex:
+            waits, runs = np.array(self.waitTimes), np.array(self.runTimes)
+            stats = {
+                'maxThreads': self.maxThreads,
+                'active': self.pool.activeThreadCount(),
+                'queued': max(self.submitted - self.started, 0),
+                'maxQueued': self.maxQueued,
+                'submitted': self.submitted,
+                'completed': self.completed,
+            }
+        for label, values in (('wait', waits), ('run', runs)):
+            stats[label+'_p50_s'] = float(np.percentile(values, 50)) if values.size else np.nan
+            stats[label+'_p99_s'] = float(np.percentile(values, 99)) if values.size else np.nan
+            stats[label+'_max_s'] = float(values.max()) if values.size else np.nan
+        return stats
+
+    def waitForDone(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+
+class Executors(QObject):
+    '''
+        Executors holds one Executor per workload class so that a class cannot starve the others:
+
+        jobs      - long blocking jobs: measurements, sequences, calibrations and warmup
+        commands  - short instrument commands sent from the GUI (valves, setpoints, currents, QPS reset), which must
+                    not wait behind a running measurement
+        telemetry - periodic instrument polling (temperature, pressure, magnet, offset tracking)
+        analysis  - fitting and the preparation of plot data
+        io        - file writes (environment backups, measurement files)
+
+        The concurrency limits are read from the 'executors' preference and warnings are sent through log_signal.
+
+        @author Alexis Devitre devitre@mit.edu
+        @lastModified October 2026
+    '''
+    log_signal = pyqtSignal(str, str)
+    WORKLOADS = ('jobs', 'commands', 'telemetry', 'analysis', 'io')
+
+    def __init__(self, preferences, parent=None):
+        super(Executors, self).__init__(parent)
+        limits = preferences['executors']
+        for workload in self.WORKLOADS:
+            setattr(self, workload, Executor(workload, limits[workload], warnWait=preferences['executor_warn_wait'], warn=self.warn))
+
+    def warn(self, message):
+        print(message)
+        self.log_signal.emit('ExecutorSaturated', message)
+
+    def __getitem__(self, workload):
+        return getattr(self, workload)
+
+    def getStats(self):
+        return {workload: self[workload].getStats() for workload in self.WORKLOADS}
+
+    def waitForDone(self, msecs=-1):
+        return all([self[workload].waitForDone(msecs) for workload in self.WORKLOADS])
@@ -2,7 +2,7 @@ import os, sys, numpy, time, re, datetime, pyqtgraph
 sys.path.append('../')
 import hts_fitting as hts
 
-from configure import load_json
+from configservice import config
 from plottingArea import MeasurePlot
 from horizontalline import HorizontalLine
 from hts_misc import fname_to_timestamp
@@ -12,7 +12,7 @@ from PyQt5.QtWidgets import QWidget, QPushButton, QComboBox, QLabel, QSpacerItem
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 
-HARDWARE_PARAMETERS = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
+HARDWARE_PARAMETERS = config.get('hwparams.json')
 
 '''
     Tab_Analysis is a submodule of the GUI containing GUI objects and functions needed to visualize the critical current 
@@ -28,8 +28,8 @@ class Tab_Analysis(QWidget):
         super(Tab_Analysis, self).__init__(parent)
         self.parent = parent
         
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')  # stylesheets for QtWidgets
-        self.preferences = load_json(fname='preferences.json', location=os.getcwd()+'/config')
+        self.styles = config.get('styles.json')  # stylesheets for QtWidgets
+        config.attach(self, 'preferences', 'preferences.json')
         
         gridLayout = QGridLayout(self)
         
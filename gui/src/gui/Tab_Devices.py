@@ -1,11 +1,12 @@
 import os, subprocess, numpy
 from scipy import constants
-from PyQt5.QtGui import QPixmap
+from PyQt5.QtGui import QPixmap, QFont
 from PyQt5.QtWidgets import QWidget, QCheckBox, QLineEdit, QVBoxLayout, QHBoxLayout, QMessageBox, QPushButton, QComboBox, QLabel, QDoubleSpinBox
-from PyQt5.QtCore import pyqtSignal, Qt
+from PyQt5.QtCore import pyqtSignal, Qt, QTimer
 
 from horizontalline import HorizontalLine
-from configure import load_json, update_json
+from configservice import config
+from iometrics import LATENCY_EDGES
 
 class Tab_Devices(QWidget):
     """
@@ -20,16 +21,15 @@ class Tab_Devices(QWidget):
     reset_signal = pyqtSignal()
     reconnect_signal = pyqtSignal(str)
     write_cal_signal = pyqtSignal(str)
-
-    hardware_parameters = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
-    preferences = load_json()
+    iometrics_signal = pyqtSignal()
 
     def __init__(self, parent=None):
         super(Tab_Devices, self).__init__(parent)
         self.parent = parent
         
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')  # stylesheets for QWidgets
-        self.preferences = load_json(fname='preferences.json', location=os.getcwd()+'/config')
+        self.styles = config.get('styles.json')  # stylesheets for QWidgets
+        config.attach(self, 'preferences', 'preferences.json')
+        config.attach(self, 'hardware_parameters', 'hwparams.json')
 
         self.vboxlayout_top = QVBoxLayout()
         self.vboxlayout_device_parameters = QVBoxLayout()
@@ -131,6 +131,29 @@ class Tab_Devices(QWidget):
 
         self.comboBoxName.setCurrentIndex(1) #Trigger this function once to set the device parameters according to the combobox
 
+        #
+        #   Add the communication statistics
+        #
+        label_title_iometrics = QLabel('Communication statistics')
+        label_title_iometrics.setStyleSheet(self.styles['QLabel_Subtitle'])
+        self.vboxlayout_top.addWidget(label_title_iometrics)
+        self.vboxlayout_top.addWidget(HorizontalLine())
+
+        monospace = QFont('Monospace')
+        monospace.setStyleHint(QFont.TypeWriter)
+        self.label_iometrics = QLabel('')
+        self.label_iometrics_commands = QLabel('')
+        for label in (self.label_iometrics, self.label_iometrics_commands):
+            label.setFont(monospace)
+            label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+            self.vboxlayout_top.addWidget(label)
+
+        self.iometrics = {}
+        self.QTimerIOMetrics = QTimer()
+        self.QTimerIOMetrics.setInterval(2000)
+        self.QTimerIOMetrics.timeout.connect(lambda: self.iometrics_signal.emit())
+        self.comboBoxName.currentTextChanged.connect(lambda: self.displayIOMetrics(self.iometrics))
+
         #
         #   Add sensor calibration option
         #
@@ -212,7 +235,7 @@ class Tab_Devices(QWidget):
         #
         labelShortcutsTitle = QLabel('List of shortcuts')
         labelShortcutsTitle.setStyleSheet(self.styles['QLabel_Subtitle'])
-        labelShortcuts = QLabel('{: <30}\t{: <30}\n{: <30}\t{: <30}\n{: <30}\t{: <30}'.format('Ctrl+L', 'Add a note to the log', 'Ctrl+C', 'Calibrate 100 A current source', 'Ctrl(+Shift)+Tab', 'Switch tabs'))
+        labelShortcuts = QLabel('{: <30}\t{: <30}\n{: <30}\t{: <30}\n{: <30}\t{: <30}\n{: <30}\t{: <30}'.format('Ctrl+L', 'Add a note to the log', 'Ctrl+C', 'Calibrate 100 A current source', 'Ctrl(+Shift)+Tab', 'Switch tabs', 'Ctrl+T', 'Start tracing, then export the timeline'))
         self.vboxlayout_top.addStretch()
         self.vboxlayout_top.addWidget(labelShortcutsTitle)
         self.vboxlayout_top.addWidget(HorizontalLine())
@@ -260,8 +283,7 @@ class Tab_Devices(QWidget):
         input calibrations to the preset configuration specified by the combobox selection.
         '''
         selected_calibration = self.combobox_sensor_configuration.currentText()
-        self.preferences['TemperatureSensorConfiguration'] = selected_calibration
-        update_json(self.preferences, fname='preferences.json', location='config')
+        config.update('preferences.json', TemperatureSensorConfiguration=selected_calibration)
 
         input_calibrations = [self.hardware_parameters['calibrations'][selected_calibration][key] for key in self.hardware_parameters['calibrations'][selected_calibration].keys()]
         self.label_sensor_calibration.setText('Input A: {: >10}; Input B: {: >10}; Input C: {: >10}; Input D: {: >10}'.format(*input_calibrations))
@@ -278,6 +300,43 @@ class Tab_Devices(QWidget):
                 self.label_tryconnection.setText('{} not connected!'.format(device))
 
 
+    def showEvent(self, event):
+        super(Tab_Devices, self).showEvent(event)
+        self.iometrics_signal.emit()
+        self.QTimerIOMetrics.start()
+
+    def hideEvent(self, event):
+        self.QTimerIOMetrics.stop()
+        super(Tab_Devices, self).hideEvent(event)
+
+    def displayIOMetrics(self, metrics):
+        '''
+            displayIOMetrics shows the connection status and the I/O and lock metrics of every device, and the metrics
+            per command of the device selected in the combobox.
+
+            INPUTS
+            ------
+            metrics (dict) - returned by HardwareManager.getIOMetrics
+        '''
+        self.iometrics = metrics
+        row = '{:<48}{:<15}{:>8}{:>10}{:>10}{:>10}{:>10}{:>8}{:>11}{:>15}{:>14}'
+        lines = [row.format('Device', 'Status', 'Calls', 'p50 [ms]', 'p95 [ms]', 'max [ms]', 'Timeouts', 'Errors', 'Malformed', 'Lock wait [ms]', 'Failed locks')]
+        for name, m in metrics.items():
+            lines.append(row.format(name[:47], 'connected' if m['connected'] else 'not connected', m['calls'], '{:.0f}'.format(m['p50']), '{:.0f}'.format(m['p95']), '{:.1f}'.format(m['max']),
+                                    m['timeouts'], m['errors'], m['malformed'], '{:.0f} ({:.0f})'.format(m['lockWait'], m['lockWaitMax']), '{}/{}'.format(m['failedLocks'], m['locks'])))
+        self.label_iometrics.setText('\n'.join(lines) + '\nLock wait: total (longest). Latencies are the upper edges of the histogram bins.')
+
+        device = self.comboBoxName.currentText()
+        selected = [m for name, m in metrics.items() if (name == device) or (name in device.split())]
+        lines = []
+        if selected:
+            row = '{:<30}{:>8}{:>11}{:>10}{:>10}{:>10}{:>10}{:>11}   {}'
+            lines.append(row.format('Command', 'Calls', 'mean [ms]', 'p50 [ms]', 'p95 [ms]', 'max [ms]', 'Timeouts', 'Malformed', 'Histogram [ms]: ' + ' '.join(['<{}'.format(edge) for edge in LATENCY_EDGES]) + ' >'))
+            for command, c in sorted(selected[0]['commands'].items(), key=lambda item: -item[1]['count']):
+                lines.append(row.format(command[:29], c['count'], '{:.1f}'.format(c['mean']), '{:.0f}'.format(c['p50']), '{:.0f}'.format(c['p95']), '{:.1f}'.format(c['max']), c['timeouts'], c['malformed'],
+                                        ' '*16 + ' '.join(['{:>{}}'.format(count, len('<{}'.format(edge))) for count, edge in zip(c['histogram'], LATENCY_EDGES + [''])])))
+        self.label_iometrics_commands.setText('\n'.join(lines))
+
     def checkBoxSetVoltageSign_clicked(self):
         if self.checkboxSetVoltageSign.isChecked():
             self.setvoltagesign_signal.emit(-1)
@@ -292,7 +351,7 @@ class Tab_Devices(QWidget):
         else:
             reply = QMessageBox.question(self, 'Save new parameters?', 'Would you like to save the new parameters?', QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
             if reply == QMessageBox.Yes:
-                data = load_json(fname='hwparams.json', location='config')
+                data = config.get('hwparams.json').thaw()
                 data['devices'][self.device_key]['baudrate'] = int(self.lineEditBaudRate.text())
                 data['devices'][self.device_key]['bytesize'] = int(self.lineEditByteSize.text())
                 data['devices'][self.device_key]['ending'] = self.lineEditEnding.text()
@@ -304,8 +363,7 @@ class Tab_Devices(QWidget):
                 data['devices'][self.device_key]['stopbits'] = int(self.lineEditStopBits.text())
                 data['devices'][self.device_key]['timeout'] = int(self.lineEditTimeout.text())
                 data['devices'][self.device_key]['port'] = self.lineEditUSBPort.text()
-                update_json(data, fname='hwparams.json', location='config')
-                self.hardware_parameters = load_json(fname='hwparams.json', location=os.getcwd()+'/config') # FUTURE FIX ADVISORY -- This should be a global variable. Although updating it won't ahve any effect in other contexts which use these data, it's not very elegant programming.
+                config.write('hwparams.json', data) # the devices use the new parameters when they are reconnected
             self.enableDeviceParameters(False)
             self.pushButtonEditParameters.setEnabled(True)
             self.pushButtonEditParameters.setText('Edit Parameters')
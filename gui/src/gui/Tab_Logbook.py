@@ -4,7 +4,7 @@ from PyQt5.QtWidgets import QWidget, QCheckBox, QVBoxLayout, QHBoxLayout, QTable
 from PyQt5.QtCore import pyqtSignal
 
 from horizontalline import HorizontalLine
-from configure import load_json
+from configservice import config
 
 TEMPERATURE_CONTROLLER = 'LakeShore 336 Temperature Controller'
 CURRENT_SOURCE = 'LakeShore 121 Current Source'
@@ -28,7 +28,7 @@ class Tab_Logbook(QWidget):
         super(Tab_Logbook, self).__init__(parent)
         self.parent = parent
         
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')  # stylesheets for QtWidgets
+        self.styles = config.get('styles.json')  # stylesheets for QtWidgets
 
         vBoxLayout = QVBoxLayout(self)
         
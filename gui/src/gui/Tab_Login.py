@@ -8,9 +8,9 @@ from GetDirWindow import launchWindow
 from horizontalline import HorizontalLine
 
 from datetime import datetime
-from configure import load_json
+from configservice import config
 
-HARDWARE_PARAMETERS = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
+HARDWARE_PARAMETERS = config.get('hwparams.json')
 
 """
     Tab_Login is a submodule of the GUI containing GUI objects and functions
@@ -30,8 +30,8 @@ class Tab_Login(QWidget):
         super(Tab_Login, self).__init__(parent)
         self.parent = parent
 
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')  # stylesheets for QtWidgets
-        self.preferences = load_json(fname='preferences.json', location=os.getcwd()+'/config')
+        self.styles = config.get('styles.json')  # stylesheets for QtWidgets
+        config.attach(self, 'preferences', 'preferences.json')
         self.default_directory = default_directory
 
         self.QLineEdit_homeDirectory = QtWidgets.QLineEdit(self)
@@ -123,7 +123,7 @@ class Tab_Login(QWidget):
         GetDirWindow.setFileMode(QFileDialog.Directory)
         if GetDirWindow.exec_():
             directory = GetDirWindow.selectedFiles()
-            if directory is not []:
+            if directory:
                 self.QLineEdit_folderName.setText(directory[0].split('/')[-1])
                 self.QLineEdit_homeDirectory.setText('/'.join(directory[0].split('/')[:-1]))
         
@@ -1,13 +1,14 @@
 import re, os, sys, numpy, datetime
 sys.path.append('/home/htsirradiation/Documents/hts-irradiation-gui/src/gui/pyqt_subclasses/')
 
-from configure import load_json
+from configservice import config
 from listwidget import ListWidget
 from addIcStepWindow import AddIcStepWindow
 from addTcStepWindow import AddTcStepWindow
 from addTemperatureStepWindow import AddTemperatureStepWindow
 from addWaitStepWindow import AddWaitStepWindow
 from addRelayStepWindow import AddRelayStepWindow
+from sequencecompiler import SequenceError, formatDuration
 
 from PyQt5.QtWidgets import QWidget, QLineEdit, QListWidgetItem, QProgressBar, QGridLayout, QHBoxLayout, QHeaderView, QAbstractItemView, QPushButton, QSpinBox, QDoubleSpinBox, QLabel, QInputDialog, QFileDialog, QMessageBox
 
@@ -23,15 +24,16 @@ class Tab_Sequences(QWidget):
         @author Alexis Devitre (devitre@mit.edu)
         @last-modified July 2024
     """
-    run_sequence_signal = pyqtSignal(list)
+    run_sequence_signal = pyqtSignal(object)
+    resume_sequence_signal = pyqtSignal()
     log_signal = pyqtSignal(str, str)
     
     def __init__(self, parent=None):
         super(Tab_Sequences, self).__init__(parent)
         self.parent = parent
         
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')  # stylesheets for QtWidgets
-        self.preferences = load_json(fname='preferences.json', location=os.getcwd()+'/config')
+        self.styles = config.get('styles.json')  # stylesheets for QtWidgets
+        config.attach(self, 'preferences', 'preferences.json')
 
         gridLayout = QGridLayout(self)
         
@@ -39,6 +41,7 @@ class Tab_Sequences(QWidget):
         self.listWidget.itemDoubleClicked.connect(self.editDoubleClickedItem)
         self.listWidget.setStyleSheet("background-color: #f0f0f0; border: 1px solid #f0f0f0;  outline: none;")
         
+        self.resumeRow = 0 # row highlighted when the sequence starts, not 0 when a sequence is resumed
         self.labelStepStatus = QLabel('')
         self.progressStatus = QProgressBar()
         self.progressStatus.setMinimum(0)
@@ -118,6 +121,12 @@ class Tab_Sequences(QWidget):
         self.pushButtonTemperature.setIcon(QIcon(os.getcwd()+'/images/sequence-icons/temperature.png'))
         self.pushButtonTemperature.setIconSize(QSize(100, 100))
 
+        self.pushButtonParallel = QPushButton('Run steps\nin parallel')
+        self.pushButtonParallel.setFixedSize(button_size_x, button_size_y)
+        self.pushButtonParallel.clicked.connect(lambda: self.pushButtonParallelPressed())
+        self.pushButtonParallel.setIcon(QIcon(os.getcwd()+'/images/sequence-icons/copy.png'))
+        self.pushButtonParallel.setIconSize(QSize(100, 100))
+
         self.pushButtonSave = QPushButton('Save Sequence...')
         self.pushButtonSave.setFixedSize(button_size_x, button_size_y)
         self.pushButtonSave.clicked.connect(lambda: self.saveSequence())
@@ -172,6 +181,9 @@ class Tab_Sequences(QWidget):
         gridLayout.addWidget(self.pushButtonRemoveStep, 6, 0, 1, 2)
         gridLayout.setAlignment(self.pushButtonRemoveStep, Qt.AlignCenter)
 
+        gridLayout.addWidget(self.pushButtonParallel, 7, 0, 1, 2)
+        gridLayout.setAlignment(self.pushButtonParallel, Qt.AlignCenter)
+
         gridLayout.addWidget(self.pushButtonExecute, 9, 0, 1, 2)
         gridLayout.setAlignment(self.pushButtonExecute, Qt.AlignCenter)
         gridLayout.addWidget(self.labelStepStatus, 9, 2, 1, 2)
@@ -227,6 +239,16 @@ class Tab_Sequences(QWidget):
         value, ok = QInputDialog.getText(self, 'Label', 'Specify common label to all subsequent measurements:')
         if ok: self.addStep('Label {}'.format(value))
 
+    def pushButtonParallelPressed(self):
+        '''
+            pushButtonParallelPressed inserts the markers of a parallel group. Steps moved between the markers run
+            at the same time, the sequence continues once all of them are done. Steps that use the same instrument
+            still run one after the other.
+        '''
+        self.addStep('Parallel : start')
+        self.addStep('Parallel : stop')
+        self.listWidget.setCurrentRow(self.listWidget.currentRow()-1)
+
     def addStep(self, step):
         if self.listWidget.count() > 0:
             self.listWidget.insertItem(self.listWidget.currentRow()+1, step)
@@ -285,16 +307,48 @@ class Tab_Sequences(QWidget):
         if self.pushButtonExecute.text() == 'Run Sequence':
             totalSteps = self.listWidget.count()
             if totalSteps > 0:
+                sequence = self.compileSequence()
+                if sequence is None:
+                    return
                 self.pushButtonExecute.setStyleSheet(self.styles['QPushButton_acquiring'])
                 self.pushButtonExecute.setText('Stop')
-                self.run_sequence_signal.emit(self.parseSequenceItems(self.listWidget.getItems()))
-                self.log_signal.emit('SequenceStart', 'Sequence {} started by user.'.format('SequenceName'))
+                self.resumeRow = 0
+                self.run_sequence_signal.emit(sequence)
+                self.log_signal.emit('SequenceStart', 'Sequence {} started by user. {}'.format('SequenceName', sequence.summary()))
                 self.enableSequenceEdits(enabled=False)
             else:
                 QMessageBox.warning(self, 'Warning', 'Sequence is empty!')
         else:
             self.run_sequence_signal.emit([])
 
+    def offerResume(self):
+        '''
+            offerResume asks the user whether to resume a sequence that was interrupted by a crash, a restart or an error.
+            The sequence list is restored and the run continues with the step that was interrupted (see TaskManager.resumeSequence).
+        '''
+        checkpoint = self.parent.tm.getSequenceCheckpoint()
+        if checkpoint is None:
+            return
+        
+        index, steps = checkpoint['index'], len(checkpoint['lines'])
+        current = checkpoint['lines'][index] if index < steps else ''
+        reply = QMessageBox.question(self, 'Resume sequence', 'A sequence started {} was interrupted ({}) at step {} of {}:\n\n{}\n\nLast checkpoint: {}\n\nResume the sequence from this step?'.format(
+            checkpoint['started'], checkpoint['status'], index+1, steps, current, checkpoint['updated']), QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        
+        if reply == QMessageBox.Yes:
+            self.listWidget.clear()
+            for item in checkpoint['items']:
+                self.listWidget.addItem(item)
+            self.resumeRow = checkpoint['stepItems'][index] if index < steps else 0
+            self.pushButtonExecute.setEnabled(True)
+            self.pushButtonExecute.setStyleSheet(self.styles['QPushButton_acquiring'])
+            self.pushButtonExecute.setText('Stop')
+            self.enableSequenceEdits(enabled=False)
+            self.resume_sequence_signal.emit()
+            self.log_signal.emit('SequenceResume', 'Sequence resumed by user at step {} of {}.'.format(index+1, steps))
+        else:
+            self.parent.tm.discardSequenceCheckpoint()
+
     def stopSequence(self):
         self.enableSequenceEdits(enabled=True)
         self.labelStepStatus.setText('Status: Idle')
@@ -302,19 +356,25 @@ class Tab_Sequences(QWidget):
         self.pushButtonExecute.setText('Run Sequence')
         QMessageBox.information(self, 'Sequence Complete', 'Sequence completed!')
 
-    def parseSequenceItems(self, items):
-        sequence = []
-        for item in items:
-            if item[0] == '/':
-                sequence.append('Subsequence : start')
-                with open(item, 'r') as f:
-                    steps = [l.strip() for l in f.readlines() if not l.isspace()]
-                    for step in steps:
-                        sequence.append(step)
-                    f.close()
-                sequence.append('Subsequence : stop')
-            else:
-                sequence.append(item)
+    def compileSequence(self):
+        '''
+            compileSequence checks the whole sequence, subsequences included, before it is started (see sequencecompiler).
+            The estimated duration of each item is shown in its tooltip.
+
+            RETURNS
+            ----------
+            sequence (CompiledSequence) - None if a step is malformed, the problems are shown to the user
+        '''
+        items = self.listWidget.getItems()
+        try:
+            sequence = self.parent.tm.compileSequence(items)
+        except SequenceError as e:
+            QMessageBox.warning(self, 'Invalid sequence', 'The sequence was not started:\n\n'+'\n'.join(e.errors))
+            return None
+        
+        for row, duration in enumerate(sequence.itemDurations):
+            self.listWidget.item(row).setToolTip('Estimated duration: {}'.format(formatDuration(duration)))
+        self.labelStepStatus.setText(sequence.summary())
         return sequence
 
     def enableSequenceEdits(self, enabled=True):
@@ -323,6 +383,7 @@ class Tab_Sequences(QWidget):
         self.pushButtonIc.setEnabled(enabled)
         self.pushButtonTc.setEnabled(enabled)
         self.pushButtonWait.setEnabled(enabled)
+        self.pushButtonParallel.setEnabled(enabled)
         self.pushButtonLoad.setEnabled(enabled)
         self.pushButtonSave.setEnabled(enabled)
         self.pushButtonMoveUp.setEnabled(enabled)
@@ -334,7 +395,7 @@ class Tab_Sequences(QWidget):
         self.labelStepStatus.setText(status_text.split('/')[0])
 
         if status_text.split()[0] == 'SequenceStarted':
-            self.listWidget.setCurrentRow(0)
+            self.listWidget.setCurrentRow(self.resumeRow)
             
         elif status_text.split()[0] != 'SequenceComplete':
             try:
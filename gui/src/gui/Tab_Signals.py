@@ -1,5 +1,6 @@
 import os, numpy
-from configure import load_json
+import tracing
+from configservice import config
 from progresslabel import ProgressLabel
 from signalsplot import SignalsPlot
 
@@ -21,7 +22,7 @@ class Tab_Signals(QWidget):
     def __init__(self, usr_preferences, parent=None):
         
         super(Tab_Signals, self).__init__(parent)
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')        # stylesheets for QtWidgets
+        self.styles = config.get('styles.json')        # stylesheets for QtWidgets
         self.preferences = usr_preferences
         
         gridLayout = QGridLayout(self)
@@ -56,6 +57,7 @@ class Tab_Signals(QWidget):
         
         gridLayout.addWidget(plotWithToolbar, 0, 0, 10, 10)
         
+    @tracing.traced('gui')
     def updatePlottingArea(self, time_tc, time_pm, time_mc, sampleT, targetT, holderT, spareT, pressure, power, field):
         
         if time_tc[-1] > self.preferences['timeaxis_max']:
@@ -1,15 +1,17 @@
 import os, numpy, time, re, datetime, pyqtgraph
+import tracing
 
-from configure import load_json
+from configservice import config
 from progresslabel import ProgressLabel
 from plottingArea import MeasurePlot
 from fittingFunctions import powerLaw
+from cancellation import CancellationToken
 
 from PyQt5.QtWidgets import QWidget, QPushButton, QComboBox, QLabel, QGridLayout, QVBoxLayout, QDoubleSpinBox, QSpinBox, QFileDialog, QMessageBox, QInputDialog
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 
-HARDWARE_PARAMETERS = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
+HARDWARE_PARAMETERS = config.get('hwparams.json')
 
 '''
     Tab_VoltageCurrent is a submodule of the GUI containing GUI objects and functions
@@ -30,8 +32,8 @@ class Tab_VoltageCurrent(QWidget):
         super(Tab_VoltageCurrent, self).__init__(parent)
         self.parent = parent
         
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')  # stylesheets for QtWidgets
-        self.preferences = load_json(fname='preferences.json', location=os.getcwd()+'/config')
+        self.styles = config.get('styles.json')  # stylesheets for QtWidgets
+        config.attach(self, 'preferences', 'preferences.json')
         
         self.acquiring = False
         self.sessionTag, self.lastLabel = '', ''
@@ -42,6 +44,7 @@ class Tab_VoltageCurrent(QWidget):
         self.QtimerUpdatePlot.timeout.connect(lambda: self.updatePlot_signal.emit())
 
         self.QTimerWaitForNextIV = QTimer()
+        self.waitToken = CancellationToken() # cuts the wait between repeated IVs short when the user presses Stop
 
         self.plottingArea = MeasurePlot(xLabel='Current [A]', yLabel='Voltage [uV]', title='Voltage vs Transport current')
         self.plottingArea.plotInfiniteLine(pos=(0, HARDWARE_PARAMETERS['bridgeLength']*0.1), angle=180, label='Vc') # marks the position of Vc
@@ -218,7 +221,9 @@ class Tab_VoltageCurrent(QWidget):
     def nextMeasurement(self, tag):
         self.QSpinBox_nMeasurements.setValue(self.QSpinBox_nMeasurements.value()-1) 
         if self.QSpinBox_nMeasurements.value() > 0:
-            time.sleep(self.QSpinBox_waitTime.value())
+            self.waitToken.wait(self.QSpinBox_waitTime.value(), until=lambda: not self.acquiring)
+            if not self.acquiring: # stopped by the user while waiting
+                return
             self.measure_signal.emit(self.QSpinBox_rampStart.value(), self.QDoubleSpinBox_stepSize.value(), self.QDoubleSpinBox_threshold.value()*1e-6, self.comboBoxSelectCurrentSource.currentText(), False, tag)
         else:
             self.enableDataAcquisition(False)
@@ -231,6 +236,7 @@ class Tab_VoltageCurrent(QWidget):
     def setMeasurementCounter(self, value):
         self.QSpinBox_nMeasurements.setValue(value)
     
+    @tracing.traced('gui')
     def updateActiveLine(self, current, voltage):
         self.plottingArea.updateActiveLine(current, voltage*1e6)
 
@@ -245,6 +251,7 @@ class Tab_VoltageCurrent(QWidget):
             self.QPushButton_measureIc.setStyleSheet(self.styles['QPushButton_idle'])
             self.QPushButton_measureIc.setText('Measure')
             self.QtimerUpdatePlot.stop()
+            self.waitToken.cancel(reason='user')
 
     def enable(self, enabled=True):
         self.QPushButton_measureIc.setEnabled(enabled)
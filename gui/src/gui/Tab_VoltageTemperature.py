@@ -1,6 +1,7 @@
 import os, re, numpy, time, pyqtgraph
+import tracing
 
-from configure import load_json
+from configservice import config
 from progresslabel import ProgressLabel
 from plottingArea import MeasurePlot
 from listwidget import ListWidget
@@ -25,7 +26,7 @@ class Tab_VoltageTemperature(QWidget):
         super(Tab_VoltageTemperature, self).__init__(parent)
         self.parent = parent
 
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')  # stylesheets for QtWidgets
+        self.styles = config.get('styles.json')  # stylesheets for QtWidgets
         self.acquiring = False
         self.sessionTag, self.lastLabel = '', ''
         gridLayout = QGridLayout(self)
@@ -162,6 +163,7 @@ class Tab_VoltageTemperature(QWidget):
         else:
             QMessageBox.warning(self, 'Warning: Clear plot', 'You cannot clear the plot during a measurement.')
             
+    @tracing.traced('gui')
     def updateActiveLine(self, temperature, voltage):
         self.plottingArea.updateActiveLine(temperature, voltage*1e6)
 
@@ -1,6 +1,7 @@
 import os, numpy, time, re, datetime, pyqtgraph
+import tracing
 
-from configure import load_json
+from configservice import config
 
 from plottingArea import MeasurePlot
 from listwidget import ListWidget
@@ -11,7 +12,7 @@ from PyQt5.QtWidgets import QWidget, QPushButton, QComboBox, QLabel, QGridLayout
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import pyqtSignal, Qt, QTimer
 
-HARDWARE_PARAMETERS = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
+HARDWARE_PARAMETERS = config.get('hwparams.json')
 
     
 class Tab_VoltageTime(QWidget):
@@ -31,8 +32,8 @@ class Tab_VoltageTime(QWidget):
         super(Tab_VoltageTime, self).__init__(parent)
         self.parent = parent
         
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')  # stylesheets for QtWidgets
-        self.preferences = load_json(fname='preferences.json', location=os.getcwd()+'/config')
+        self.styles = config.get('styles.json')  # stylesheets for QtWidgets
+        config.attach(self, 'preferences', 'preferences.json')
         
         self.acquiring = False
         self.sessionTag, self.lastLabel = '', ''
@@ -203,6 +204,7 @@ class Tab_VoltageTime(QWidget):
         else:
             QMessageBox.warning(self, 'Warning: Clear plot', 'You cannot clear the plot during a measurement.')
 
+    @tracing.traced('gui')
     def updateActiveLine(self, time, voltage):
         self.plottingArea.updateActiveLine(time-time[0], voltage*1e6)
 
@@ -6,29 +6,31 @@ import numpy as np
 # from email.mime.text import MIMEText
 # from email.mime.multipart import MIMEMultipart
 
-from PyQt5.QtWidgets import QAction, QWidget, QShortcut, QGridLayout, QMainWindow, QMessageBox, QInputDialog, QTabWidget, QDesktopWidget
+from PyQt5.QtWidgets import QAction, QWidget, QShortcut, QGridLayout, QMainWindow, QMessageBox, QInputDialog, QTabWidget, QDesktopWidget, QFileDialog
 
 from PyQt5.QtGui import QColor, QKeySequence
-from PyQt5.QtCore import pyqtSlot, QThreadPool
+from PyQt5.QtCore import pyqtSlot
 
-from configure import load_json
+from configservice import config
 from window_newSession import NewSessionWindow
 
 from hardwaremanager import HardwareManager
 from taskmanager import TaskManager
 from datamanager import DataManager
+from acquisitionengine import AcquisitionClient
 from task import Task
+import tracing, startupprofiler
+from executors import Executors
+from metrics import startExporter
 
 from Tab_VoltageCurrent import Tab_VoltageCurrent
 from Tab_VoltageTemperature import Tab_VoltageTemperature
 from Tab_VoltageTime import Tab_VoltageTime
-from Tab_Analysis import Tab_Analysis
 from Tab_Signals import Tab_Signals
-from Tab_Sequences import Tab_Sequences
 from Tab_Login import Tab_Login
 
 from Tab_Logbook import Tab_Logbook
-from Tab_Devices import Tab_Devices
+from lazytab import LazyTab
 from sidebar import Sidebar
 
 colorForestGreen = QColor(34, 139, 34)
@@ -41,34 +43,62 @@ class GUIManager(QMainWindow):
 
         if reply == QMessageBox.Yes:
             event.accept()
+            if (self.engine is not None) and self.engine.isAttached(): # the daemon keeps acquiring after the GUI is closed
+                self.engine.close(shutdown=False)
+                print('GUI detached from the acquisition daemon')
+                return
+            if tracing.isEnabled() and (self.engine is not None): # written at exit with the events of this process, see main.py --trace
+                tracing.merge(self.tm.getTraceEvents())
+            if self.metrics is not None:
+                self.metrics.stop()
             self.dm.log_event('Shutdown', 'Session terminated', 'Normal')
             self.dm.__del__()
             self.hm.__del__()
+            if self.engine is not None:
+                self.engine.close()
             print('Program ended by user')
         else:
             event.ignore()
     
-    def __init__(self, parent=None, vb=False):
-        
+    def __init__(self, parent=None, attach=None, vb=False):
+        '''
+            attach (str) - address of an acquisition daemon (main.py --headless) to use instead of local managers
+        '''
         super(GUIManager, self).__init__(parent)
         
-        self.threadpool = QThreadPool()
-        self.hardware_parameters = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')  # stylesheets for QtWidgets
-        self.preferences = load_json(fname='preferences.json', location=os.getcwd()+'/config')  # software preferences
+        config.attach(self, 'preferences', 'preferences.json')  # software preferences, kept up to date when the file changes
+        self.executors = Executors(self.preferences) # one thread pool per workload class, see executors.py
+        config.attach(self, 'hardware_parameters', 'hwparams.json')
+        self.styles = config.get('styles.json')  # stylesheets for QtWidgets
         
         self.sessionStarted = False  # if False, the GUI is in DEMO mode and data has not been acquired yet
         self.updatingPlots = False
-
-        self.hm = HardwareManager(vb=vb)
-        self.dm = DataManager(self.threadpool, vb=vb)
-        self.tm = TaskManager(self.dm, self.hm, self.threadpool, vb=vb)
+        self.sequencesEnabled = False # applied to the Sequences tab when it is built, see connectSequencesTools
+
+        self.engine, self.metrics = None, None
+        if attach is not None:
+            self.engine = AcquisitionClient.attach(attach, plotLength=self.preferences['timeaxis_max'])
+            self.hm, self.dm, self.tm = self.engine.hm, self.engine.dm, self.engine.tm
+        elif self.preferences['acquisition_process']: # instrument I/O and measurements run in a separate process, see acquisitionengine.py
+            self.engine = AcquisitionClient.spawn(plotLength=self.preferences['timeaxis_max'], vb=vb)
+            self.hm, self.dm, self.tm = self.engine.hm, self.engine.dm, self.engine.tm
+        else:
+            with startupprofiler.measure('HardwareManager'):
+                self.hm = HardwareManager(vb=vb)
+            with startupprofiler.measure('DataManager'):
+                self.dm = DataManager(self.executors, vb=vb)
+            with startupprofiler.measure('TaskManager'):
+                self.tm = TaskManager(self.dm, self.hm, self.executors, vb=vb)
+            self.metrics = startExporter(self.dm, self.hm, self.tm, self.executors, self.preferences) # served by the acquisition process otherwise
         
         self.qShortcut_calibrate100ACurrentSource = QShortcut(QKeySequence('Ctrl+C'), self)
         self.qShortcut_calibrate100ACurrentSource.activated.connect(lambda: self.calibrate100ACurrentSource())
         
         self.qShortcut_displayManual = QShortcut(QKeySequence('Ctrl+H'), self)
         self.qShortcut_displayManual.activated.connect(lambda: self.showHelp())
+
+        self.qShortcut_exportTrace = QShortcut(QKeySequence('Ctrl+T'), self)
+        self.qShortcut_exportTrace.activated.connect(lambda: self.exportTrace())
         
         # main window
         resolution = QDesktopWidget().screenGeometry()
@@ -90,10 +120,12 @@ class GUIManager(QMainWindow):
         self.missionControl.setStyleSheet(self.styles['QTabWidgetVertical'])
         self.missionControl.setTabPosition(QTabWidget.West)
 
-        self.loginTools = Tab_Login(parent=self)
-        self.logbookTools = Tab_Logbook(parent=self)
-        self.environmentTools = Tab_Signals(usr_preferences=self.preferences, parent=self)
-        self.deviceTools = Tab_Devices(parent=self)
+        with startupprofiler.measure('Tab_Login'):
+            self.loginTools = Tab_Login(parent=self)
+        with startupprofiler.measure('Tab_Logbook'):
+            self.logbookTools = Tab_Logbook(parent=self)
+        with startupprofiler.measure('Tab_Signals'):
+            self.environmentTools = Tab_Signals(usr_preferences=self.preferences, parent=self)
         
         self.missionControl.addTab(self.environmentTools, 'Signals')
         self.missionControl.addTab(self.logbookTools, "Logbook")
@@ -105,27 +137,32 @@ class GUIManager(QMainWindow):
         self.measurementTools.setStyleSheet(self.styles['QTabWidgetVertical'])
         self.measurementTools.setTabPosition(QTabWidget.West)
 
-        self.icTools = Tab_VoltageCurrent(parent=self)
-        self.tcTools = Tab_VoltageTemperature(parent=self)
-        self.vtTools = Tab_VoltageTime(parent=self)
+        with startupprofiler.measure('Tab_VoltageCurrent'):
+            self.icTools = Tab_VoltageCurrent(parent=self)
+        with startupprofiler.measure('Tab_VoltageTemperature'):
+            self.tcTools = Tab_VoltageTemperature(parent=self)
+        with startupprofiler.measure('Tab_VoltageTime'):
+            self.vtTools = Tab_VoltageTime(parent=self)
 
         self.measurementTools.addTab(self.icTools, "Voltage/Current")
         self.measurementTools.addTab(self.tcTools, "Voltage/Temperature")
         self.measurementTools.addTab(self.vtTools, "Voltage/Time")
 
-        # tabs in a tab for data analysis
-        self.analysis_tools = Tab_Analysis(parent=self)
+        # tabs built the first time they are shown or used, see lazytab.py
+        self.sequencesTab = LazyTab(self.createSequencesTools, onBuilt=self.connectSequencesTools, label='Tab_Sequences')
+        self.analysisTab = LazyTab(self.createAnalysisTools, label='Tab_Analysis')
+        self.devicesTab = LazyTab(self.createDeviceTools, onBuilt=self.connectDeviceTools, label='Tab_Devices')
 
         # add vertical tab widgets to horizontal master tab widget
-        self.sequencesTools = Tab_Sequences(parent=self)
         self.tabWidget.addTab(self.missionControl, 'Mission Control')
         self.tabWidget.addTab(self.measurementTools, "Measurements")
-        self.tabWidget.addTab(self.sequencesTools, "Sequences")
-        self.tabWidget.addTab(self.analysis_tools, "Analysis")
-        self.tabWidget.addTab(self.deviceTools, "Help")
+        self.tabWidget.addTab(self.sequencesTab, "Sequences")
+        self.tabWidget.addTab(self.analysisTab, "Analysis")
+        self.tabWidget.addTab(self.devicesTab, "Help")
         self.tabWidget.setCurrentIndex(0)
         
-        self.sidebar = Sidebar()
+        with startupprofiler.measure('Sidebar'):
+            self.sidebar = Sidebar()
         
         self.gridLayout.addWidget(self.tabWidget, 0, 0, 11, 11)
         self.gridLayout.addWidget(self.sidebar, 0, 11, 1, 7)
@@ -135,6 +172,7 @@ class GUIManager(QMainWindow):
         self.dm.log_signal.connect(self.log_event)
         self.dm.plot_signal.connect(self.updateSignalsPlots)
         self.tm.log_signal.connect(self.log_event)
+        self.executors.log_signal.connect(self.log_event)
 
         self.loginTools.signal_newsession.connect(self.startSession)
         self.loginTools.signal_stopsession.connect(self.stopSession)
@@ -158,13 +196,7 @@ class GUIManager(QMainWindow):
         self.sidebar.chamberlight_signal.connect(self.toggleChamberLight)
         self.sidebar.reset_signal.connect(self.resetQPS)
 
-        self.sequencesTools.run_sequence_signal.connect(self.runSequence)
-        
         self.logbookTools.log_signal.connect(self.log_event)
-        
-        self.deviceTools.test_signal.connect(self.testSerialConnection)
-        self.deviceTools.reconnect_signal.connect(self.reconnect_device)
-        self.deviceTools.write_cal_signal.connect(self.update_temperature_input_configuration)
 
         self.sidebar.settemp_signal.connect(self.setTemperature)
         self.sidebar.set_field_signal.connect(self.set_magnetic_field)
@@ -178,12 +210,49 @@ class GUIManager(QMainWindow):
         self.tabSwitchBackAction.triggered.connect(self.switchBackTab)
         self.tabSwitchBackAction.setShortcut("Ctrl+Shift+\t")
         
-        self.hm.initializeHardware()
-        self.initializeControls()
+        with startupprofiler.measure('initializeHardware'):
+            self.hm.initializeHardware()
+        with startupprofiler.measure('initializeControls'):
+            self.initializeControls()
         self.move(int((width-self.frameSize().width())/4), int((height-self.frameSize().height())/4))
         
         self.setWindowTitle(' ')
         
+    def createSequencesTools(self):
+        from Tab_Sequences import Tab_Sequences
+        return Tab_Sequences(parent=self)
+
+    def connectSequencesTools(self, sequencesTools):
+        sequencesTools.run_sequence_signal.connect(self.runSequence)
+        sequencesTools.resume_sequence_signal.connect(self.resumeSequence)
+        sequencesTools.enable(self.sequencesEnabled)
+
+    def createAnalysisTools(self):
+        from Tab_Analysis import Tab_Analysis # imports the fitting modules and their plotting dependencies
+        return Tab_Analysis(parent=self)
+
+    def createDeviceTools(self):
+        from Tab_Devices import Tab_Devices
+        return Tab_Devices(parent=self)
+
+    def connectDeviceTools(self, deviceTools):
+        deviceTools.test_signal.connect(self.testSerialConnection)
+        deviceTools.reconnect_signal.connect(self.reconnect_device)
+        deviceTools.write_cal_signal.connect(self.update_temperature_input_configuration)
+        deviceTools.iometrics_signal.connect(self.updateIOMetrics)
+
+    @property
+    def sequencesTools(self):
+        return self.sequencesTab.getWidget()
+
+    @property
+    def analysis_tools(self):
+        return self.analysisTab.getWidget()
+
+    @property
+    def deviceTools(self):
+        return self.devicesTab.getWidget()
+
     def initializeControls(self):
         self.sidebar.setControl(which='pidsensor', value=self.hm.getPIDSensor())
         self.sidebar.setControl(which='cryocooler', value=self.hm.getCryocoolerState())
@@ -212,7 +281,7 @@ class GUIManager(QMainWindow):
         '''
             setGateValves opens/closes the gate valve connecting the chamber and the turbo pump depending on the truth value of opened 
         '''
-        self.threadpool.start(Task(self.hm.openGateValve, opened))
+        self.executors.commands.start(Task(self.hm.openGateValve, opened))
 
         if opened:
             self.sidebar.setControl(which='turbovalve', value=1)
@@ -221,11 +290,11 @@ class GUIManager(QMainWindow):
         
     @pyqtSlot(float)
     def setTemperature(self, temperature):
-        self.threadpool.start(Task(self.hm.setTemperature, temperature))
+        self.executors.commands.start(Task(self.hm.setTemperature, temperature))
     
     @pyqtSlot(float)
     def set_magnetic_field(self, magnetic_field):
-        self.threadpool.start(Task(self.hm.set_magnetic_field, magnetic_field))
+        self.executors.commands.start(Task(self.hm.set_magnetic_field, magnetic_field))
         
     @pyqtSlot(float, str)
     def setCurrent(self, current, current_source):
@@ -233,31 +302,49 @@ class GUIManager(QMainWindow):
             self.hm.enableParallelMode(True)
             self.hm.connectSampleTo100A(connected=False)
             self.hm.connectSampleTo6A(connected=True)
-            self.threadpool.start(Task(self.hm.setLargeCurrent, current, self.hardware_parameters['LABEL_CS006A'], vb=True))
+            self.executors.commands.start(Task(self.hm.setLargeCurrent, current, self.hardware_parameters['LABEL_CS006A'], vb=True))
 
         elif current_source == self.hardware_parameters['LABEL_CS100A']:
             self.hm.enableParallelMode(False)
             self.hm.connectSampleTo6A(connected=False)
             self.hm.connectSampleTo100A(connected=True)
-            self.threadpool.start(Task(self.hm.setLargeCurrent, current, self.hardware_parameters['LABEL_CS100A'], vb=True))
+            self.executors.commands.start(Task(self.hm.setLargeCurrent, current, self.hardware_parameters['LABEL_CS100A'], vb=True))
             
         elif current_source == self.hardware_parameters['LABEL_CAEN']:
             self.hm.enableParallelMode(False)
             self.hm.connectSampleTo6A(connected=False)
             self.hm.connectSampleTo100A(connected=True)
-            self.threadpool.start(Task(self.hm.setLargeCurrent, current, self.hardware_parameters['LABEL_CAEN'], vb=True))
+            self.executors.commands.start(Task(self.hm.setLargeCurrent, current, self.hardware_parameters['LABEL_CAEN'], vb=True))
         
         elif current_source == self.hardware_parameters['LABEL_TDK']:
             self.hm.enableParallelMode(False)
             self.hm.connectSampleTo6A(connected=False)
             self.hm.connectSampleTo100A(connected=True)
-            self.threadpool.start(Task(self.hm.setLargeCurrent, current, self.hardware_parameters['LABEL_TDK'], vb=True))
+            self.executors.commands.start(Task(self.hm.setLargeCurrent, current, self.hardware_parameters['LABEL_TDK'], vb=True))
         
     @pyqtSlot(np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray)
+    @tracing.traced('gui')
     def updateSignalsPlots(self, time_tc, time_pm, time_mc, setpoint_temperature, sampleT, targetT, holderT, spareT, pressure, power, setpoint_field, field):
         self.environmentTools.updatePlottingArea(time_tc, time_pm, time_mc, sampleT, targetT, holderT, spareT, pressure, power, field)
         self.sidebar.updateValues(values=[setpoint_temperature[-1], sampleT[-1], targetT[-1], holderT[-1], spareT[-1], power[-1], pressure[-1], setpoint_field[-1], field[-1]])
          
+    def exportTrace(self):
+        '''
+            exportTrace starts tracing the first time it is called, then writes the timeline of the GUI and of the
+            acquisition process to a Chrome trace file (open it in chrome://tracing or ui.perfetto.dev).
+        '''
+        if not tracing.isEnabled():
+            tracing.enable()
+            if self.engine is not None:
+                self.tm.setTracing(True)
+            QMessageBox.information(self, 'Timeline', 'Tracing started. Press Ctrl+T again to export the timeline.')
+            return
+        fpath, _ = QFileDialog.getSaveFileName(self, 'Export timeline', os.getcwd()+'/trace_{}.json'.format(datetime.datetime.now().strftime('%Y%m%d-%H%M%S')), 'Chrome trace (*.json)')
+        if fpath:
+            events = tracing.getEvents() + (self.tm.getTraceEvents() if self.engine is not None else [])
+            tracing.export(fpath, events)
+            self.log_event('Note', 'Timeline of {} events exported to {}'.format(len(events), fpath))
+
     def showHelp(self):
         with open('docs/README.txt') as f:
             QMessageBox.information(self, 'Help', f.read(-1))
@@ -265,7 +352,7 @@ class GUIManager(QMainWindow):
     def calibrate100ACurrentSource(self):
         value, ok = QInputDialog.getInt(self, '100 A current source calibration', 'The calibration will be run in steps of 0.1 A at a rate of 0.5 A/s.\nPlease input the upper current limit:', value=20, max=100, min=10, step=5)
         if ok:
-            self.threadpool.start(Task(self.tm.calibrate100ACurrentSource, currentRangeUpperLimit=value))
+            self.executors.jobs.start(Task(self.tm.calibrate100ACurrentSource, currentRangeUpperLimit=value))
 
     def launch_preferencesWindow(self):
         self.preferencesWindow = PreferencesWindow(self.preferences)
@@ -279,41 +366,45 @@ class GUIManager(QMainWindow):
     @pyqtSlot(float, float, float, str, bool, str)
     def measureIc(self, rampStart, iStep, maxV, currentSource, acquiring, tag):
         if not acquiring:
-            self.threadpool.start(Task(self.tm.measureIc, rampStart=rampStart, iStep=iStep, maxV=maxV, currentSource=currentSource, tag=tag))
+            self.executors.jobs.start(Task(self.tm.measureIc, rampStart=rampStart, iStep=iStep, maxV=maxV, currentSource=currentSource, tag=tag))
         else:
             self.tm.stopAcquiring()
     
     @pyqtSlot(float, float, float, float, bool, str)
     def measureTc(self, rampStart, rampRate, stopT, transportCurrent, acquiring, tag):
         if not acquiring:
-            self.threadpool.start(Task(self.tm.measureTc, startT=rampStart, rampRate=rampRate, stopT=stopT, transportCurrent=transportCurrent, tag=tag))
+            self.executors.jobs.start(Task(self.tm.measureTc, startT=rampStart, rampRate=rampRate, stopT=stopT, transportCurrent=transportCurrent, tag=tag))
         else:
             self.tm.stopAcquiring()
     
     @pyqtSlot(float, str, bool, bool, str)
     def measureVt(self, maxV, current_source, hall_measurement, acquiringVt, tag):
         if not acquiringVt:
-            self.threadpool.start(Task(self.tm.measureVt, maxV=maxV, current_source=current_source, hall_measurement=hall_measurement, tag=tag))
+            self.executors.jobs.start(Task(self.tm.measureVt, maxV=maxV, current_source=current_source, hall_measurement=hall_measurement, tag=tag))
         else:
             self.tm.stopAcquiring()
     
     @pyqtSlot()
+    @tracing.traced('gui')
     def updateIcPlot(self):
-        if self.tm.datapoints != []:
+        if len(self.tm.datapoints) > 0:
             data = np.transpose(self.tm.datapoints)
-            self.threadpool.start(Task(self.icTools.updateActiveLine, current=data[2], voltage=data[3]))
+            self.executors.analysis.start(Task(self.icTools.updateActiveLine, current=data[2], voltage=data[3]))
     
     @pyqtSlot()
+    @tracing.traced('gui')
     def updateTcPlot(self):
-        if self.tm.datapoints != []:
+        if len(self.tm.datapoints) > 0:
             data = np.transpose(self.tm.datapoints)
-            self.threadpool.start(Task(self.tcTools.updateActiveLine, temperature=data[4], voltage=data[3]))
+            self.executors.analysis.start(Task(self.tcTools.updateActiveLine, temperature=data[4], voltage=data[3]))
     
     @pyqtSlot()
+    @tracing.traced('gui')
     def updateVtPlot(self):
-        if self.tm.datapoints != []:
-            data = np.transpose(self.tm.datapoints)
-            self.threadpool.start(Task(self.vtTools.updateActiveLine, time=data[1], voltage=data[3]))
+        datapoints = self.tm.getVtTail()
+        if len(datapoints) > 0:
+            data = np.transpose(datapoints)
+            self.executors.analysis.start(Task(self.vtTools.updateActiveLine, time=data[1], voltage=data[3]))
 
     @pyqtSlot(str)
     def setPIDSensor(self, sensor):
@@ -331,7 +422,8 @@ class GUIManager(QMainWindow):
         when = str(datetime.datetime.now())    
         if logEvent:
             self.logbookTools.addLogEntry(when, what, comment.split('/')[0]) # everything after '/' is ignored for logging purposes (this allows passing parameters silently, e.g. UpdateSequence)
-            self.dm.log_event(when, what, comment.split('/')[0])
+            if (self.engine is None) or not self.engine.hostLogsEvents: # a daemon writes its own logfile
+                self.dm.log_event(when, what, comment.split('/')[0])
               
         if what == 'TempSet':
             self.sidebar.updateSetpointDisplay(float(comment[:-2]))
@@ -339,21 +431,16 @@ class GUIManager(QMainWindow):
         elif what == 'CoolingModeSet':
             self.sidebar.setControl(which='cryocooler', value=int(comment))
         
-        elif what == 'Vt':
-            params = comment.split()
-            tavg, tag = float(params[-3]), params[-1]
-            data, _ = self.tm.pushLastMeasurement()
-            if data != []:
-                self.dm.saveMeasurementToFile(data, measurement=what, tavg=tavg, tag=tag, timestamp=when)
+        elif what == 'Vt': # the data file was already written by the stream during the measurement
             self.vtTools.resetGUI()
             
         elif (what == 'nextIV'):
-            self.threadpool.start(Task(self.icTools.nextMeasurement, comment))
+            self.executors.jobs.start(Task(self.icTools.nextMeasurement, comment))
             
         elif (what == 'Tc'):
             tc, tag = float(comment.split()[2]), comment.split()[-1]
             data, _ = self.tm.pushLastMeasurement()
-            self.dm.saveMeasurementToFile(data, measurement=what, tc=tc, tag=tag, timestamp=when)
+            self.executors.io.start(Task(self.dm.saveMeasurementToFile, data, measurement=what, tc=tc, tag=tag, timestamp=when))
             self.tcTools.resetGUI()
 
         elif (what == 'IcSequenceComplete'):
@@ -387,14 +474,24 @@ class GUIManager(QMainWindow):
             ------
             device (str) - name of device to test
         '''
-        self.threadpool.start(Task(self.hm.testSerialConnection, device))
+        self.executors.commands.start(Task(self.hm.testSerialConnection, device))
+
+    @pyqtSlot()
+    def updateIOMetrics(self):
+        '''
+            updateIOMetrics shows the I/O and lock metrics of the devices in the help tab
+        '''
+        try:
+            self.deviceTools.displayIOMetrics(self.hm.getIOMetrics())
+        except Exception as e:
+            print('GUIManager::updateIOMetrics raised: ', e)
 
     @pyqtSlot()
     def resetQPS(self):
         '''
             resetQPS resets the Quench Protection System (Quenchbox) after a fault
         '''
-        self.threadpool.start(Task(self.tm.resetQPS))
+        self.executors.commands.start(Task(self.tm.resetQPS))
 
     @pyqtSlot()
     def warmup(self):
@@ -402,24 +499,28 @@ class GUIManager(QMainWindow):
 
         if reply == QMessageBox.Yes:
             self.setGateValves(opened=False)
-            self.threadpool.start(Task(self.tm.warmup))
+            self.executors.jobs.start(Task(self.tm.warmup))
             print('Warmup initiated!')
     
 
-    @pyqtSlot(list)
+    @pyqtSlot(object)
     def runSequence(self, sequence):
-        if sequence != []:
-            self.threadpool.start(Task(self.tm.runSequence, sequence=sequence))
+        if len(sequence) > 0:
+            self.executors.jobs.start(Task(self.tm.runSequence, sequence=sequence))
         else:
-            self.tm.sequenceRunning = False
-            self.tm.stopAcquiring()
+            self.tm.stopSequence()
+
+    @pyqtSlot()
+    def resumeSequence(self):
+        self.executors.jobs.start(Task(self.tm.resumeSequence))
 
     def enableGUI(self, enabled=True):
         self.icTools.enable(enabled)
         self.tcTools.enable(enabled)
         self.sidebar.enable(enabled)
-        self.sequencesTools.enable(enabled)
-        self.sidebar.enable(enabled)
+        self.sequencesEnabled = enabled
+        if self.sequencesTab.isBuilt():
+            self.sequencesTools.enable(enabled)
         self.vtTools.enable(enabled)
 
     @pyqtSlot(str, str, bool, bool, bool)
@@ -445,7 +546,7 @@ class GUIManager(QMainWindow):
             if ln2Measurements:
                 self.tabWidget.removeTab(self.tabWidget.indexOf(self.tcTools))
                 self.tabWidget.removeTab(self.tabWidget.indexOf(self.environmentTools))
-                self.tabWidget.removeTab(self.tabWidget.indexOf(self.sequencesTools))
+                self.tabWidget.removeTab(self.tabWidget.indexOf(self.sequencesTab))
                 ln2Note = 'LN2 '
                 
             self.tm.startReadings(ln2Measurements)
@@ -453,6 +554,8 @@ class GUIManager(QMainWindow):
             
             self.log_event('Startup', '{}Session started'.format(ln2Note))
             self.sessionStarted = True
+            if (not ln2Measurements) and (self.tm.getSequenceCheckpoint() is not None): # builds the Sequences tab only to offer the resume
+                self.sequencesTools.offerResume()
     
     @pyqtSlot()
     def stopSession(self):
@@ -473,6 +576,5 @@ class GUIManager(QMainWindow):
     
     @pyqtSlot(str)
     def reconnect_device(self, device_key):
-        self.hardware_parameters = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
         self.hm.reconnect_device(device_key)
         
\ No newline at end of file
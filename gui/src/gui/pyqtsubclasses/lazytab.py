@@ -0,0 +1,41 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout
+import startupprofiler
+
+'''
+	LazyTab holds the place of a tab whose widget is built the first time the tab is shown, or the first time
+	getWidget is called, e.g. to show a status in a tab that has not been opened yet. The factory may import the
+	module of the widget, so that its dependencies are not loaded at startup.
+
+	INPUTS
+	----------
+	factory (callable) - returns the widget, called once
+	onBuilt (callable) - called with the widget once it is built, e.g. to connect its signals
+	label (str) - name of the widget in the startup profile
+
+	@author Alexis Devitre
+	@lastModified October 2026
+'''
+class LazyTab(QWidget):
+    def __init__(self, factory, onBuilt=None, label='', parent=None):
+        super(LazyTab, self).__init__(parent)
+        self.factory, self.onBuilt, self.label = factory, onBuilt, label
+        self.widget = None
+
+        self.verticalLayout = QVBoxLayout(self)
+        self.verticalLayout.setContentsMargins(0, 0, 0, 0)
+
+    def isBuilt(self):
+        return self.widget is not None
+
+    def getWidget(self):
+        if self.widget is None:
+            with startupprofiler.measure('{} (on first use)'.format(self.label)):
+                self.widget = self.factory()
+            self.verticalLayout.addWidget(self.widget)
+            if self.onBuilt is not None:
+                self.onBuilt(self.widget)
+        return self.widget
+
+    def showEvent(self, event):
+        self.getWidget()
+        super(LazyTab, self).showEvent(event)
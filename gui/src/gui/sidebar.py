@@ -6,7 +6,7 @@ from PyQt5.QtCore import pyqtSignal, Qt, QSize
 
 from hoverbutton import HoverButton
 from horizontalline import HorizontalLine
-from configure import load_json
+from configservice import config
 
 ID_SENSOR_A = 1
 ID_SENSOR_B = 2
@@ -39,7 +39,7 @@ class Sidebar(QWidget):
 
     def __init__(self, parent=None):
         super(Sidebar, self).__init__(parent)
-        self.styles = load_json(fname='styles.json', location=os.getcwd()+'/config')  # stylesheets for QtWidgets
+        self.styles = config.get('styles.json')  # stylesheets for QtWidgets
 
         self.chamberLightOn = False
         self.targetLightOn = False
@@ -6,10 +6,10 @@ from PyQt5.uic import loadUi
 import logging
 import os, shutil
 from datetime import datetime
-from configure import load_json
+from configservice import config
 import re
 
-HARDWARE_PARAMETERS = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
+HARDWARE_PARAMETERS = config.get('hwparams.json')
 
 LABEL_CS100A = 'HP6260B-120A'
 LABEL_CS006A = '2231A-30-3-6A'
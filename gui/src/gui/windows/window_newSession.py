@@ -7,7 +7,7 @@ import logging
 from GetDirWindow import launchWindow
 import os, shutil
 from datetime import datetime
-from configure import load_json
+from configservice import config
 
 class NewSessionWindow(QWidget):
 
@@ -22,7 +22,7 @@ class NewSessionWindow(QWidget):
 
     def __init__(self, parent = None, default_directory='/home/htsirradiation/Documents/data'):
         super(NewSessionWindow, self).__init__(parent)
-        styles = load_json(fname='styles.json')            # stylesheets for QtWidgets
+        styles = config.get('styles.json')            # stylesheets for QtWidgets
         
         self.setGeometry(100, 100, 500, 325)               # x, y, width, height
         QGridLayout = QtWidgets.QGridLayout(self)
@@ -99,7 +99,7 @@ class NewSessionWindow(QWidget):
         GetDirWindow.setFileMode(QFileDialog.Directory)
         if GetDirWindow.exec_():
             directory = GetDirWindow.selectedFiles()
-            if directory is not []:
+            if directory:
                 self.QLineEdit_folderName.setText(directory[0].split('/')[-1])
                 self.QLineEdit_homeDirectory.setText('/'.join(directory[0].split('/')[:-1]))
         
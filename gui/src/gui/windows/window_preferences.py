@@ -1,5 +1,4 @@
-from PyQt5.QtWidgets import QWidget, QGridLayout, QLabel, QLineEdit, QSpinBox, QPushButton, QComboBox
-from PyQt5 import QtGui
+from PyQt5.QtWidgets import QWidget, QGridLayout, QLabel, QLineEdit, QSpinBox, QPushButton, QComboBox, QDesktopWidget
 import re
 
 from PyQt5.QtCore import pyqtSignal#, Qt, QObject, 
@@ -15,7 +14,7 @@ class PreferencesWindow(QWidget):
         gridLayout = QGridLayout(self)
         
         emaillist = ''
-        if preferences['emails'] != []:
+        if preferences['emails']:
             emaillist = preferences['emails'][0]
             for email in preferences['emails'][1:]:
                 emaillist += ', '+email
@@ -37,7 +36,7 @@ class PreferencesWindow(QWidget):
         labelSaveRate = QLabel('Back up data every (s):')
         self.spinBoxSaveRate = QSpinBox()
         self.spinBoxSaveRate.setRange(30, 600)
-        self.spinBoxSaveRate.setValue(preferences['saverate']/1000)
+        self.spinBoxSaveRate.setValue(int(preferences['saverate']/1000))
         
         # cancel and start new session buttons
         buttonCancel = QPushButton('Cancel')
@@ -61,8 +60,8 @@ class PreferencesWindow(QWidget):
         
         #window setup
         self.setWindowTitle("Preferences")
-        resolution = QtGui.QDesktopWidget().screenGeometry()
-        self.move((resolution.width()-self.frameSize().width())/2, (resolution.height()-self.frameSize().height())/2)
+        resolution = QDesktopWidget().screenGeometry()
+        self.move(int((resolution.width()-self.frameSize().width())/2), int((resolution.height()-self.frameSize().height())/2))
     
     def QPushButtonCancel_Pressed(self):
         self.close()
@@ -1,7 +1,8 @@
-import os, time
+import os
+import clock, tracing
 
 from PyQt5.QtCore import QObject, pyqtSignal
-from configure import load_json
+from configservice import config
 
 from relays import Relays
 from nanovoltmeter import NanoVoltmeter
@@ -28,12 +29,13 @@ class HardwareManager(QObject):
     
     log_signal = pyqtSignal(str, str)
     
-    hardware_parameters = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
-    
     def __init__(self, parent=None, vb=False):
         self.tc, self.pm, self.nvm, self.dmm = None, None, None, None
         super(HardwareManager, self).__init__(parent)
-        self.preferences = load_json(fname='preferences.json', location=os.getcwd()+'/config')
+        config.attach(self, 'preferences', 'preferences.json')
+        config.attach(self, 'hardware_parameters', 'hwparams.json')
+        self.outputCurrents, self.outputCounter = {}, 0 # current source: last current requested, and number of times a source was turned on, see isSourcingCurrent
+        self.fieldHolding = False # last HOLDING state of the magnet, see getFieldHolding
         
         self.vs = VoltageSource(vb=vb)
         self.csCAEN = CurrentSourceCAEN(serialDevice=False, vb=vb)
@@ -71,6 +73,7 @@ class HardwareManager(QObject):
     def getFaradayCupState(self):
         return self.relays.getFaradayCupState()
         
+    @tracing.traced('hardware')
     def getPressureReading(self):
         pressure = self.pm.getPressure()
         if ((self.pm.igOn) & (pressure > 2.5e-3)) | ((not self.pm.igOn) & (pressure < 2.5e-3)):
@@ -85,7 +88,17 @@ class HardwareManager(QObject):
     
     def field_stable(self):
         return self.mc.field_stable()
+
+    def getFieldHolding(self):
+        '''
+            getFieldHolding returns whether the magnet is HOLDING at its target. The state is only queried (STATE?)
+            until the magnet reports HOLDING after startup or after set_magnetic_field, then the last state is returned.
+        '''
+        if not self.fieldHolding:
+            self.fieldHolding = self.mc.field_stable()
+        return self.fieldHolding
     
+    @tracing.traced('hardware')
     def getTemperatureReading(self):
         sampleT, targetT, holderT, spareT = self.tc.getTemperatureReadings()
         heatingPower = self.tc.getHeatingPower()
@@ -98,9 +111,11 @@ class HardwareManager(QObject):
     def getTargetTemperature(self):
         return self.tc.getTargetTemperature()
     
+    @tracing.traced('hardware')
     def getVoltageReading(self, removeOffset=True):
         return self.nvm.measure(removeOffset)
     
+    @tracing.traced('hardware')
     def getCurrentReading(self, useDMM=True):
         if useDMM:
             current = self.dmm.measure()
@@ -108,6 +123,78 @@ class HardwareManager(QObject):
             current = self.csCAEN.getCurrent()
         return current
     
+    @tracing.traced('hardware')
+    def acquireSynchronizedPairs(self, count, mode='hardware', period=0.):
+        '''
+            acquireSynchronizedPairs samples count current/voltage pairs with the DMM6500 and the 2182A
+            triggered together, then fetches both buffers in bulk.
+            In 'hardware' mode the DMM paces the readings and triggers the nanovoltmeter through the
+            trigger link cable; in 'software' mode both instruments are armed on bus triggers and
+            *TRG is sent to each of them back to back for every pair.
+
+            INPUTS
+            ----------
+            count (int) - number of pairs
+            mode (str) - 'hardware' or 'software'
+            period (float) - time between pairs in seconds
+
+            RETURNS
+            ----------
+            currents, voltages (float, array) - current in amps and voltage in volts of each pair (offset removed)
+            times (float, array) - time of each pair in seconds, relative to the first one
+        '''
+        software = (mode == 'software')
+        self.nvm.armTriggerLink(count, source='bus' if software else 'ext')
+        self.dmm.armTriggerLink(count, software=software, period=period)
+        self.dmm.initiate()
+        if software:
+            for k in range(count):
+                self.dmm.trigger()
+                self.nvm.trigger()
+                clock.sleep(period)
+        timeout = 5.+count*period
+        currents, times = self.dmm.fetchTriggerLink(count, timeout=timeout)
+        voltages = self.nvm.fetchTriggerLink(count, timeout=timeout)
+        return currents, voltages, times
+
+    def armTriggerLink(self, mode='hardware'):
+        '''
+            armTriggerLink loads the trigger models of single pair acquisitions in the DMM6500 and the 2182A,
+            once per measurement, so that readArmedPair only has to restart them. disarmTriggerLink returns the
+            instruments to free running.
+
+            INPUTS
+            ----------
+            mode (str) - 'hardware' or 'software', see acquireSynchronizedPairs
+        '''
+        software = (mode == 'software')
+        self.nvm.armTriggerLink(1, source='bus' if software else 'ext')
+        self.dmm.armTriggerLink(1, software=software)
+
+    @tracing.traced('hardware')
+    def readArmedPair(self, mode='hardware'):
+        '''
+            readArmedPair samples one current/voltage pair with the trigger models loaded by armTriggerLink.
+
+            RETURNS
+            ----------
+            current (float) - current in amps, NaN if the DMM did not trigger
+            voltage (float) - voltage in volts (offset removed), NaN if the 2182A did not trigger
+        '''
+        self.nvm.rearmTriggerLink()
+        self.dmm.rearmTriggerLink()
+        self.dmm.initiate()
+        if mode == 'software':
+            self.dmm.trigger()
+            self.nvm.trigger()
+        currents, times = self.dmm.fetchTriggerLink(1)
+        voltages = self.nvm.fetchTriggerLink(1)
+        return currents[0], voltages[0]
+
+    def disarmTriggerLink(self):
+        self.dmm.disarmTriggerLink()
+        self.nvm.disarmTriggerLink()
+
     def getShuntResistance(self):
         return self.cs100A.shuntR
     
@@ -117,25 +204,63 @@ class HardwareManager(QObject):
     def getHeatingPower(self):
         return self.tc.getHeatingPower()
 
+    @tracing.traced('hardware')
     def rampTemperature(self, rampTo, rampRate, ramping=False):
         self.tc.rampTemperature(rampRate, ramping)
-        time.sleep(.1)
+        clock.sleep(.1)
         self.tc.setSetpointTemperature(rampTo)
-        time.sleep(.1)
+        clock.sleep(.1)
 
+    @tracing.traced('hardware')
     def setVoltageOffset(self):
         return self.nvm.setOffset()
     
+    @tracing.traced('hardware')
+    def measureVoltageOffset(self, n=5):
+        return self.nvm.measureOffset(n=n)
+    
+    def applyVoltageOffset(self, offset):
+        self.nvm.offset = offset
+    
     def setSmallCurrentPolarity(self, polarity=0):
         self.cs100mA.setPolarity(polarity)
         
-    def setSmallCurrent(self, current=0):
-        self.cs100mA.setCurrent(current)
+    def recordOutputCurrent(self, currentSource, current, setter):
+        '''
+            recordOutputCurrent calls setter and keeps track of the current requested from currentSource. A source is
+            counted as on before it is asked for a non-zero current and as off only once it was set to zero.
+        '''
+        if current != 0:
+            self.outputCurrents[currentSource] = current
+            self.outputCounter += 1
+        result = setter()
+        if current == 0:
+            self.outputCurrents[currentSource] = 0
+        return result
+
+    def isSourcingCurrent(self):
+        '''
+            RETURNS
+            ----------
+            sourcing (bool) - True when a current source was last set to a non-zero current, whoever set it
+        '''
+        return any([current != 0 for current in list(self.outputCurrents.values())])
+
+    @tracing.traced('hardware')
+    def setSmallCurrent(self, current=0, settle=True):
+        self.recordOutputCurrent(self.hardware_parameters['LABEL_LS121'], current, lambda: self.cs100mA.setCurrent(current, settle=settle))
     
+    @tracing.traced('hardware')
     def setLargeCurrent(self, current=0, currentSource="HP6260B-120A", calib=True, vb=False):
         if vb: self.log_signal.emit('CurrentSet', 'Power supply {} set by user to {:4.2f} A'.format(currentSource, current))
-        return self.cs100A.setCurrent(current, currentSource, calib, vb=vb)
+        return self.recordOutputCurrent(currentSource, current, lambda: self.cs100A.setCurrent(current, currentSource, calib, vb=vb))
     
+    @tracing.traced('hardware')
+    def startHardwareRamp(self, currents, dwell, simulated=False):
+        self.outputCurrents[self.hardware_parameters['LABEL_CS100A']] = max(currents) if len(currents) else 0 # cleared when the source is set to zero
+        self.outputCounter += 1
+        return self.cs100A.startHardwareRamp(currents, dwell, simulated=simulated)
+
     def update_temperature_input_configuration(self, configuration):
         self.tc.set_input_configuration(self.hardware_parameters['calibrations'][configuration])
 
@@ -146,12 +271,14 @@ class HardwareManager(QObject):
         self.cs100A.updateCalibration(a, b)
     
     def set_magnetic_field(self, magnetic_field):
+        self.fieldHolding = False
         self.mc.set_magnetic_field(magnetic_field)
         self.log_signal.emit('MagSet', 'AMI Magnet field set to {:4.2f} T'.format(magnetic_field))
 
+    @tracing.traced('hardware')
     def setTemperature(self, temperature):
         self.setSetpointTemperature(temperature)
-        time.sleep(0.1)
+        clock.sleep(0.1)
         self.setHeaterOutput(on=True)
         if temperature < self.tc.getTargetTemperature():
             self.setCooler(on=True)
@@ -159,14 +286,14 @@ class HardwareManager(QObject):
         
     def setSetpointTemperature(self, temperature):
         self.tc.setSetpointTemperature(temperature)
-        time.sleep(.1)
+        clock.sleep(.1)
     
     def setPIDSensor(self, sensor='B'):
         self.tc.setPIDSensor(sensor=sensor)
 
     def setHeaterOutput(self, on=True):
         self.tc.setHeaterOutput(on)
-        time.sleep(.1)
+        clock.sleep(.1)
     
     def setCooler(self, on=True):
         self.relays.setCooler(on=on)
@@ -177,9 +304,9 @@ class HardwareManager(QObject):
             
     def connectCurrentSource100mATo(self, device='sample'):
         self.relays.connectCurrentSource100mATo(device) # connect current source
-        time.sleep(1)
+        clock.sleep(1)
         self.cs100mA.enable(enabled=True)
-        time.sleep(1)
+        clock.sleep(1)
         
     def connectSampleTo6A(self, connected=True):
         self.relays.connectSampleTo6A(connected)
@@ -189,7 +316,7 @@ class HardwareManager(QObject):
     
     def enableCurrentSource100mA(self, enabled=True):
         self.cs100mA.enable(enabled)
-        time.sleep(.1)
+        clock.sleep(.1)
     
     def measureSampleWith(self, device='picoammeter'):
         '''
@@ -249,6 +376,26 @@ class HardwareManager(QObject):
             connected = False
         self.log_signal.emit('SerialStatus', '{}~{}'.format(device, connected))
 
+    def getIOMetrics(self):
+        '''
+            getIOMetrics returns the I/O and lock metrics of the devices, see IOMetrics.getSnapshot
+
+            RETURNS
+            -------
+            metrics (dict) - name of the device: snapshot of its metrics with its connection status under 'connected'
+        '''
+        metrics = {}
+        for device in [self.tc, self.mc, self.pm, self.nvm, self.dmm, self.vs, self.csCAEN, self.csTDK, self.cs100mA, self.relays]:
+            if getattr(device, 'metrics', None) is None:
+                continue
+            snapshot = device.metrics.getSnapshot()
+            if hasattr(device, 'isConnected'):
+                snapshot['connected'] = device.isConnected()
+            else:
+                snapshot['connected'] = bool(getattr(device, 'connected', True)) and (getattr(device, 'ser', None) is not None) # the relays have no greeting
+            metrics[snapshot['device']] = snapshot
+        return metrics
+
     def setTargetLight(self, on=False):
         self.relays.setTargetLight(on=on)
 
@@ -270,7 +417,6 @@ class HardwareManager(QObject):
             --------
             device_key (str) - the unique identifier for a given device which allows the code to find all information related to this device in hwparams.json
         '''
-        self.hardware_parameters = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
         if device_key == 'temperature_controller':
             if self.tc is not None: del self.tc
             self.tc = TemperatureController(int(self.preferences["sampling_period_tc"]*1000-50), serialDevice=True)
@@ -0,0 +1,288 @@
+import os, json, gzip, time, atexit, builtins, datetime, threading, collections
+
+import clock
+
+'''
+    Record and replay of instrument I/O.
+
+    The device classes open their ports through openPort. Normally it returns the port itself. While recording, it
+    returns a RecordingPort that writes every call (write, read, readline, ask, sendall, recv) to a trace file with its
+    time, its duration and the bytes that went through. While replaying, it returns a ReplayPort that serves the
+    recorded responses instead of talking to an instrument, and takes as long as the instrument did, so a session
+    recorded on the setup can be run again offline to measure the effect of a change on the timing of measurements.
+
+    The trace is a gzip file of JSON lines, a header followed by one line per call:
+        [time, device, method, duration, data, binary]
+    where data is what was sent (write, sendall) or received (read, readline, ask, recv) and binary tells whether
+    it was bytes (stored as latin-1 text) or a string. A call that raised, e.g. a socket timeout, has a seventh item
+    [exception class, message] and is raised again when it is replayed.
+
+    Recording and replay are enabled with the HTS_IO_RECORD and HTS_IO_REPLAY environment variables (see main.py
+    --record-io and --replay-io), so that the acquisition process inherits them.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+OUTPUT_METHODS = ('write', 'sendall')
+INPUT_METHODS = ('read', 'readline', 'ask', 'recv')
+FORMAT = 'hts-iotrace'
+LOOKAHEAD = 20 # recorded calls of a device searched for the call being replayed
+
+
+def encode(data):
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data).decode('latin-1'), True
+    return ('' if data is None else str(data)), False
+
+def decode(data, binary):
+    return data.encode('latin-1') if binary else data
+
+def rebuildError(error):
+    '''
+        RETURNS
+        ----------
+        exception (OSError) - exception of the recorded class when it is a built-in OSError, e.g. TimeoutError, an
+                              OSError otherwise, e.g. for a SerialException
+    '''
+    name, message = error
+    cls = getattr(builtins, name, None)
+    if not (isinstance(cls, type) and issubclass(cls, OSError)):
+        cls = OSError
+    return cls(message)
+
+
+class TraceRecorder:
+    '''
+        TraceRecorder appends the calls of all recording ports to a trace file.
+
+        INPUTS
+        ----------
+        path (str) - trace file, overwritten
+        flushEvery (int) - number of calls between flushes of the compressed stream
+    '''
+    def __init__(self, path, flushEvery=200):
+        self.path, self.flushEvery = path, flushEvery
+        self.mutex = threading.Lock()
+        self.file, self.closed, self.count = None, False, 0
+
+    def open(self):
+        # opened with the first call, so that only the process that talks to the instruments writes the file
+        self.file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self.file.write(json.dumps({'format': FORMAT, 'version': 2, 'started': str(datetime.datetime.now())})+'\n')
+
+    def record(self, device, method, start, data, error=None):
+        data, binary = encode(data)
+        entry = [start, device, method, time.time()-start, data, binary]
+        if error is not None:
+            entry.append([type(error).__name__, str(error)])
+        line = json.dumps(entry)
+        with self.mutex:
+            if self.closed:
+                return
+            if self.file is None:
+                self.open()
+            self.file.write(line+'\n')
+            self.count += 1
+            if self.count % self.flushEvery == 0:
+                self.file.flush()
+
+    def close(self):
+        with self.mutex:
+            self.closed = True
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class RecordingPort:
+    '''
+        RecordingPort forwards every call to the port and records the I/O calls.
+    '''
+    def __init__(self, port, device, recorder):
+        self.port, self.device, self.recorder = port, device, recorder
+
+    def __getattr__(self, name):
+        attribute = getattr(self.port, name)
+        if name in OUTPUT_METHODS:
+            def output(data, *args, **kwargs):
+                start = time.time()
+                try:
+                    result = attribute(data, *args, **kwargs)
+                except Exception as e:
+                    self.recorder.record(self.device, name, start, data, error=e)
+                    raise
+                self.recorder.record(self.device, name, start, data)
+                return result
+            return output
+        if name in INPUT_METHODS:
+            def inputCall(*args, **kwargs):
+                start = time.time()
+                try:
+                    result = attribute(*args, **kwargs)
+                except Exception as e: # e.g. a recv timeout, recorded so that the replay keeps in step
+                    self.recorder.record(self.device, name, start, None, error=e)
+                    raise
+                self.recorder.record(self.device, name, start, result) # the command of ask is not stored, only its response
+                return result
+            return inputCall
+        return attribute
+
+
+class TraceReplay:
+    '''
+        TraceReplay holds the calls of a trace, one queue per device.
+
+        Each input call of a ReplayPort returns the next recorded response of the same device and method, so the
+        devices get the same answers in the same order as during the recording. Output calls are compared with the
+        recorded ones. A call is looked for among the next LOOKAHEAD recorded calls of its device: the recorded calls
+        before it, which the code no longer makes, are skipped. A call that is not found, e.g. a new command, is counted
+        as unmatched and leaves the queue as it is, so that the trace can be replayed after the commands changed.
+
+        INPUTS
+        ----------
+        path (str) - trace file written by TraceRecorder
+        timing (bool) - each call takes as long as it took during the recording
+    '''
+    def __init__(self, path, timing=True):
+        self.path, self.timing = path, timing
+        self.mutex = threading.Lock()
+        self.queues = collections.defaultdict(collections.deque)
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('format') != FORMAT:
+                raise ValueError('{} is not an instrument I/O trace'.format(path))
+            for line in f:
+                entry = json.loads(line)
+                t, device, method, duration, data, binary = entry[:6]
+                self.queues[device].append((method, duration, decode(data, binary), entry[6] if len(entry) > 6 else None))
+        self.stats = collections.Counter()
+
+    def next(self, device, method, data=None):
+        '''
+            next returns the next recorded call of device with the same method, and data when it is an output call.
+
+            RETURNS
+            ----------
+            duration (float) - recorded duration of the call in seconds, 0 if the call is not found
+            data - recorded response of an input call, None if the call is not found
+            error (list) - [exception class, message] if the recorded call raised, None otherwise
+        '''
+        with self.mutex:
+            queue = self.queues[device]
+            for index in range(min(LOOKAHEAD, len(queue))):
+                recordedMethod, duration, recordedData, error = queue[index]
+                if (recordedMethod == method) and ((data is None) or (recordedData == data)):
+                    break
+            else:
+                self.stats['unmatched'] += 1
+                return 0., None, None
+            for k in range(index):
+                queue.popleft()
+            queue.popleft()
+            self.stats['skipped'] += index
+            self.stats['matched'] += 1
+        if self.timing:
+            clock.sleep(duration)
+        return duration, recordedData, error
+
+    def getStats(self):
+        '''
+            RETURNS
+            ----------
+            stats (dict) - 'matched' calls, recorded calls 'skipped' because the code did not make them, calls 'unmatched'
+                           in the trace, and the calls 'left' unused in the trace
+        '''
+        with self.mutex:
+            return dict(self.stats, left=sum([len(queue) for queue in self.queues.values()]))
+
+
+class ReplayPort:
+    '''
+        ReplayPort stands for a serial port, a socket or a USBTMC instrument during a replay.
+    '''
+    def __init__(self, device, replay):
+        self.device, self.replay = device, replay
+
+    def write(self, data, *args, **kwargs):
+        self.output('write', data)
+        return len(data)
+
+    def sendall(self, data, *args, **kwargs):
+        self.output('sendall', data)
+
+    def read(self, *args, **kwargs):
+        return self.respond('read', b'')
+
+    def readline(self, *args, **kwargs):
+        return self.respond('readline', b'')
+
+    def recv(self, *args, **kwargs):
+        data = self.respond('recv', None)
+        if data is None: # a socket would wait for the response, raise instead of returning the end of the stream
+            raise OSError('no recorded response for {}'.format(self.device))
+        return data
+
+    def ask(self, command, *args, **kwargs):
+        return self.respond('ask', '')
+
+    def output(self, method, data):
+        duration, _, error = self.replay.next(self.device, method, data)
+        if error is not None:
+            raise rebuildError(error)
+
+    def respond(self, method, empty):
+        duration, data, error = self.replay.next(self.device, method)
+        if error is not None:
+            raise rebuildError(error)
+        return empty if data is None else data
+
+    def __getattr__(self, name): # close, connect, setsockopt, ...
+        return lambda *args, **kwargs: None
+
+
+_recorder, _replay = None, None
+
+def startRecording(path):
+    global _recorder
+    stopRecording()
+    _recorder = TraceRecorder(path)
+
+def stopRecording():
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+def startReplay(path, timing=True):
+    global _replay
+    _replay = TraceReplay(path, timing=timing)
+
+def getReplay():
+    return _replay
+
+def openPort(device, factory):
+    '''
+        openPort opens the port of a device, or the port that records or replays its I/O.
+
+        INPUTS
+        ----------
+        device (str) - name of the device in the trace
+        factory (function) - opens and returns the real port, not called during a replay
+
+        RETURNS
+        ----------
+        port - the port, a RecordingPort or a ReplayPort
+    '''
+    if _replay is not None:
+        return ReplayPort(device, _replay)
+    port = factory()
+    if _recorder is not None:
+        return RecordingPort(port, device, _recorder)
+    return port
+
+if os.environ.get('HTS_IO_REPLAY'):
+    startReplay(os.environ['HTS_IO_REPLAY'], timing=os.environ.get('HTS_IO_REPLAY_TIMING', '1') != '0')
+elif os.environ.get('HTS_IO_RECORD'):
+    startRecording(os.environ['HTS_IO_RECORD'])
+atexit.register(stopRecording)
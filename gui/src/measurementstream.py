@@ -0,0 +1,114 @@
+import collections, threading
+import numpy as np
+
+class MeasurementStream:
+    '''
+        MeasurementStream writes a long measurement to disk while it is being acquired.
+
+        Datapoints are optionally reduced to a target sample rate, by averaging or by keeping the first
+        point of each window, then buffered and appended to the file every chunkSize points. Only the
+        last tailLength points are kept in memory, for the live plot. The header line is written with a
+        fixed width so that the average temperature can be filled in when the measurement is closed.
+
+        @author Alexis Devitre devitre@mit.edu
+        @lastModified October 2026
+    '''
+    HEADER = '# Tavg = {:8.2f} K, {}\n'
+
+    def __init__(self, path, tag, float2datetime, chunkSize=100, targetRate=0., reduction='average', tailLength=5000):
+        '''
+            INPUTS
+            ----------
+            path (str) - file to create
+            tag (str) - data file label
+            float2datetime (function) - converts the datetime float of a datapoint to a string
+            chunkSize (int) - number of reduced points buffered before each write
+            targetRate (float) - sample rate after reduction in Hz, 0 keeps every point
+            reduction (str) - 'average' or 'decimate'
+            tailLength (int) - number of reduced points kept in memory
+        '''
+        self.path, self.tag, self.float2datetime = path, tag, float2datetime
+        self.chunkSize, self.reduction = max(int(chunkSize), 1), reduction
+        self.window = 1./targetRate if targetRate > 0 else 0.
+        self.pending, self.bin, self.binStart = [], [], None
+        self.tail = collections.deque(maxlen=tailLength)
+        self.mutex = threading.Lock()
+        self.count, self.temperatureSum, self.temperatureCount, self.lastDatapoint = 0, 0., 0, None # temperatureCount excludes the failed (NaN) reads
+
+        self.f = open(path, 'w')
+        self.f.write(self.HEADER.format(np.nan, tag))
+        self.f.write('#{:30}  {:6}  {:20}  {:20}  {:6}  {:6}  {:6}  {:6}'.format('datetime', 't_s', 'iHTS_A', 'vHTS_V', 'tHTS_K', 'tTAR_K', 'tHOL_K', 'tSPA_K'))
+        self.f.flush()
+
+    def append(self, datapoint):
+        '''
+            append adds one raw datapoint [datetime, t, i, v, sampleT, targetT, ..., holderT, spareT].
+        '''
+        self.lastDatapoint = datapoint
+        if self.window == 0.:
+            self.store(datapoint)
+            return
+
+        if (self.binStart is not None) and (datapoint[1]-self.binStart >= self.window):
+            self.closeBin()
+        if self.binStart is None:
+            self.binStart = datapoint[1]
+        self.bin.append(datapoint)
+
+    def closeBin(self):
+        if self.bin:
+            if self.reduction == 'average':
+                reduced = list(np.nanmean(np.array(self.bin, dtype=float), axis=0))
+                reduced[0] = self.bin[len(self.bin)//2][0] # averaging datetime floats across a minute boundary is meaningless
+            else:
+                reduced = self.bin[0]
+            self.store(reduced)
+        self.bin, self.binStart = [], None
+
+    def store(self, datapoint):
+        self.pending.append(datapoint)
+        with self.mutex:
+            self.tail.append(datapoint)
+        self.count += 1
+        if not np.isnan(datapoint[4]):
+            self.temperatureSum += datapoint[4]
+            self.temperatureCount += 1
+        if len(self.pending) >= self.chunkSize:
+            self.flush()
+
+    def flush(self):
+        for datapoint in self.pending:
+            self.f.write('\n{:<30}  {:6.2f}  {:20.8e}  {:20.8e}  {:6.4f}  {:6.4f}  {:6.4f}  {:6.4f}'.format(self.float2datetime(datapoint[0]), datapoint[1], datapoint[2], datapoint[3], datapoint[4], datapoint[5],  datapoint[-2],  datapoint[-1]))
+        self.f.flush()
+        self.pending = []
+
+    def getTail(self):
+        '''
+            RETURNS
+            ----------
+            datapoints (list) - copy of the reduced points kept in memory, safe to use from another thread
+        '''
+        with self.mutex:
+            return list(self.tail)
+
+    def getAverageTemperature(self):
+        return self.temperatureSum/self.temperatureCount if self.temperatureCount > 0 else np.nan
+
+    def close(self, tavg=None):
+        '''
+            close writes the remaining points and fills in the header.
+
+            RETURNS
+            ----------
+            count (int) - number of points written
+        '''
+        if self.f.closed:
+            return self.count
+        self.closeBin()
+        self.flush()
+        if tavg is None:
+            tavg = self.getAverageTemperature()
+        self.f.seek(0)
+        self.f.write(self.HEADER.format(tavg, self.tag))
+        self.f.close()
+        return self.count
@@ -0,0 +1,226 @@
+import time, threading, collections
+import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+'''
+    Metrics exporter.
+
+    MetricsExporter serves the health of the acquisition on http://127.0.0.1:<metrics_port>/metrics in the Prometheus
+    text format, so that a local Prometheus and Grafana can chart and alert on long unattended runs:
+
+        hts_samples_total, hts_sample_rate                  environment readings stored per signal (tc, pm, mc)
+        hts_timer_runs_total, hts_timer_overruns_total      telemetry updates, and those that ended after their next tick
+        hts_device_*                                        calls, timeouts, errors, malformed responses and lock waits, see IOMetrics
+        hts_executor_*                                      queued, active and completed tasks of each thread pool
+        hts_environment_buffer_bytes, _rows                 memory held by the environment traces of the DataManager
+        hts_sequence_running, hts_sequence_step             state of the sequence, the step is labelled with its action
+        hts_measurement_points, hts_measurement_point_rate  points of the measurement in progress
+
+    It runs in the process that talks to the instruments and answers from its own thread: the values are read when
+    the endpoint is scraped, the GUI event loop is not involved. The exporter is off when metrics_port is 0.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+RATE_WINDOW = 60. # seconds over which hts_sample_rate is averaged
+
+
+class MetricFamily:
+    '''
+        MetricFamily holds the samples of one metric and writes them in the Prometheus text format.
+    '''
+    def __init__(self, name, kind, description):
+        self.name, self.kind, self.description = name, kind, description
+        self.samples = []
+
+    def add(self, value, **labels):
+        self.samples.append((labels, value))
+        return self
+
+    def format(self):
+        lines = ['# HELP {} {}'.format(self.name, self.description), '# TYPE {} {}'.format(self.name, self.kind)]
+        for labels, value in self.samples:
+            labels = ','.join(['{}="{}"'.format(key, str(label).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')) for key, label in labels.items()])
+            value = float(value) if value is not None else np.nan
+            lines.append('{}{} {}'.format(self.name, '{'+labels+'}' if labels else '', 'NaN' if np.isnan(value) else repr(value)))
+        return '\n'.join(lines)
+
+
+class MetricsExporter:
+    '''
+        MetricsExporter collects the metrics of the managers and serves them over HTTP.
+
+        INPUTS
+        ----------
+        dm (DataManager), hm (HardwareManager), tm (TaskManager), executors (Executors) - managers of the acquisition
+        port (int) - TCP port, on the loopback interface only
+    '''
+    def __init__(self, dm, hm, tm, executors, port):
+        self.dm, self.hm, self.tm, self.executors, self.port = dm, hm, tm, executors, port
+        self.mutex = threading.Lock()
+        self.sampleTimes = collections.defaultdict(collections.deque) # signal: monotonic times of the samples of the last RATE_WINDOW seconds
+        self.lastPoints = None # (time, measurement, points) at the previous scrape
+        self.server = None
+        dm.addSampleListener(self.countSample)
+
+    def countSample(self, signal, values):
+        now = time.monotonic()
+        with self.mutex:
+            times = self.sampleTimes[signal]
+            times.append(now)
+            while times and (times[0] < now-RATE_WINDOW):
+                times.popleft()
+
+    def start(self):
+        '''
+            RETURNS
+            ----------
+            started (bool) - False if the port could not be opened, the acquisition runs without the exporter
+        '''
+        exporter = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                try:
+                    body, status = exporter.collect().encode('utf-8'), 200
+                except Exception as e:
+                    body, status = 'MetricsExporter::collect raised: {}\n'.format(e).encode('utf-8'), 500
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args): # scrapes would fill the console
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        except OSError as e:
+            print('WARNING: metrics exporter could not listen on port {}: {}'.format(self.port, e))
+            return False
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='MetricsExporter', daemon=True).start()
+        print('Metrics served on http://127.0.0.1:{}/metrics'.format(self.port))
+        return True
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def collect(self):
+        '''
+            RETURNS
+            ----------
+            text (str) - all metrics in the Prometheus text format
+        '''
+        families = self.getSampleMetrics() + self.getTimerMetrics() + self.getDeviceMetrics() + self.getExecutorMetrics() + self.getBufferMetrics() + self.getSequenceMetrics()
+        return '\n'.join([family.format() for family in families]) + '\n'
+
+    def getSampleMetrics(self):
+        total = MetricFamily('hts_samples_total', 'counter', 'Environment readings stored by the DataManager.')
+        rate = MetricFamily('hts_sample_rate', 'gauge', 'Environment readings per second over the last {:.0f} s.'.format(RATE_WINDOW))
+        with self.dm.sampleCondition:
+            counts = dict(self.dm.sampleCounts)
+        now = time.monotonic()
+        with self.mutex:
+            recent = {signal: len([t for t in times if t >= now-RATE_WINDOW]) for signal, times in self.sampleTimes.items()}
+        for signal in sorted(set(counts) | set(recent)):
+            total.add(counts.get(signal, 0), signal=signal)
+            rate.add(recent.get(signal, 0)/RATE_WINDOW, signal=signal)
+        return [total, rate]
+
+    def getTimerMetrics(self):
+        runs = MetricFamily('hts_timer_runs_total', 'counter', 'Telemetry updates started by the timers of the TaskManager.')
+        overruns = MetricFamily('hts_timer_overruns_total', 'counter', 'Telemetry updates that ended after the next tick of their timer.')
+        for update, stats in sorted(self.tm.getTimerStats().items()):
+            runs.add(stats.get('runs', 0), update=update)
+            overruns.add(stats.get('overruns', 0), update=update)
+        return [runs, overruns]
+
+    def getDeviceMetrics(self):
+        families = {
+            'connected': MetricFamily('hts_device_connected', 'gauge', '1 if the device is connected.'),
+            'calls': MetricFamily('hts_device_calls_total', 'counter', 'Commands sent to the device.'),
+            'timeouts': MetricFamily('hts_device_timeouts_total', 'counter', 'Commands that the device did not answer in time.'),
+            'errors': MetricFamily('hts_device_errors_total', 'counter', 'Commands that raised.'),
+            'malformed': MetricFamily('hts_device_malformed_total', 'counter', 'Responses rejected by the pattern checks.'),
+            'failedLocks': MetricFamily('hts_device_failed_locks_total', 'counter', 'Attempts to lock the device that gave up.'),
+            'lockWait': MetricFamily('hts_device_lock_wait_seconds_total', 'counter', 'Time spent waiting for the mutex of the device.'),
+        }
+        for device, snapshot in sorted(self.hm.getIOMetrics().items()):
+            for key, family in families.items():
+                value = snapshot[key]
+                family.add(value/1000. if key == 'lockWait' else int(value) if key == 'connected' else value, device=device)
+        return list(families.values())
+
+    def getExecutorMetrics(self):
+        families = {
+            'queued': MetricFamily('hts_executor_queued', 'gauge', 'Tasks waiting for a thread.'),
+            'active': MetricFamily('hts_executor_active', 'gauge', 'Tasks running.'),
+            'maxThreads': MetricFamily('hts_executor_max_threads', 'gauge', 'Thread limit of the pool.'),
+            'maxQueued': MetricFamily('hts_executor_max_queued', 'gauge', 'Longest queue since the start.'),
+            'completed': MetricFamily('hts_executor_completed_total', 'counter', 'Tasks completed.'),
+            'wait_p99_s': MetricFamily('hts_executor_wait_p99_seconds', 'gauge', '99th percentile of the queue wait of the last 1000 tasks.'),
+        }
+        for workload, stats in self.executors.getStats().items():
+            for key, family in families.items():
+                family.add(stats[key], workload=workload)
+        return list(families.values())
+
+    def getBufferMetrics(self):
+        size = MetricFamily('hts_environment_buffer_bytes', 'gauge', 'Memory held by the environment traces of the DataManager.')
+        rows = MetricFamily('hts_environment_buffer_rows', 'gauge', 'Rows of the environment traces of the DataManager.')
+        for signal, data, mutex in (('tc', 'tcData', self.dm.mutexTc), ('pm', 'pmData', self.dm.mutexPm), ('mc', 'mcData', self.dm.mutexMc)):
+            mutex.lock()
+            try:
+                df = getattr(self.dm, data)
+                size.add(0 if df is None else int(df.memory_usage(index=True, deep=False).sum()), signal=signal)
+                rows.add(0 if df is None else len(df), signal=signal)
+            finally:
+                mutex.unlock()
+        return [size, rows]
+
+    def getSequenceMetrics(self):
+        running = MetricFamily('hts_sequence_running', 'gauge', '1 while a sequence runs.')
+        step = MetricFamily('hts_sequence_step', 'gauge', 'Index of the sequence step in progress, labelled with its action.')
+        acquiring = MetricFamily('hts_measurement_acquiring', 'gauge', '1 while a measurement runs.')
+        points = MetricFamily('hts_measurement_points', 'gauge', 'Points of the measurement in progress or of the last one.')
+        rate = MetricFamily('hts_measurement_point_rate', 'gauge', 'Points per second since the previous scrape.')
+
+        running.add(int(self.tm.sequenceRunning))
+        currentStep = self.tm.currentStep
+        if currentStep is not None:
+            step.add(currentStep[0], action=currentStep[1])
+        acquiring.add(int(self.tm.acquiring))
+
+        stream = self.tm.vtStream
+        count = len(self.tm.datapoints) + (stream.count if stream is not None else 0)
+        now, measurement = time.monotonic(), (self.tm.measurementCounter, id(stream))
+        pointRate = np.nan
+        if (self.lastPoints is not None) and (self.lastPoints[1] == measurement) and (count >= self.lastPoints[2]) and (now > self.lastPoints[0]):
+            pointRate = (count-self.lastPoints[2])/(now-self.lastPoints[0])
+        self.lastPoints = (now, measurement, count)
+        points.add(count)
+        rate.add(pointRate)
+        return [running, step, acquiring, points, rate]
+
+
+def startExporter(dm, hm, tm, executors, preferences):
+    '''
+        startExporter starts a MetricsExporter on the metrics_port preference.
+
+        RETURNS
+        ----------
+        exporter (MetricsExporter) - None if metrics_port is 0 or the port could not be opened
+    '''
+    port = int(preferences.get('metrics_port', 0))
+    if port <= 0:
+        return None
+    exporter = MetricsExporter(dm, hm, tm, executors, port)
+    return exporter if exporter.start() else None
@@ -0,0 +1,72 @@
+import collections
+import numpy as np
+
+class OffsetTracker:
+    '''
+        OffsetTracker follows the zero-current voltage offset of the nanovoltmeter between measurements.
+
+        Offsets sampled while the sample sits at zero current are fitted with a straight line over the
+        last window seconds. The tracked offset can replace a full calibration when the last sample is
+        recent and the uncertainty of the extrapolated offset is below tolerance.
+
+        @author Alexis Devitre devitre@mit.edu
+        @lastModified October 2026
+    '''
+    def __init__(self, window=1800., maxAge=600., tolerance=2e-8, maxSamples=500):
+        '''
+            INPUTS
+            ----------
+            window (float) - only offsets sampled in the last window seconds are fitted
+            maxAge (float) - the model is stale when the last sample is older than maxAge seconds
+            tolerance (float) - largest acceptable uncertainty of the predicted offset in volts
+            maxSamples (int) - number of samples kept in memory
+        '''
+        self.window, self.maxAge, self.tolerance = window, maxAge, tolerance
+        self.samples = collections.deque(maxlen=maxSamples)
+
+    def addSample(self, t, offset, std=np.nan):
+        '''
+            INPUTS
+            ----------
+            t (float) - epoch time of the sample
+            offset (float) - zero-current voltage in volts
+            std (float) - scatter of the reads that were averaged, used when there are too few samples to fit
+        '''
+        if not np.isnan(offset):
+            self.samples.append((t, offset, std))
+
+    def predict(self, t):
+        '''
+            predict extrapolates the offset at time t.
+
+            RETURNS
+            ----------
+            offset (float) - predicted offset in volts, NaN without samples
+            uncertainty (float) - standard error of the prediction in volts, inf when it cannot be estimated
+        '''
+        recent = [s for s in self.samples if t-s[0] <= self.window]
+        if not recent:
+            return np.nan, np.inf
+
+        times, offsets, stds = np.transpose(recent)
+        if len(recent) < 3:
+            std = np.nanmax(stds) if not np.all(np.isnan(stds)) else np.inf
+            return np.mean(offsets), std/np.sqrt(len(recent))
+
+        tmean = np.mean(times)
+        slope, intercept = np.polyfit(times-tmean, offsets, 1)
+        residuals = offsets - (slope*(times-tmean) + intercept)
+        variance = np.sum(residuals**2)/(len(recent)-2)
+        sxx = np.sum((times-tmean)**2)
+        uncertainty = np.sqrt(variance*(1./len(recent) + (t-tmean)**2/sxx)) if sxx > 0 else np.inf
+        return slope*(t-tmean) + intercept, uncertainty
+
+    def isFresh(self, t):
+        '''
+            RETURNS
+            ----------
+            fresh (bool) - True when the tracked offset can be used instead of a calibration at time t
+        '''
+        if not self.samples or (t-self.samples[-1][0] > self.maxAge):
+            return False
+        return self.predict(t)[1] < self.tolerance
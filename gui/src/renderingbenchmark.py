@@ -0,0 +1,337 @@
+import os, sys, json, glob, time, datetime, tempfile, threading, collections
+import numpy as np
+import pandas as pd
+
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal, pyqtSlot
+
+import clock
+from configservice import config
+from executors import Executors
+from task import Task
+
+'''
+    Rendering benchmark.
+
+    SessionReplay plays a saved session (the env/ traces and the Ic/, Tc/ and Vt/ files) through the plotting paths
+    of the GUI at speed times real time: the environment readings are stored with DataManager.updateTcReadings and
+    updatePmReadings on an accelerated clock, the plot timer runs DataManager.updateEnvironmentPlots in the analysis
+    pool every second as in TaskManager.startReadings, and plot_signal is drawn by Tab_Signals.updatePlottingArea.
+    The points of the measurements are appended at the time they were taken and drawn by the updateActiveLine of
+    Tab_VoltageCurrent, Tab_VoltageTemperature and Tab_VoltageTime on the QtimerUpdatePlot of each tab.
+
+    It measures, per plot and per window of session time:
+        frames  - time spent in each update, including the repaint
+        dropped - ticks of the plot timer that did not happen because the event loop was busy, and for the Signals
+                  tab the plot_signal frames drawn after a newer one was already emitted (stale)
+        stalls  - delay of a heartbeat timer, i.e. how long the event loop did not process events
+    and reports the first window in which each plot stops keeping up: frames longer than the timer period, or
+    dropped updates.
+
+        python main.py --benchmark-rendering SESSION RESULTS --speed 20
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+HEARTBEAT = 10 # ms, period of the timer that measures the stalls of the event loop
+MEASUREMENT_TABS = {'Ic': 'icTools', 'Tc': 'tcTools', 'Vt': 'vtTools'}
+VT_TAIL = 5000 # points of a Vt measurement kept for the live plot, see MeasurementStream
+
+
+def readEnvironmentFiles(folder, kind):
+    '''
+        readEnvironmentFiles reads the traces written by DataManager.saveEnvironmentData.
+
+        INPUTS
+        ----------
+        folder (str) - env folder of a session
+        kind (str) - 'temperature' or 'pressure'
+
+        RETURNS
+        ----------
+        data (pandas.DataFrame) - rows of all the files of that kind, sorted by time_s
+    '''
+    frames = []
+    for fpath in sorted(glob.glob(os.path.join(folder, kind+'_*.txt'))):
+        with open(fpath, 'r') as f:
+            columns = f.readline().split()[2:] # date and timestamp are the index
+        data = pd.read_csv(fpath, sep='\t', skiprows=1, header=None, index_col=0)
+        data.columns = columns[:len(data.columns)]
+        frames.append(data)
+    return pd.concat(frames).sort_values('time_s') if frames else pd.DataFrame()
+
+def readMeasurementFile(fpath):
+    '''
+        RETURNS
+        ----------
+        data (float, array) - columns t_s, iHTS_A, vHTS_V, tHTS_K of the measurement, one row per point
+    '''
+    return np.genfromtxt(fpath, usecols=[1, 2, 3, 4], comments='#', ndmin=2)
+
+def percentiles(values):
+    values = np.asarray(values, dtype=float)
+    if not values.size:
+        return {'count': 0, 'p50': np.nan, 'p90': np.nan, 'p99': np.nan, 'max': np.nan}
+    return {'count': int(values.size), 'p50': float(np.percentile(values, 50)), 'p90': float(np.percentile(values, 90)),
+            'p99': float(np.percentile(values, 99)), 'max': float(values.max())}
+
+
+class SessionReplay(QObject):
+    '''
+        SessionReplay holds the GUI objects under test and replays a session through them.
+
+        INPUTS
+        ----------
+        session (str) - session folder
+        speed (float) - session seconds per real second
+        window (float) - session seconds per reporting window
+    '''
+    measurementStarted = pyqtSignal(str, str)
+    measurementFinished = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, session, speed=10., window=600., parent=None):
+        from datamanager import DataManager
+        from Tab_Signals import Tab_Signals
+        from Tab_VoltageCurrent import Tab_VoltageCurrent
+        from Tab_VoltageTemperature import Tab_VoltageTemperature
+        from Tab_VoltageTime import Tab_VoltageTime
+        super(SessionReplay, self).__init__(parent)
+
+        self.speed, self.window = float(speed), float(window)
+        self.preferences = config.get('preferences.json')
+        self.events = self.loadSession(session)
+
+        self.executors = Executors(self.preferences)
+        self.dm = DataManager(self.executors, saveFolder=tempfile.mkdtemp(prefix='hts-rendering-')+'/')
+        self.environmentTools = Tab_Signals(usr_preferences=self.preferences)
+        self.icTools, self.tcTools, self.vtTools = Tab_VoltageCurrent(), Tab_VoltageTemperature(), Tab_VoltageTime()
+        for tab in (self.environmentTools, self.icTools, self.tcTools, self.vtTools):
+            tab.resize(1200, 800)
+            tab.show()
+
+        self.mutex = threading.Lock()
+        self.points = {kind: [] for kind in MEASUREMENT_TABS} # points of the measurement in progress
+        self.frames = collections.defaultdict(list)           # plot: [(session time, seconds)]
+        self.dropped = collections.defaultdict(list)          # plot: [(session time, count)]
+        self.stalls, self.ticks = [], {}
+        self.emitted, self.drawn, self.maxBacklog = 0, 0, 0
+
+        self.dm.plot_signal.connect(self.countEmitted, Qt.DirectConnection)
+        self.dm.plot_signal.connect(self.drawSignals)
+        self.icTools.updatePlot_signal.connect(lambda: self.drawMeasurement('Ic', lambda data: self.icTools.updateActiveLine(current=data[:, 1], voltage=data[:, 2])))
+        self.tcTools.updatePlot_signal.connect(lambda: self.drawMeasurement('Tc', lambda data: self.tcTools.updateActiveLine(temperature=data[:, 3], voltage=data[:, 2])))
+        self.vtTools.updatePlot_signal.connect(lambda: self.drawMeasurement('Vt', lambda data: self.vtTools.updateActiveLine(time=data[:, 0], voltage=data[:, 2])))
+        self.measurementStarted.connect(self.startMeasurement)
+        self.measurementFinished.connect(self.stopMeasurement)
+
+        self.plotTimer, self.heartbeat = QTimer(), QTimer()
+        self.plotTimer.timeout.connect(lambda: self.executors.analysis.start(Task(self.dm.updateEnvironmentPlots)))
+        self.plotTimer.timeout.connect(lambda: self.tick('Signals', self.plotTimer.interval()))
+        self.heartbeat.timeout.connect(self.beat)
+
+    def loadSession(self, session):
+        '''
+            RETURNS
+            ----------
+            events (list) - (session time, kind, values) sorted by time, kind is 'tc', 'pm', 'start', a measurement or 'stop'
+        '''
+        events = []
+        for row in readEnvironmentFiles(os.path.join(session, 'env'), 'temperature').itertuples():
+            events.append((row.time_s, 'tc', (row.setpt_K, row.sampleT_K, row.targetT_K, row.holderT_K, row.spareT_K, row.heaterPower_W)))
+        for row in readEnvironmentFiles(os.path.join(session, 'env'), 'pressure').itertuples():
+            events.append((row.time_s, 'pm', (row.pressure_torr,)))
+        for kind in MEASUREMENT_TABS:
+            for fpath in sorted(glob.glob(os.path.join(session, kind, kind+'_*.txt'))):
+                try:
+                    data = readMeasurementFile(fpath)
+                except Exception as e:
+                    print('SessionReplay::loadSession skipped {}: {}'.format(fpath, e))
+                    continue
+                if not len(data):
+                    continue
+                events.append((data[0, 0], 'start', (kind, os.path.basename(fpath))))
+                events.extend([(point[0], kind, point) for point in data])
+                events.append((data[-1, 0], 'stop', (kind,)))
+        events.sort(key=lambda event: event[0])
+        print('SessionReplay: {} events over {:.0f} s of session'.format(len(events), events[-1][0]-events[0][0] if events else 0))
+        return events
+
+    def start(self):
+        clock.setClock(clock.AcceleratedClock(self.speed))
+        self.dm.startTime()
+        if self.events:
+            self.dm.t0 -= self.events[0][0]
+        self.dm.updateMcReadings(0., 0., False) # the magnet readings are not saved with the session, the field is drawn as 0
+        self.plotTimer.start(1000) # as in TaskManager.startReadings, in real time
+        self.heartbeat.start(HEARTBEAT)
+        self.lastBeat = time.perf_counter()
+        threading.Thread(target=self.play, name='SessionReplay', daemon=True).start()
+
+    def sessionTime(self):
+        return clock.now()-self.dm.t0
+
+    def play(self):
+        '''
+            play dispatches the events at their session time, it runs in its own thread like the telemetry updates.
+        '''
+        for t, kind, values in self.events:
+            clock.sleep(t-self.sessionTime())
+            if kind == 'tc':
+                self.dm.updateTcReadings(*values)
+            elif kind == 'pm':
+                self.dm.updatePmReadings(*values)
+            elif kind == 'start':
+                with self.mutex:
+                    self.points[values[0]] = []
+                self.measurementStarted.emit(*values)
+            elif kind == 'stop':
+                self.measurementFinished.emit(values[0])
+            else:
+                with self.mutex:
+                    self.points[kind].append(values)
+                    if (kind == 'Vt') and (len(self.points[kind]) > VT_TAIL):
+                        del self.points[kind][0]
+        self.finished.emit()
+
+    @pyqtSlot(str, str)
+    def startMeasurement(self, kind, name):
+        tab = getattr(self, MEASUREMENT_TABS[kind])
+        tab.plottingArea.addCurve(name=name, color=(np.random.rand(), np.random.rand(), np.random.rand()))
+        self.ticks.pop(kind, None)
+        tab.QtimerUpdatePlot.start()
+
+    @pyqtSlot(str)
+    def stopMeasurement(self, kind):
+        getattr(self, MEASUREMENT_TABS[kind]).QtimerUpdatePlot.stop()
+
+    def tick(self, plot, period):
+        '''
+            tick records the ticks of the timer of a plot that were missed since its previous tick.
+        '''
+        now = time.perf_counter()
+        if plot in self.ticks:
+            missed = int(round((now-self.ticks[plot])*1000./period))-1
+            if missed > 0:
+                self.dropped[plot].append((self.sessionTime(), missed))
+        self.ticks[plot] = now
+
+    def beat(self):
+        now = time.perf_counter()
+        self.stalls.append((self.sessionTime(), max(now-self.lastBeat-HEARTBEAT/1000., 0.)))
+        self.lastBeat = now
+
+    def countEmitted(self, *args):
+        with self.mutex:
+            self.emitted += 1
+
+    @pyqtSlot(np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray)
+    def drawSignals(self, time_tc, time_pm, time_mc, setpoint_temperature, sampleT, targetT, holderT, spareT, pressure, power, setpoint_field, field):
+        with self.mutex:
+            self.drawn += 1
+            backlog = self.emitted-self.drawn
+            self.maxBacklog = max(self.maxBacklog, backlog)
+        if backlog > 0: # a newer frame is already waiting, this one is out of date
+            self.dropped['Signals'].append((self.sessionTime(), 1))
+        start = time.perf_counter()
+        self.environmentTools.updatePlottingArea(time_tc, time_pm, time_mc, sampleT, targetT, holderT, spareT, pressure, power, field)
+        self.environmentTools.plottingArea.repaint()
+        self.frames['Signals'].append((self.sessionTime(), time.perf_counter()-start))
+
+    def drawMeasurement(self, kind, update):
+        tab = getattr(self, MEASUREMENT_TABS[kind])
+        self.tick(kind, tab.QtimerUpdatePlot.interval())
+        with self.mutex:
+            data = np.array(self.points[kind])
+        if not len(data):
+            return
+        start = time.perf_counter()
+        update(data)
+        tab.plottingArea.viewport().repaint()
+        self.frames[kind].append((self.sessionTime(), time.perf_counter()-start))
+
+    def stop(self):
+        self.plotTimer.stop()
+        self.heartbeat.stop()
+        for kind in MEASUREMENT_TABS:
+            getattr(self, MEASUREMENT_TABS[kind]).QtimerUpdatePlot.stop()
+        self.executors.waitForDone(5000)
+
+    def getResults(self):
+        '''
+            RETURNS
+            ----------
+            results (dict) - per plot, the frame times, dropped updates and the first window where it fell behind,
+                             the event loop stalls, and the same metrics per window of session time
+        '''
+        periods = {'Signals': self.plotTimer.interval()}
+        periods.update({kind: getattr(self, tab).QtimerUpdatePlot.interval() for kind, tab in MEASUREMENT_TABS.items()})
+        end = max([t for t, kind, values in self.events] + [0.])
+        edges = np.arange(0., end+self.window, self.window)
+
+        windows = []
+        for start in edges:
+            window = {'start': float(start), 'plots': {}}
+            inWindow = lambda samples: [value for t, value in samples if start <= t < start+self.window]
+            for plot, period in periods.items():
+                frames, dropped = inWindow(self.frames[plot]), inWindow(self.dropped[plot])
+                window['plots'][plot] = dict(percentiles(frames), dropped=int(np.sum(dropped)))
+            stalls = inWindow(self.stalls)
+            window['stall'] = {'max': float(np.max(stalls)) if stalls else np.nan, 'over50ms': float(np.sum([s for s in stalls if s > .05]))}
+            windows.append(window)
+
+        plots = {}
+        for plot, period in periods.items():
+            behind = [window['start'] for window in windows if (window['plots'][plot]['p90'] > period/1000.) or (window['plots'][plot]['dropped'] > 0)]
+            plots[plot] = {
+                'period': period/1000.,
+                'frames': percentiles([value for t, value in self.frames[plot]]),
+                'dropped': int(np.sum([value for t, value in self.dropped[plot]])),
+                'fallsBehindAt': behind[0] if behind else None,
+            }
+        plots['Signals'].update({'emitted': self.emitted, 'drawn': self.drawn, 'maxBacklog': self.maxBacklog})
+        return {
+            'speed': self.speed,
+            'sessionSeconds': end,
+            'plots': plots,
+            'stalls': dict(percentiles([value for t, value in self.stalls]), over50ms=float(np.sum([value for t, value in self.stalls if value > .05]))),
+            'windows': windows,
+        }
+
+
+def runRenderingBenchmark(session, output=None, speed=10., window=600.):
+    '''
+        runRenderingBenchmark replays a session through the plots and writes the results.
+
+        INPUTS
+        ----------
+        session (str) - session folder
+        output (str) - JSON file of the results, not written if None
+        speed (float) - session seconds per real second
+        window (float) - session seconds per reporting window
+
+        RETURNS
+        ----------
+        results (dict) - see SessionReplay.getResults
+    '''
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    replay = SessionReplay(session, speed=speed, window=window)
+    replay.finished.connect(app.quit, Qt.QueuedConnection)
+    replay.start()
+    app.exec_()
+    replay.stop()
+
+    results = dict(replay.getResults(), session=os.path.abspath(session), date=str(datetime.datetime.now()))
+    for plot, stats in results['plots'].items():
+        print('{:8s} {:6d} frames  p50 {:7.1f} ms  p99 {:7.1f} ms  dropped {:5d}  falls behind at {}'.format(plot, stats['frames']['count'], 1e3*stats['frames']['p50'], 1e3*stats['frames']['p99'],
+              stats['dropped'], 'never' if stats['fallsBehindAt'] is None else '{:.0f} s'.format(stats['fallsBehindAt'])))
+    print('Event loop stalls: p99 {:.1f} ms, max {:.1f} ms, {:.1f} s over 50 ms'.format(1e3*results['stalls']['p99'], 1e3*results['stalls']['max'], results['stalls']['over50ms']))
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2, default=float)
+        print('Results written to {}'.format(output))
+    return results
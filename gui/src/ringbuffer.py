@@ -0,0 +1,105 @@
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+class SharedRingBuffer:
+    '''
+        SharedRingBuffer is a fixed-size table of float64 rows in shared memory, written by one process
+        and read by any number of others without locks or copies through a pipe.
+
+        The block starts with a header of five int64: the number of rows written since the last reset,
+        the reset counter (epoch), the number of meaningful columns of the current epoch, and the number
+        of slots and columns of the table, so that readers only need the block name. The writer
+        stores a row before incrementing the count, so a reader never sees a half written row unless it
+        falls more than slots rows behind, in which case the overwritten rows are dropped.
+
+        @author Alexis Devitre devitre@mit.edu
+        @lastModified October 2026
+    '''
+    HEADER = 5
+
+    def __init__(self, name=None, slots=4096, width=12, create=True):
+        '''
+            INPUTS
+            ----------
+            name (str) - shared memory block name, chosen by the system when None and create is True
+            slots (int) - number of rows kept, read from the block when attaching
+            width (int) - maximum number of columns of a row, read from the block when attaching
+            create (bool) - create the block (writer) or attach to an existing one (reader)
+        '''
+        self.owner = create
+        size = 8*(self.HEADER + slots*width)
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        if not create: # only the owner may unlink the block, but Python < 3.13 registers every attached block for cleanup at exit
+            try:
+                resource_tracker.unregister(self.shm._name, 'shared_memory')
+            except Exception:
+                pass
+        self.header = np.ndarray((self.HEADER,), dtype=np.int64, buffer=self.shm.buf)
+        if create:
+            self.header[:] = [0, 0, width, slots, width]
+        self.slots, self.width = int(self.header[3]), int(self.header[4])
+        self.data = np.ndarray((self.slots, self.width), dtype=np.float64, buffer=self.shm.buf, offset=8*self.HEADER)
+        if create:
+            self.data[:] = np.nan
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, row):
+        '''
+            write appends a row, padded with NaN to the width of the buffer.
+        '''
+        count = int(self.header[0])
+        slot = self.data[count % self.slots]
+        n = min(len(row), self.width)
+        slot[:n] = row[:n]
+        slot[n:] = np.nan
+        self.header[0] = count + 1
+
+    def reset(self, columns=None):
+        '''
+            reset starts a new epoch, readers drop the rows of the previous one.
+
+            INPUTS
+            ----------
+            columns (int) - number of meaningful columns of the rows that follow
+        '''
+        self.header[0] = 0
+        self.header[2] = self.width if columns is None else columns
+        self.header[1] += 1
+
+    def getEpoch(self):
+        return int(self.header[1])
+
+    def getCount(self):
+        return int(self.header[0])
+
+    def readSince(self, count, epoch=None):
+        '''
+            readSince returns the rows written after the first count rows of the given epoch.
+
+            RETURNS
+            ----------
+            rows (float, array) - rows in the order they were written, trimmed to the columns of the epoch
+            count (int) - value to pass to the next call
+            epoch (int) - current epoch, when it differs from the one passed all rows of the new epoch are returned
+        '''
+        currentEpoch, end, columns = int(self.header[1]), int(self.header[0]), int(self.header[2])
+        if (epoch is not None) and (epoch != currentEpoch):
+            count = 0
+        start = max(count, end-self.slots)
+        rows = np.array([self.data[k % self.slots, :columns] for k in range(start, end)]).reshape(-1, columns)
+
+        if (int(self.header[0])-self.slots > start) or (int(self.header[1]) != currentEpoch): # the writer lapped or reset the buffer while copying
+            return self.readSince(0, epoch=None)
+        return rows, end, currentEpoch
+
+    def readAll(self):
+        return self.readSince(0)[0]
+
+    def close(self):
+        self.header, self.data = None, None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,302 @@
+import re
+import numpy as np
+
+'''
+    Ahead-of-time compilation of measurement sequences.
+
+    A sequence is a list of lines written by the step windows of Tab_Sequences, e.g.
+    'MeasureIc : Label = tape1 ; Repeats = 3 ; Wait between IVs = 5.0 s; Start-Current = 0.0 A; ...',
+    or paths to .seq files holding more lines (subsequences). compileSequence expands the subsequences,
+    parses every line into a SequenceStep with typed arguments, checks the arguments and the structure
+    of parallel groups, and estimates the duration of each step. All problems are reported at once by
+    a SequenceError before the sequence starts.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+
+STEP_PATTERNS = {
+    'MeasureIc': r'MeasureIc\s*:\s*Label\s*=\s*(?P<label>\S+)\s*;\s*Repeats\s*=\s*(?P<repeats>{0})\s*;\s*Wait between IVs\s*=\s*(?P<wait>{0})\s*s\s*;\s*Start-Current\s*=\s*(?P<rampStart>{0})\s*A\s*;\s*Step-size\s*=?\s*(?P<iStep>{0})\s*A\s*;\s*Voltage-limit\s*=\s*(?P<maxV>{0})\s*uV\s*;\s*Current-Source\s*=\s*(?P<currentSource>.+?)',
+    'MeasureTc': r'MeasureTc\s*:\s*Label\s*=\s*(?P<label>\S+)\s*;\s*Start-Temperature\s*=\s*(?P<startT>{0})\s*K\s*;\s*Stop-Temperature\s*=\s*(?P<stopT>{0})\s*K\s*;\s*Ramp-rate\s*=?\s*(?P<rampRate>{0})\s*K/min\s*;\s*Transport-current\s*=\s*(?P<transportCurrent>{0})\s*mA',
+    'SetTemperature': r'SetTemperature\s*:\s*Objective-temperature\s*=\s*(?P<temperature>{0})\s*K\s*;\s*Stability-margin\s*=\s*(?P<margin>{0})\s*K\s*;\s*Stabilization-time\s*=\s*(?P<stabilizationTime>{0})\s*s\s*;\s*Ramp-rate\s*=\s*(?P<rampRate>{0})\s*K/min',
+    'Wait': r'Wait\s+(?P<seconds>{0})\s+seconds\s*(?:;\s*pressure threshold\s+(?P<threshold>{0})\s*torr)?',
+    'TriggerRelays': r'TriggerRelays\s+Coldhead\s+(?P<cooler>On|Off)\s*;\s*FaradayCup\s+(?P<faradayCup>On|Off)\s*;\s*TurboValve\s+(?P<gateValve>On|Off)',
+    'setField': r'setField\s+(?P<field>{0})\s*T?',
+    'Label': r'Label\s+(?P<label>\S+)',
+    'Warmup': r'Warmup',
+    'Play': r'Play\s+(?P<sound>.+)',
+    'Subsequence': r'Subsequence\s*:\s*(?P<marker>start|stop)',
+    'Parallel': r'Parallel\s*:\s*(?P<marker>start|stop)',
+}
+STEP_PATTERNS = {action: re.compile('^'+pattern.format(NUMBER)+r'\s*$') for action, pattern in STEP_PATTERNS.items()}
+
+ARGUMENT_TYPES = {
+    'repeats': int, 'wait': float, 'rampStart': float, 'iStep': float, 'maxV': float,
+    'startT': float, 'stopT': float, 'rampRate': float, 'transportCurrent': float,
+    'temperature': float, 'margin': float, 'stabilizationTime': float,
+    'seconds': float, 'threshold': float, 'field': float,
+    'cooler': lambda state: state == 'On', 'faradayCup': lambda state: state == 'On', 'gateValve': lambda state: state == 'On',
+}
+
+STEP_RESOURCES = { # instruments used by each step, steps of a parallel group that share one run one after the other
+    'MeasureIc': ('transport', 'relays'),                  # connectFourPointProbe switches the sample relays
+    'MeasureTc': ('transport', 'temperature', 'relays'),
+    'SetTemperature': ('temperature', 'relays'),           # HardwareManager.setTemperature may switch the cooler on
+    'Warmup': ('temperature', 'relays'),
+    'setField': ('magnet',),
+    'TriggerRelays': ('relays',),
+    'Play': ('speaker',),
+}
+
+DEFAULT_IV_DURATION = 60.   # s, used until an IV has been measured in the session
+TC_STABILIZATION_TIME = 150. # s, the two stabilizations at the start of measureTc
+TC_APPROACH_RATE = 9.        # K/min, rate of the ramp to the start temperature of measureTc
+MAX_FIELD = 14.              # T
+
+
+class SequenceError(ValueError):
+    '''
+        SequenceError lists every problem found while compiling a sequence.
+    '''
+    def __init__(self, errors):
+        super(SequenceError, self).__init__('\n'.join(errors))
+        self.errors = errors
+
+
+class SequenceStep:
+    '''
+        SequenceStep is one compiled line of a sequence.
+
+        action (str) - first word of the line, e.g. MeasureIc
+        args (dict) - typed arguments of the step, e.g. {'repeats': 3, 'wait': 5.0, ...}
+        line (str) - line the step was compiled from
+        source (str) - where the line comes from, 'sequence' or the path of a subsequence file, and its line number
+        item (int) - index of the item of the sequence list that produced the step, used to annotate the list
+        duration (float) - estimated duration in seconds, NaN when it cannot be estimated
+        resources (tuple) - instruments the step needs, see STEP_RESOURCES
+    '''
+    def __init__(self, action, args, line, source, item):
+        self.action, self.args, self.line, self.source, self.item = action, args, line, source, item
+        self.duration = 0.
+        if action == 'Wait':
+            self.resources = ('vacuum',) if args['threshold'] is not None else () # a plain delay needs no instrument
+        else:
+            self.resources = STEP_RESOURCES.get(action, ())
+
+    def __repr__(self):
+        return 'SequenceStep({})'.format(self.line)
+
+
+class CompiledSequence:
+    '''
+        CompiledSequence holds the steps of a sequence and their duration estimates.
+
+        steps (list) - SequenceStep objects in execution order, subsequence and parallel markers included
+        itemDurations (list) - estimated duration of each item of the original list in seconds
+        total (float) - sum of the estimates that are known, in seconds
+        unknown (int) - number of steps whose duration cannot be estimated (field ramps, warmup, pressure thresholds)
+        items (list) - items of the sequence list the steps were compiled from
+    '''
+    def __init__(self, steps, itemDurations, total, unknown, items=None):
+        self.steps, self.itemDurations, self.total, self.unknown = steps, itemDurations, total, unknown
+        self.items = list(items) if items is not None else [step.line for step in steps]
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __getitem__(self, index):
+        return self.steps[index]
+
+    def summary(self):
+        text = 'Estimated duration {}'.format(formatDuration(self.total))
+        if self.unknown:
+            text += ' + {} step(s) of unknown duration'.format(self.unknown)
+        return text
+
+
+def formatDuration(seconds):
+    if np.isnan(seconds):
+        return 'unknown'
+    hours, remainder = divmod(int(round(seconds)), 3600)
+    return '{:d} h {:02d} min'.format(hours, remainder//60) if hours else '{:d} min {:02d} s'.format(remainder//60, remainder%60)
+
+
+def expandItems(items, errors, source='sequence', item=None, visited=()):
+    '''
+        expandItems replaces paths to .seq files by their lines between Subsequence markers, recursively.
+
+        RETURNS
+        ----------
+        lines (list) - (line, source, item) tuples
+    '''
+    lines = []
+    for k, line in enumerate(items):
+        line = line.strip()
+        index = k if item is None else item
+        where = '{}:{}'.format(source, k+1)
+        if not line:
+            continue
+        if line[0] == '/':
+            if line in visited:
+                errors.append('{}: subsequence {} includes itself'.format(where, line))
+                continue
+            try:
+                with open(line, 'r') as f:
+                    steps = [l for l in f.readlines() if not l.isspace()]
+            except OSError as e:
+                errors.append('{}: cannot read subsequence {} ({})'.format(where, line, e.strerror))
+                continue
+            lines.append(('Subsequence : start', where, index))
+            lines += expandItems(steps, errors, source=line, item=index, visited=visited+(line,))
+            lines.append(('Subsequence : stop', where, index))
+        else:
+            lines.append((line, where, index))
+    return lines
+
+
+def parseStep(line, source, item, currentSources):
+    '''
+        parseStep converts a line into a SequenceStep and checks its arguments.
+
+        RETURNS
+        ----------
+        step (SequenceStep) - None when the line is malformed
+        errors (list) - problems found in the line
+    '''
+    action = line.split()[0]
+    if action not in STEP_PATTERNS:
+        return None, ['{}: unknown step "{}"'.format(source, action)]
+    match = STEP_PATTERNS[action].match(line)
+    if match is None:
+        return None, ['{}: malformed {} step "{}"'.format(source, action, line)]
+
+    args = {key: (ARGUMENT_TYPES[key](value) if (key in ARGUMENT_TYPES) and (value is not None) else value) for key, value in match.groupdict().items()}
+    step, errors = SequenceStep(action, args, line, source, item), []
+
+    def check(condition, message):
+        if not condition:
+            errors.append('{}: {} ({})'.format(source, message, line))
+
+    if action == 'MeasureIc':
+        check(args['repeats'] >= 1, 'Repeats must be at least 1')
+        check(args['wait'] >= 0, 'the wait between IVs cannot be negative')
+        check(args['rampStart'] >= 0, 'the start current cannot be negative')
+        check(args['iStep'] > 0, 'the step size must be positive')
+        check(args['maxV'] > 0, 'the voltage limit must be positive')
+        check(args['currentSource'] in currentSources, 'unknown current source {}'.format(args['currentSource']))
+    elif action == 'MeasureTc':
+        check((args['startT'] > 0) and (args['stopT'] > 0), 'temperatures must be positive')
+        check(args['rampRate'] > 0, 'the ramp rate must be positive')
+        check(args['transportCurrent'] > 0, 'the transport current must be positive')
+    elif action == 'SetTemperature':
+        check(args['temperature'] > 0, 'the temperature must be positive')
+        check(args['margin'] > 0, 'the stability margin must be positive')
+        check(args['stabilizationTime'] >= 0, 'the stabilization time cannot be negative')
+        check(args['rampRate'] >= 0, 'the ramp rate cannot be negative')
+    elif action == 'Wait':
+        check(args['seconds'] >= 0, 'the wait cannot be negative')
+        check((args['threshold'] is None) or (args['threshold'] > 0), 'the pressure threshold must be positive')
+    elif action == 'setField':
+        check(0 <= args['field'] <= MAX_FIELD, 'the field must be between 0 and {} T'.format(MAX_FIELD))
+    return step, errors
+
+
+def estimateDuration(step, temperature, ivDuration, warmupTemperature):
+    '''
+        estimateDuration returns the expected duration of a step in seconds, NaN when it depends on something
+        that cannot be predicted, and the temperature after the step (NaN when unknown).
+    '''
+    args, action = step.args, step.action
+    if action == 'MeasureIc':
+        return args['repeats']*(ivDuration + args['wait']), temperature
+    if action == 'MeasureTc':
+        approach = 60*np.abs(args['startT']-temperature)/TC_APPROACH_RATE if not np.isnan(temperature) else 0.
+        return approach + TC_STABILIZATION_TIME + 60*np.abs(args['stopT']-args['startT'])/args['rampRate'] + 5., args['stopT']
+    if action == 'SetTemperature':
+        ramp = 60*np.abs(args['temperature']-temperature)/args['rampRate'] if (args['rampRate'] > 0) and not np.isnan(temperature) else 0.
+        return ramp + 1.5*args['stabilizationTime'], args['temperature'] # the estimate uses the fixed criterion, an upper bound
+    if action == 'Wait':
+        return (args['seconds']+1. if args['threshold'] is None else np.nan), temperature
+    if action == 'Warmup':
+        return np.nan, warmupTemperature
+    if action == 'setField':
+        return np.nan, temperature
+    return 0., temperature
+
+
+def compileSequence(items, currentSources, ivDurations=(), temperature=np.nan, warmupTemperature=300.):
+    '''
+        compileSequence turns the items of the sequence list into steps ready to be run by TaskManager.runSequence.
+
+        INPUTS
+        ----------
+        items (list) - lines of the sequence and paths to subsequence files
+        currentSources (list) - labels of the current sources that MeasureIc steps may use
+        ivDurations (list) - durations of the IVs measured so far in seconds, their median estimates the next ones
+        temperature (float) - current sample temperature, used to estimate the first ramps
+        warmupTemperature (float) - temperature reached by a Warmup step
+
+        RETURNS
+        ----------
+        sequence (CompiledSequence)
+
+        RAISES
+        ----------
+        SequenceError - when any line is malformed or a parallel group is not well formed
+    '''
+    errors, steps = [], []
+    for line, source, item in expandItems(items, errors):
+        step, stepErrors = parseStep(line, source, item, currentSources)
+        errors += stepErrors
+        if step is not None:
+            steps.append(step)
+
+    # parallel groups hold steps only, and are closed
+    groupStart = None
+    for index, step in enumerate(steps):
+        if step.action == 'Parallel':
+            if step.args['marker'] == 'start':
+                if groupStart is not None:
+                    errors.append('{}: parallel groups cannot be nested'.format(step.source))
+                groupStart = index
+            elif groupStart is None:
+                errors.append('{}: Parallel : stop without a matching start'.format(step.source))
+            else:
+                steps[groupStart].args['end'] = index
+                groupStart = None
+        elif (groupStart is not None) and step.action in ('Subsequence', 'Label'):
+            errors.append('{}: a parallel group cannot contain {} steps'.format(step.source, step.action))
+    if groupStart is not None:
+        errors.append('{}: parallel group is not closed'.format(steps[groupStart].source))
+
+    if errors:
+        raise SequenceError(errors)
+
+    ivDuration = float(np.median(ivDurations)) if len(ivDurations) else DEFAULT_IV_DURATION
+    itemDurations, total, unknown, group = [0.]*len(items), 0., 0, None
+    for step in steps:
+        duration, temperature = estimateDuration(step, temperature, ivDuration, warmupTemperature)
+        step.duration = float(duration)
+        if step.action == 'Parallel':
+            if step.args['marker'] == 'start':
+                group = []
+            else: # the group lasts as long as its longest branch, or as the branches that share an instrument together
+                known = [(duration, resources) for duration, resources in group if not np.isnan(duration)]
+                shared = [sum([duration for duration, resources in known if resource in resources]) for resource in set(sum([resources for duration, resources in known], ()))]
+                step.duration = max([duration for duration, resources in known]+shared) if known else 0.
+                unknown += len(group)-len(known)
+                group = None
+        elif group is not None:
+            group.append((step.duration, step.resources))
+            continue
+        elif np.isnan(step.duration):
+            unknown += 1
+            continue
+        total += step.duration
+        itemDurations[step.item] += step.duration
+    return CompiledSequence(steps, itemDurations, total, unknown, items=items)
@@ -0,0 +1,102 @@
+import collections
+import numpy as np
+from scipy.optimize import curve_fit
+
+def firstOrderResponse(t, tinf, a, tau):
+    return tinf + a*np.exp(-t/tau)
+
+def secondOrderResponse(t, tinf, a, b, tau, omega):
+    return tinf + np.exp(-t/tau)*(a*np.cos(omega*t) + b*np.sin(omega*t))
+
+class SettlingEstimator:
+    '''
+        SettlingEstimator decides when a temperature has settled by fitting the thermal response to the live trace
+        instead of waiting for the reading to stay inside a margin for a fixed time.
+
+        The samples of the last window seconds are fitted with a first-order response, an exponential approach to
+        the asymptote tinf, or a second-order one, an exponentially damped oscillation around tinf as seen when the
+        PID overshoots. The temperature is settled when the reading and the asymptote are within margin of the setpoint
+        and the drift predicted over the next horizon seconds (the measurement window) is below tolerance.
+
+        The fixed criterion is kept as a fallback: the temperature is also settled once the reading has stayed within
+        margin for holdTime seconds, so a trace that the model cannot describe takes no longer than before.
+
+        @author Alexis Devitre devitre@mit.edu
+        @lastModified October 2026
+    '''
+    def __init__(self, setpoint, margin=.1, holdTime=60., model='first', window=120., horizon=600., tolerance=.02, minPoints=20):
+        '''
+            INPUTS
+            ----------
+            setpoint (float) - target temperature in K
+            margin (float) - largest acceptable distance from the setpoint in K
+            holdTime (float) - time in seconds after which a reading held within margin is considered settled
+            model (str) - 'first' or 'second' order response, 'off' keeps only the fixed criterion
+            window (float) - only the samples of the last window seconds are fitted
+            horizon (float) - duration of the measurement in seconds over which the drift is predicted
+            tolerance (float) - largest acceptable drift over horizon in K
+            minPoints (int) - number of samples needed before fitting
+        '''
+        self.setpoint, self.margin, self.holdTime = setpoint, margin, holdTime
+        self.model, self.window, self.horizon, self.tolerance, self.minPoints = model, window, horizon, tolerance, minPoints
+        self.samples = collections.deque()
+        self.insideSince = None
+        self.parameters, self.drift = None, np.inf
+
+    def addSample(self, t, temperature):
+        if np.isnan(temperature):
+            return
+        self.samples.append((t, temperature))
+        while self.samples and (t-self.samples[0][0] > self.window):
+            self.samples.popleft()
+
+        if np.abs(temperature-self.setpoint) < self.margin:
+            self.insideSince = t if self.insideSince is None else self.insideSince
+        else:
+            self.insideSince = None
+
+    def fit(self):
+        '''
+            fit updates the response parameters and the drift predicted over the horizon.
+
+            RETURNS
+            ----------
+            drift (float) - largest change of the temperature expected during the next horizon seconds, inf if the fit fails
+        '''
+        self.parameters, self.drift = None, np.inf
+        if (self.model not in ('first', 'second')) or (len(self.samples) < self.minPoints):
+            return self.drift
+
+        times, temperatures = np.transpose(self.samples)
+        t, now = times-times[0], times[-1]-times[0]
+        try:
+            if self.model == 'first':
+                p0 = [temperatures[-1], temperatures[0]-temperatures[-1], max(t[-1]/3., 1.)]
+                self.parameters, _ = curve_fit(firstOrderResponse, t, temperatures, p0=p0, bounds=([-np.inf, -np.inf, 1e-3], np.inf), maxfev=2000)
+                tinf, a, tau = self.parameters
+                amplitude = np.abs(a)*np.exp(-now/tau)
+                self.drift = amplitude*(1-np.exp(-self.horizon/tau))
+            else:
+                p0 = [np.mean(temperatures), temperatures[0]-np.mean(temperatures), 0., max(t[-1]/3., 1.), 2*np.pi/max(t[-1], 1.)]
+                self.parameters, _ = curve_fit(secondOrderResponse, t, temperatures, p0=p0, bounds=([-np.inf, -np.inf, -np.inf, 1e-3, 0.], np.inf), maxfev=4000)
+                tinf, a, b, tau, omega = self.parameters
+                self.drift = 2*np.hypot(a, b)*np.exp(-now/tau) # peak to peak of the remaining oscillation
+        except (RuntimeError, ValueError) as e:
+            print('SettlingEstimator::fit raised: ', e)
+        return self.drift
+
+    def getAsymptote(self):
+        return self.parameters[0] if self.parameters is not None else np.nan
+
+    def isSettled(self):
+        '''
+            RETURNS
+            ----------
+            settled (bool) - True when the model predicts no significant drift, or when the reading held within margin for holdTime
+        '''
+        if self.insideSince is None:
+            return False
+        if self.samples[-1][0]-self.insideSince >= self.holdTime:
+            return True
+        self.fit()
+        return (self.drift < self.tolerance) and (np.abs(self.getAsymptote()-self.setpoint) < self.margin)
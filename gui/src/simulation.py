@@ -0,0 +1,556 @@
+import os, sys, threading, tempfile
+import numpy as np
+
+from PyQt5.QtCore import QObject, QCoreApplication, QMetaObject, Qt
+
+import clock, iotrace
+from configservice import config
+from executors import Executors
+from hardwaremanager import HardwareManager
+from sequencecompiler import SequenceError, formatDuration
+from checkpoint import SequenceCheckpoint
+
+'''
+    Simulated instruments and sequence dry runs.
+
+    The simulated devices expose the methods of the instrument classes used by HardwareManager, backed by
+    simple physical models advanced on the application clock (see clock.py):
+    * ThermalModel - the PID sensor follows the (ramped) setpoint with a first-order lag, the other sensors
+      follow it with offsets; without heating the stage relaxes to the cold head or room temperature.
+    * MagnetModel - the field ramps at a fixed rate and the controller reports HOLDING once it reaches the target.
+    * VacuumModel - the chamber pumps down exponentially while the turbo gate valve is open and leaks otherwise.
+    * SampleModel - the tape follows the power law V = vc (I/Ic)^n with Ic(T, B) vanishing at Tc, capped by the
+      normal state resistance, so IVs have a critical current and Tc measurements have a transition.
+
+    dryRun plays a sequence file with the real DataManager and TaskManager on an AcceleratedClock, so a sequence of
+    several hours can be checked in minutes, and reports the duration of each step next to its estimate.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+HARDWARE_PARAMETERS = config.get('hwparams.json')
+SENSORS = {'A': 1, 'B': 2, 'C': 3, 'D': 4}
+
+
+class ThermalModel:
+    '''
+        ThermalModel integrates the temperature of the PID sensor, dT/dt = (Ttarget - T)/tau, where Ttarget is the
+        setpoint (moved at the ramp rate when ramping) when the heater is on, and the base temperature otherwise.
+        The heater cannot cool, so Ttarget never goes below the base temperature: 20 K with the cold head on, 295 K without.
+
+        INPUTS
+        ----------
+        temperature (float) - initial temperature of all sensors in K
+        tau (float) - time constant of the PID sensor in seconds
+        sampleLag (float) - time constant of the sample sensor behind the PID sensor in seconds
+        gradient (float) - steady state temperature difference between the sample and the PID sensor in K
+        noise (float) - standard deviation of the readings in K
+    '''
+    def __init__(self, temperature=20., tau=60., sampleLag=20., gradient=.3, noise=.005):
+        self.mutex = threading.RLock()
+        self.tau, self.sampleLag, self.gradient, self.noise = tau, sampleLag, gradient, noise
+        self.pidT, self.sampleT = temperature, temperature+gradient
+        self.setpoint, self.rampSetpoint, self.rampRate, self.ramping = temperature, temperature, 0., False
+        self.heaterOn, self.coolerOn, self.pidSensor = True, True, SENSORS['B']
+        self.lastUpdate = clock.now()
+
+    def getBaseTemperature(self):
+        return 20. if self.coolerOn else 295.
+
+    def update(self):
+        with self.mutex:
+            now = clock.now()
+            elapsed, self.lastUpdate = now-self.lastUpdate, now
+            while elapsed > 0: # steps of at most 1 s keep the ramp and the lag consistent
+                dt = min(elapsed, 1.)
+                elapsed -= dt
+                if self.ramping and (self.rampRate > 0):
+                    step = self.rampRate*dt/60.
+                    self.rampSetpoint += np.clip(self.setpoint-self.rampSetpoint, -step, step)
+                else:
+                    self.rampSetpoint = self.setpoint
+                target = max(self.rampSetpoint, self.getBaseTemperature()) if self.heaterOn else self.getBaseTemperature()
+                self.pidT += (target-self.pidT)*(1-np.exp(-dt/self.tau))
+                self.sampleT += (self.pidT+self.gradient-self.sampleT)*(1-np.exp(-dt/self.sampleLag))
+
+    def getReadings(self):
+        '''
+            RETURNS
+            ----------
+            sampleT, targetT, holderT, spareT (float) - readings of the sensors A to D in K
+        '''
+        with self.mutex:
+            self.update()
+            noise = np.random.normal(0., self.noise, 4)
+            return self.sampleT+noise[0], self.pidT+noise[1], self.pidT+.5+noise[2], 295.+noise[3]
+
+    def getHeatingPower(self):
+        with self.mutex:
+            self.update()
+            if not self.heaterOn:
+                return 0.
+            return float(np.clip(.2*(self.rampSetpoint-self.getBaseTemperature()) + 2*(self.rampSetpoint-self.pidT), 0., 50.))
+
+
+class MagnetModel:
+    '''
+        MagnetModel ramps the field towards the target at rampRate T/s. The state follows the AMI 430 codes:
+        1 RAMPING, 2 HOLDING.
+    '''
+    def __init__(self, rampRate=.01):
+        self.mutex = threading.Lock()
+        self.rampRate, self.field, self.target = rampRate, 0., 0.
+        self.lastUpdate = clock.now()
+
+    def update(self):
+        with self.mutex:
+            now = clock.now()
+            step, self.lastUpdate = self.rampRate*(now-self.lastUpdate), now
+            self.field += np.clip(self.target-self.field, -step, step)
+            return self.field
+
+    def getState(self):
+        return 2 if self.update() == self.target else 1
+
+
+class VacuumModel:
+    '''
+        VacuumModel pumps the chamber down to basePressure with the time constant tau while the turbo gate valve is open,
+        and lets the pressure rise at leakRate torr/s while it is closed.
+    '''
+    def __init__(self, pressure=1e-6, basePressure=5e-7, tau=300., leakRate=1e-6):
+        self.mutex = threading.Lock()
+        self.pressure, self.basePressure, self.tau, self.leakRate = pressure, basePressure, tau, leakRate
+        self.pumping = True
+        self.lastUpdate = clock.now()
+
+    def update(self):
+        with self.mutex:
+            now = clock.now()
+            elapsed, self.lastUpdate = now-self.lastUpdate, now
+            if self.pumping:
+                self.pressure = self.basePressure + (self.pressure-self.basePressure)*np.exp(-elapsed/self.tau)
+            else:
+                self.pressure = min(self.pressure + self.leakRate*elapsed, 760.)
+            return self.pressure
+
+
+class SampleModel:
+    '''
+        SampleModel computes the voltage across the voltage taps of the tape from the currents of the sources
+        connected to it, the sample temperature and the magnetic field.
+
+        INPUTS
+        ----------
+        ic0 (float) - critical current at 0 K and 0 T in A
+        tc (float) - critical temperature in K
+        b0 (float) - field in T at which Ic is halved
+        n (float) - n-value of the power law
+        vc (float) - voltage criterion in V (1 uV/cm over the bridge)
+        rNormal (float) - resistance of the bridge in the normal state in ohm
+        thermalOffset (float) - thermal EMF of the leads in V
+        noise (float) - standard deviation of the voltage readings in V
+    '''
+    def __init__(self, thermal, magnet, ic0=120., tc=90., b0=5., n=30., vc=2e-7, rNormal=5e-3, thermalOffset=1e-6, noise=1e-8):
+        self.thermal, self.magnet = thermal, magnet
+        self.ic0, self.tc, self.b0, self.n, self.vc, self.rNormal = ic0, tc, b0, n, vc, rNormal
+        self.thermalOffset, self.noise = thermalOffset, noise
+        self.largeCurrent, self.smallCurrent, self.smallPolarity, self.smallEnabled = 0., 0., 1, False
+        self.connected100A, self.connected6A, self.smallSourceOnSample = False, False, False
+
+    def getCurrent(self):
+        current = self.largeCurrent if (self.connected100A or self.connected6A) else 0.
+        if self.smallSourceOnSample and self.smallEnabled:
+            current += self.smallPolarity*self.smallCurrent
+        return current
+
+    def getCriticalCurrent(self):
+        temperature = self.thermal.getReadings()[0]
+        if temperature >= self.tc:
+            return 0.
+        return self.ic0*(1-(temperature/self.tc)**2)**1.5/(1+self.magnet.update()/self.b0)
+
+    def getVoltage(self):
+        current, ic = self.getCurrent(), self.getCriticalCurrent()
+        normal = self.rNormal*np.abs(current)
+        flux = self.vc*(np.abs(current)/ic)**self.n if ic > 0 else normal
+        return np.sign(current)*min(flux, normal) + self.thermalOffset + np.random.normal(0., self.noise)
+
+
+class SimulatedTemperatureController:
+    def __init__(self, thermal):
+        self.thermal = thermal
+
+    def testConnection(self):
+        return True
+
+    def getTemperatureReadings(self):
+        return tuple(self.thermal.getReadings())
+
+    def getSampleTemperature(self):
+        return self.thermal.getReadings()[0]
+
+    def getTargetTemperature(self):
+        return self.thermal.getReadings()[1]
+
+    def getHeatingPower(self):
+        return self.thermal.getHeatingPower()
+
+    def getSetpointTemperature(self):
+        with self.thermal.mutex:
+            self.thermal.update()
+            return self.thermal.rampSetpoint
+
+    def setSetpointTemperature(self, setpoint):
+        with self.thermal.mutex:
+            self.thermal.update()
+            self.thermal.setpoint = setpoint
+
+    def getPIDSensor(self):
+        return self.thermal.pidSensor
+
+    def setPIDSensor(self, sensor):
+        self.thermal.pidSensor = SENSORS.get(sensor, self.thermal.pidSensor)
+
+    def setHeaterOutput(self, on=True):
+        with self.thermal.mutex:
+            self.thermal.update()
+            self.thermal.heaterOn = on
+
+    def set_input_configuration(self, sensor_configuration, vb=False):
+        pass
+
+    def rampTemperature(self, rate, ramping=True):
+        with self.thermal.mutex:
+            self.thermal.update()
+            self.thermal.rampRate, self.thermal.ramping = rate, ramping
+
+    def __del__(self):
+        pass
+
+
+class SimulatedMagnetController:
+    def __init__(self, magnet):
+        self.magnet = magnet
+
+    def testConnection(self):
+        return True
+
+    def set_magnetic_field(self, setpoint):
+        self.magnet.update()
+        self.magnet.target = setpoint
+
+    def get_setpoint_magnetic_field(self, vb=False):
+        return self.magnet.target
+
+    def get_magnetic_field(self, vb=False):
+        return self.magnet.update()
+
+    def field_stable(self, vb=False):
+        return self.magnet.getState() == 2
+
+
+class SimulatedPressureMonitor:
+    def __init__(self, vacuum):
+        self.vacuum, self.igOn = vacuum, True
+
+    def testConnection(self):
+        return True
+
+    def getPressure(self, vb=False):
+        return self.vacuum.update()
+
+    def testIgOn(self):
+        self.igOn = self.vacuum.update() < 2.5e-3
+        return self.igOn
+
+
+class SimulatedNanoVoltmeter:
+    '''
+        SimulatedNanoVoltmeter reads the sample voltage, each read takes readTime seconds like the 2182A at its integration time.
+    '''
+    def __init__(self, sample, readTime=.1):
+        self.sample, self.readTime = sample, readTime
+        self.offset, self.polarity = 0., 1
+        self.count = 0
+
+    def testConnection(self):
+        return True
+
+    def setPolarity(self, polarity=1):
+        self.polarity = polarity
+
+    def measure(self, removeOffset=True, vb=True):
+        clock.sleep(self.readTime)
+        voltage = self.sample.getVoltage()
+        if removeOffset:
+            voltage -= self.offset
+        return voltage*self.polarity
+
+    def measureOffset(self, n=20):
+        voltages = np.array([self.measure(removeOffset=False) for k in range(n)])*self.polarity
+        return np.mean(voltages), np.std(voltages)
+
+    def setOffset(self):
+        self.offset, std = self.measureOffset(n=20)
+        return self.offset
+
+    def armTriggerLink(self, count, source='ext'):
+        self.count = count
+
+    def rearmTriggerLink(self):
+        pass
+
+    def trigger(self):
+        pass
+
+    def fetchTriggerLink(self, count, removeOffset=True, timeout=5.):
+        return np.array([self.measure(removeOffset=removeOffset) for k in range(count)])
+
+    def disarmTriggerLink(self):
+        self.count = 0
+
+
+class SimulatedMultimeter:
+    '''
+        SimulatedMultimeter reads the transport current across the shunt with a relative noise of 1e-4.
+    '''
+    def __init__(self, sample, readTime=.05):
+        self.sample, self.readTime = sample, readTime
+        self.count, self.period = 0, 0.
+
+    def testConnection(self):
+        return True
+
+    def measure(self):
+        clock.sleep(self.readTime)
+        current = self.sample.getCurrent()
+        return current*(1+np.random.normal(0., 1e-4))
+
+    def armTriggerLink(self, count, software=False, period=0.):
+        self.count, self.period = count, period
+
+    def rearmTriggerLink(self):
+        pass
+
+    def initiate(self):
+        pass
+
+    def trigger(self):
+        pass
+
+    def fetchTriggerLink(self, count, timeout=5.):
+        currents = np.array([self.measure() for k in range(count)])
+        return currents, np.arange(count)*max(self.period, self.readTime)
+
+    def disarmTriggerLink(self):
+        self.count = 0
+
+
+class SimulatedCurrentSource100A:
+    '''
+        SimulatedCurrentSource100A stands for the power supplies that drive the large transport current, whichever
+        supply is requested the current reaches the sample through the 100 A or the 6 A relays.
+    '''
+    def __init__(self, sample, a, b, shuntR):
+        self.sample, self.shuntR = sample, shuntR
+        self.updateCalibration(a, b)
+
+    def setCurrent(self, current, currentSource=HARDWARE_PARAMETERS['LABEL_CS100A'], useCalibration=True, vb=False):
+        control_voltage = 0.
+        if currentSource == HARDWARE_PARAMETERS['LABEL_CS100A']:
+            control_voltage = (current*self.shuntR-self.b)/self.a if useCalibration else current*0.58/101.
+            if (control_voltage < 0) | (control_voltage > .75):
+                control_voltage = np.nan
+                current = 0.
+        self.sample.largeCurrent = current
+        clock.sleep(.2) # stabilize the current
+        return control_voltage
+
+    def startHardwareRamp(self, currents, dwell, simulated=False):
+        print('SimulatedCurrentSource100A: hardware timed ramps are not simulated, set ic_hardware_timed to false')
+        return None
+
+    def enableParallelMode(self, enabled=False):
+        pass
+
+    def updateCalibration(self, a, b):
+        self.a, self.b = a, b
+
+    def getCurrent(self):
+        return self.sample.largeCurrent
+
+
+class SimulatedCurrentSource100mA:
+    def __init__(self, sample):
+        self.sample = sample
+
+    def testConnection(self):
+        return True
+
+    def setCurrent(self, value=0, settle=True):
+        self.sample.smallCurrent = value
+        if settle:
+            clock.sleep(.4)
+
+    def setPolarity(self, polarity=0):
+        self.sample.smallPolarity = 1 if polarity == 0 else -1
+        clock.sleep(.6)
+
+    def enable(self, enabled):
+        self.sample.smallEnabled = enabled
+        clock.sleep(.4)
+
+
+class SimulatedVoltageSource:
+    def testConnection(self):
+        return True
+
+
+class SimulatedRelays:
+    '''
+        SimulatedRelays keeps the state of the relays. Like the relay board, states are 0 when on and 1 when off.
+    '''
+    def __init__(self, thermal, vacuum, sample):
+        self.thermal, self.vacuum, self.sample = thermal, vacuum, sample
+        self.faradayCupInserted = False
+
+    def openGateValve(self, opened=True):
+        self.vacuum.update()
+        self.vacuum.pumping = opened
+
+    def setCooler(self, on=True):
+        with self.thermal.mutex:
+            self.thermal.update()
+            self.thermal.coolerOn = on
+
+    def insertFaradayCup(self, inserted=True):
+        self.faradayCupInserted = inserted
+
+    def connectSampleTo100A(self, connected=True):
+        self.sample.connected100A = connected
+
+    def connectSampleTo6A(self, connected=False):
+        self.sample.connected6A = connected
+
+    def connectCurrentSource100mATo(self, device='sample'):
+        self.sample.smallSourceOnSample = (device == 'sample')
+
+    def measureSampleWith(self, device='picoammeter'):
+        pass
+
+    def switchHatLight(self, on=False):
+        pass
+
+    def setTargetLight(self, on=False):
+        pass
+
+    def setChamberLight(self, on=False):
+        pass
+
+    def resetQPS(self):
+        pass
+
+    def getGateValveState(self):
+        return 0 if self.vacuum.pumping else 1
+
+    def getCryocoolerState(self):
+        return 0 if self.thermal.coolerOn else 1
+
+    def getFaradayCupState(self):
+        return 0 if self.faradayCupInserted else 1
+
+
+class SimulatedHardwareManager(HardwareManager):
+    '''
+        SimulatedHardwareManager is a HardwareManager whose instruments are the simulated devices of this module.
+
+        INPUTS
+        ----------
+        temperature (float) - initial temperature of the stage in K
+    '''
+    def __init__(self, temperature=20., parent=None, vb=False):
+        QObject.__init__(self, parent)
+        self.preferences, self.hardware_parameters = config.get('preferences.json'), HARDWARE_PARAMETERS
+        self.outputCurrents, self.outputCounter, self.fieldHolding = {}, 0, False
+
+        self.thermal, self.magnet, self.vacuum = ThermalModel(temperature), MagnetModel(), VacuumModel()
+        self.sample = SampleModel(self.thermal, self.magnet)
+        self.vs = SimulatedVoltageSource()
+        self.cs100A = SimulatedCurrentSource100A(self.sample, self.hardware_parameters["a"], self.hardware_parameters["b"], self.hardware_parameters["shuntR"])
+        self.csCAEN, self.csTDK = self.cs100A, self.cs100A
+        self.cs100mA = SimulatedCurrentSource100mA(self.sample)
+        self.relays = SimulatedRelays(self.thermal, self.vacuum, self.sample)
+        self.tc = SimulatedTemperatureController(self.thermal)
+        self.mc = SimulatedMagnetController(self.magnet)
+        self.pm = SimulatedPressureMonitor(self.vacuum)
+        self.nvm = SimulatedNanoVoltmeter(self.sample)
+        self.dmm = SimulatedMultimeter(self.sample)
+
+    def reconnect_device(self, device_key):
+        self.log_signal.emit('Reconect', 'Simulated devices are always connected')
+
+
+def dryRun(path, speed=60., temperature=20., vb=False):
+    '''
+        dryRun plays the sequence file at path against simulated instruments on a clock running speed times faster
+        than real time. The data, logs and checkpoint are written to a temporary folder so that the session folders
+        and the checkpoint of the real setup are left untouched. Steps that compute a lot (fits, file writes) appear
+        speed times longer than they would take on the setup, so very high speeds overestimate their duration.
+        When an I/O trace is replayed (see iotrace.py) the real device classes are used instead of the simulated
+        ones, so that the sequence runs through the same code as on the setup with the recorded responses.
+
+        INPUTS
+        ----------
+        path (str) - .seq file
+        speed (float) - virtual seconds per real second
+        temperature (float) - initial temperature of the stage in K, ignored when replaying an I/O trace
+
+        RETURNS
+        ----------
+        stepTimes (list) - (SequenceStep, seconds) of each step that ran, see TaskManager.stepTimes
+    '''
+    from datamanager import DataManager
+    from taskmanager import TaskManager
+
+    accelerated = clock.AcceleratedClock(speed)
+    clock.setClock(accelerated)
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    folder = tempfile.mkdtemp(prefix='hts-dryrun-')
+
+    executors = Executors(config.get('preferences.json'))
+    hm = SimulatedHardwareManager(temperature=temperature, vb=vb) if iotrace.getReplay() is None else HardwareManager(vb=vb)
+    dm = DataManager(executors, saveFolder=folder+'/', vb=vb)
+    tm = TaskManager(dm, hm, executors, vb=vb)
+    tm.checkpoint = SequenceCheckpoint(os.path.join(folder, 'sequence_checkpoint.json'))
+    if vb:
+        tm.log_signal.connect(lambda what, comment: print('{:20s} {}'.format(what, comment)))
+
+    tm.startReadings()
+    try:
+        sequence = tm.compileSequence([os.path.abspath(path)])
+    except SequenceError as e:
+        print(e)
+        tm.stopReadings()
+        return []
+    print('Dry run of {} at {:g}x, data in {}'.format(path, speed, folder))
+    print(sequence.summary())
+
+    def run():
+        try:
+            tm.runSequence(sequence)
+        finally:
+            QMetaObject.invokeMethod(app, 'quit', Qt.QueuedConnection)
+    threading.Thread(target=run, name='DryRun', daemon=True).start()
+    app.exec_()
+    tm.stopReadings()
+
+    virtual, real = accelerated.getElapsed()
+    print('{:>4s}  {:16s} {:>12s} {:>12s}  {}'.format('step', 'action', 'estimated', 'simulated', 'line'))
+    for k, (step, seconds) in enumerate([(step, seconds) for step, seconds in tm.stepTimes if step.action != 'Subsequence']):
+        print('{:>4d}  {:16s} {:>12s} {:>12s}  {}'.format(k+1, step.action, formatDuration(step.duration), formatDuration(seconds), step.line[:60]))
+    print('Total: {} simulated ({} estimated), dry run took {} of real time'.format(formatDuration(sum([seconds for step, seconds in tm.stepTimes])), formatDuration(sequence.total), formatDuration(real)))
+    if iotrace.getReplay() is not None:
+        print('I/O replay: {}'.format(iotrace.getReplay().getStats()))
+    return tm.stepTimes
@@ -0,0 +1,154 @@
+import os, sys, json, time, builtins, datetime
+
+'''
+    Startup profiler.
+
+    With main.py --profile-startup, the first import of each module and the construction of the main window
+    are timed until the window is shown, then a report is printed (and written as JSON if a file is given):
+
+        time to window                      from the start of main.py to the first event loop iteration after show
+        imports                             cumulative and self time of each module, the self time excludes the imports
+                                            made while it loads, e.g. Tab_VoltageCurrent and the fitting modules it pulls in
+        construction                        time to build the managers, the tabs and the sidebar, see measure
+
+    Modules are timed through builtins.__import__, so only the first import of a module costs anything; while the
+    profiler is off measure returns a shared no-op.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+_enabled = False
+_start = time.perf_counter()
+_originalImport = builtins.__import__
+_imports = {}   # module: [cumulative s, self s, depth, order]
+_stack = []     # [module, start, time spent in nested imports] of the imports in progress
+_steps = []     # (label, s), in construction order
+_marks = {}     # label: s since the start
+
+
+def _profiledImport(name, globals=None, locals=None, fromlist=(), level=0):
+    if (level != 0) or (name in sys.modules) or (name in _imports):
+        return _originalImport(name, globals, locals, fromlist, level)
+    _stack.append([name, time.perf_counter(), 0.])
+    try:
+        return _originalImport(name, globals, locals, fromlist, level)
+    finally:
+        module, start, nested = _stack.pop()
+        elapsed = time.perf_counter()-start
+        _imports[module] = [elapsed, elapsed-nested, len(_stack), len(_imports)]
+        if _stack:
+            _stack[-1][2] += elapsed
+
+
+class Measure:
+    __slots__ = ('label', 'start')
+
+    def __init__(self, label):
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        _steps.append((self.label, time.perf_counter()-self.start))
+        return False
+
+
+class NullMeasure:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        return False
+
+NULL_MEASURE = NullMeasure()
+
+
+def enable(startTime=None):
+    '''
+        enable starts timing the imports.
+
+        INPUTS
+        ----------
+        startTime (float) - perf_counter time of the start of the program, the import of this module by default
+    '''
+    global _enabled, _start
+    _enabled = True
+    if startTime is not None:
+        _start = startTime
+    builtins.__import__ = _profiledImport
+
+def disable():
+    global _enabled
+    _enabled = False
+    builtins.__import__ = _originalImport
+
+def isEnabled():
+    return _enabled
+
+def measure(label):
+    '''
+        measure times a step of the construction of the main window, e.g.
+
+            with startupprofiler.measure('Tab_Signals'):
+                self.environmentTools = Tab_Signals(...)
+
+        RETURNS
+        ----------
+        measure (Measure) - context manager, a shared no-op when the profiler is off
+    '''
+    return Measure(label) if _enabled else NULL_MEASURE
+
+def mark(label):
+    '''
+        mark records the time elapsed since the start of the program, e.g. 'time to window'.
+    '''
+    if _enabled:
+        _marks[label] = time.perf_counter()-_start
+
+def getReport():
+    '''
+        RETURNS
+        ----------
+        report (dict) - 'marks' (label: s), 'imports' (list of module, cumulative, self in s and depth, in import
+                        order) and 'construction' (list of label, s)
+    '''
+    imports = sorted(_imports.items(), key=lambda item: item[1][3])
+    return {
+        'created': str(datetime.datetime.now()),
+        'marks': dict(_marks),
+        'imports': [{'module': module, 'cumulative': cumulative, 'self': own, 'depth': depth} for module, (cumulative, own, depth, order) in imports],
+        'construction': [{'label': label, 'seconds': seconds} for label, seconds in _steps],
+    }
+
+def report(path=None, top=25):
+    '''
+        report prints the marks, the slowest imports by self time and the construction steps, and writes the full report
+        to path.
+
+        INPUTS
+        ----------
+        path (str) - JSON file, overwritten, None not to write it
+        top (int) - number of imports printed
+    '''
+    results = getReport()
+    print('\nStartup profile')
+    for label, seconds in sorted(results['marks'].items(), key=lambda item: item[1]):
+        print('    {:<40s}{:>9.3f} s'.format(label, seconds))
+
+    print('\n    {:<40s}{:>9s}{:>9s}'.format('Slowest imports (self time)', 'self', 'cumul.'))
+    for entry in sorted(results['imports'], key=lambda entry: entry['self'], reverse=True)[:top]:
+        print('    {:<40s}{:>7.0f}ms{:>7.0f}ms'.format(entry['module'], 1e3*entry['self'], 1e3*entry['cumulative']))
+    print('    {:<40s}{:>7.0f}ms'.format('all {} modules'.format(len(results['imports'])), 1e3*sum([entry['self'] for entry in results['imports']])))
+
+    print('\n    {:<40s}{:>9s}'.format('Construction', 'time'))
+    for entry in results['construction']:
+        print('    {:<40s}{:>7.0f}ms'.format(entry['label'], 1e3*entry['seconds']))
+
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=4)
+        print('\nStartup profile written to {}'.format(os.path.abspath(path)))
+    return results
@@ -19,10 +19,17 @@ class Task(QRunnable):
         self.fn = fn
         self.args = args
         self.kwargs = kwargs
+        self.onStart, self.onFinish = None, None # set by Executor to collect queue and run time metrics
 
     @pyqtSlot()
     def run(self):
         '''
         Initialise the runner function with passed args, kwargs.
         '''
-        self.fn(*self.args, **self.kwargs)
\ No newline at end of file
+        if self.onStart is not None:
+            self.onStart(self)
+        try:
+            self.fn(*self.args, **self.kwargs)
+        finally:
+            if self.onFinish is not None:
+                self.onFinish(self)
\ No newline at end of file
@@ -1,11 +1,19 @@
-import os, time, datetime, numpy
-from playsound import playsound
-from configure import load_json
+import os, time, datetime, threading, collections, numpy
+from configservice import config
 from scipy import integrate, constants
 from PyQt5.QtCore import pyqtSignal, QObject, QThreadPool, QTimer, QMutex
 from task import Task
-
-HARDWARE_PARAMETERS = load_json(fname='hwparams.json', location=os.getcwd()+'/config')
+import clock, tracing
+from currentreversal import CurrentReversalEngine
+from offsettracker import OffsetTracker
+from cancellation import CancellationToken, CancelLatency
+from settling import SettlingEstimator
+from sequencecompiler import compileSequence, CompiledSequence, SequenceError
+from checkpoint import SequenceCheckpoint
+
+HARDWARE_PARAMETERS = config.get('hwparams.json')
+PID_SENSOR_SIGNALS = ('Sample Temperature', 'Target Temperature', 'Holder Temperature', 'Spare Temperature') # A = 1, B = 2, C = 3, D = 4
+CURRENT_SOURCES = [HARDWARE_PARAMETERS[key] for key in ('LABEL_CAEN', 'LABEL_CS006A', 'LABEL_CS100A', 'LABEL_TDK')] # sources that can ramp an IV
 
 class TaskManager(QObject):
     '''
@@ -21,57 +29,155 @@ class TaskManager(QObject):
     '''
     log_signal = pyqtSignal(str, str)
     plotSignal = pyqtSignal(float, float, str)
+    preferences_signal = pyqtSignal(object)
 
 
-    def __init__(self, dataManager, hardwareManager, threadpool, parent=None, vb=False):
+    def __init__(self, dataManager, hardwareManager, executors, parent=None, vb=False):
         super(TaskManager, self).__init__(parent)
         
-        self.threadpool = threadpool
-        self.preferences = load_json(fname='preferences.json', location=os.getcwd()+'/config')
+        self.executors = executors
+        config.attach(self, 'preferences', 'preferences.json')
         self.corrected_voltage = 0
         self.warmupTemperature = 300.
         self.dm = dataManager
         self.hm = hardwareManager
         
         self.datapoints = []
+        self.vtStream = None
+        self.branch = threading.local() # acquiring flag and stop token of the parallel branch run by the current thread, see runParallelSteps
+        self.branchStates = []          # states of the running branches, stopped together by stopAcquiring
+        self.globalStopToken = CancellationToken() # wakes every interruptible wait when the user stops a measurement or sequence
         self.acquiring = False
         self.annealing = False
         self.sequenceRunning = False
+        self.sequenceLabel = '' # set by the Label step, appended to the tags of the measurements that follow
+        self.resourceLocks = collections.defaultdict(threading.Lock) # one lock per instrument for the steps of parallel groups
+        self.checkpoint = SequenceCheckpoint(self.preferences['sequence_checkpoint']) # progress of the running sequence, see resumeSequence
+        self.resumeState = None
+        self.stepTimes = [] # (step, seconds) of each step of the last sequence, a parallel group is timed as a whole by its stop marker
+        self.measurementCounter = 0 # incremented whenever the four point probe is connected, invalidates offset samples taken meanwhile
+        self.cancelLatency = CancelLatency(self.globalStopToken)
+        self.currentStep = None # (index, action) of the sequence step in progress
+        self.offsetTracker = OffsetTracker(window=self.preferences['offset_tracking_window'], maxAge=self.preferences['offset_tracking_max_age'], tolerance=self.preferences['offset_tracking_tolerance'])
         
         # timers
         self.nvTimer, self.tcTimer, self.pmTimer, self.mcTimer, self.plotTimer, self.dataBackupTimer  = QTimer(), QTimer(), QTimer(), QTimer(), QTimer(), QTimer()
-        self.nvTimer.timeout.connect(lambda: self.threadpool.start(Task(self.updateNvReadings)))
-        self.tcTimer.timeout.connect(lambda: self.threadpool.start(Task(self.updateTcReadings)))
-        self.pmTimer.timeout.connect(lambda: self.threadpool.start(Task(self.updatePmReadings)))
-        self.mcTimer.timeout.connect(lambda: self.threadpool.start(Task(self.updateMcReadings)))
-        self.plotTimer.timeout.connect(lambda: self.threadpool.start(Task(self.dm.updateEnvironmentPlots)))
-        self.dataBackupTimer.timeout.connect(lambda: self.threadpool.start(Task(self.dm.saveEnvironmentData)))
+        self.nvTimer.timeout.connect(lambda: self.executors.telemetry.start(Task(self.updateNvReadings)))
+        self.tcTimer.timeout.connect(lambda: self.startTimedUpdate(self.tcTimer, 'updateTcReadings'))
+        self.pmTimer.timeout.connect(lambda: self.startTimedUpdate(self.pmTimer, 'updatePmReadings'))
+        self.mcTimer.timeout.connect(lambda: self.startTimedUpdate(self.mcTimer, 'updateMcReadings'))
+        self.plotTimer.timeout.connect(lambda: self.executors.analysis.start(Task(self.dm.updateEnvironmentPlots)))
+        self.dataBackupTimer.timeout.connect(lambda: self.executors.io.start(Task(self.dm.saveEnvironmentData)))
+        self.offsetTimer = QTimer()
+        self.offsetTimer.timeout.connect(lambda: self.startTimedUpdate(self.offsetTimer, 'trackVoltageOffset'))
+        self.timerMutex = threading.Lock()
+        self.timerStats = collections.defaultdict(collections.Counter) # update: runs and overruns, see runTimedUpdate
+        self.preferences_signal.connect(self.applyPreferences)
+        config.subscribe('preferences.json', self.preferences_signal.emit) # the timers belong to the thread of the TaskManager
     
 
+    @property
+    def acquiring(self):
+        '''
+            acquiring is True while a measurement runs. Each branch of a parallel group has its own flag, so that
+            a measurement ending in one branch does not look like a stop to the others; outside the branches the flag
+            is True while any measurement runs.
+        '''
+        state = getattr(self.branch, 'state', None)
+        if state is not None:
+            return state['acquiring']
+        return self._acquiring or any([state['acquiring'] for state in list(self.branchStates)])
+
+    @acquiring.setter
+    def acquiring(self, value):
+        state = getattr(self.branch, 'state', None)
+        if state is not None:
+            state['acquiring'] = value
+        else:
+            self._acquiring = value
+
+    @property
+    def stopToken(self):
+        '''
+            stopToken is the CancellationToken of the branch run by the current thread, the global one elsewhere.
+            stopAcquiring cancels all of them.
+        '''
+        state = getattr(self.branch, 'state', None)
+        return self.globalStopToken if state is None else state['stopToken']
+
+    def startTimedUpdate(self, timer, update):
+        self.executors.telemetry.start(Task(self.runTimedUpdate, update, timer.interval()/1000., time.perf_counter()))
+
+    def runTimedUpdate(self, update, period, tick):
+        '''
+            runTimedUpdate runs a telemetry update and counts an overrun when it ends after the next tick of its timer,
+            because it waited in the telemetry queue or because it took longer than the period.
+
+            INPUTS
+            ----------
+            update (str) - name of the update method
+            period (float) - period of the timer in real seconds
+            tick (float) - perf_counter time of the tick that started the update
+        '''
+        try:
+            getattr(self, update)()
+        finally:
+            overrun = (time.perf_counter()-tick) > period
+            with self.timerMutex:
+                self.timerStats[update]['runs'] += 1
+                self.timerStats[update]['overruns'] += int(overrun)
+
+    def getTimerStats(self):
+        with self.timerMutex:
+            return {update: dict(stats) for update, stats in self.timerStats.items()}
+
+    def applyPreferences(self, preferences):
+        '''
+            applyPreferences changes the periods of the running timers when the sampling periods are edited, and starts
+            or stops the offset tracking, without restarting the session.
+        '''
+        for timer, key in ((self.tcTimer, 'sampling_period_tc'), (self.pmTimer, 'sampling_period_pm'), (self.mcTimer, 'sampling_period_mc'),
+                           (self.dataBackupTimer, 'saverate'), (self.offsetTimer, 'offset_tracking_period')):
+            interval = max(int(clock.toReal(preferences[key])*1000), 1)
+            if timer.isActive() and (timer.interval() != interval):
+                timer.setInterval(interval)
+        
+        if self.offsetTimer.isActive() and not preferences['offset_tracking']:
+            self.offsetTimer.stop()
+        elif self.tcTimer.isActive() and preferences['offset_tracking'] and not self.offsetTimer.isActive():
+            self.offsetTimer.start(max(int(clock.toReal(preferences['offset_tracking_period'])*1000), 1))
+
     def startReadings(self, ln2Measurements=False):
         self.dm.startTime()
         self.ln2Measurements = ln2Measurements
         self.updateTcReadings() # Necessary: otherwise the dataframes are None and plot update fails.
         self.updatePmReadings()
         self.updateMcReadings()
+        self.dm.setAcquiredSignals(() if self.ln2Measurements else ('tc', 'pm', 'mc'))
         
         if not self.ln2Measurements:
-            self.tcTimer.start(int(self.preferences['sampling_period_tc']*1000))
-            self.pmTimer.start(int(self.preferences['sampling_period_pm']*1000))
-            self.mcTimer.start(int(self.preferences['sampling_period_mc']*1000))
+            # the sampling periods are on the application clock, faster than real time during a dry run (see simulation.py)
+            self.tcTimer.start(max(int(clock.toReal(self.preferences['sampling_period_tc'])*1000), 1))
+            self.pmTimer.start(max(int(clock.toReal(self.preferences['sampling_period_pm'])*1000), 1))
+            self.mcTimer.start(max(int(clock.toReal(self.preferences['sampling_period_mc'])*1000), 1))
             self.plotTimer.start(1000)
-            self.dataBackupTimer.start(int(self.preferences['saverate']*1000)) # TQp data backup, user specified in seconds
+            self.dataBackupTimer.start(max(int(clock.toReal(self.preferences['saverate'])*1000), 1)) # TQp data backup, user specified in seconds
+            if self.preferences['offset_tracking']:
+                self.offsetTimer.start(max(int(clock.toReal(self.preferences['offset_tracking_period'])*1000), 1))
         else:
             self.dm.updateEnvironmentPlots()
     
     def stopReadings(self):
+        self.dm.setAcquiredSignals(())
         if not self.ln2Measurements:
             self.tcTimer.stop()
             self.pmTimer.stop()
             self.mcTimer.stop()
             self.plotTimer.stop()
             self.dataBackupTimer.stop()
+            self.offsetTimer.stop()
 
+    @tracing.traced('telemetry')
     def updateTcReadings(self):
         if not self.ln2Measurements:
             setpointT, sampleT, targetT, holderT, spareT, heatingPower = self.hm.getTemperatureReading()
@@ -79,6 +185,7 @@ class TaskManager(QObject):
             setpointT, sampleT, targetT, holderT, spareT, heatingPower = 77.3, 77.3, 0, 0, 0, 0.
         self.dm.updateTcReadings(setpointT, sampleT, targetT, holderT, spareT, heatingPower)
         
+    @tracing.traced('telemetry')
     def updatePmReadings(self, ln2Measurements=False):
         if not self.ln2Measurements:
             pressure = self.hm.getPressureReading()
@@ -86,11 +193,48 @@ class TaskManager(QObject):
             pressure = 760.
         self.dm.updatePmReadings(pressure)
     
+    @tracing.traced('task')
+    def trackVoltageOffset(self):
+        '''
+            trackVoltageOffset samples the zero-current voltage while no measurement is running and no current source
+            is on, e.g. one set from the Devices tab, and adds it to the offset drift model. Samples during which a
+            measurement started or a source was turned on are discarded.
+        '''
+        if self.acquiring or self.annealing or self.hm.isSourcingCurrent():
+            return
+        counter, outputs, t = self.measurementCounter, self.hm.outputCounter, clock.now()
+        offset, std = self.hm.measureVoltageOffset(n=self.preferences['offset_tracking_reads'])
+        if (counter == self.measurementCounter) and (outputs == self.hm.outputCounter) and not (self.acquiring or self.annealing or self.hm.isSourcingCurrent()):
+            self.offsetTracker.addSample(t, offset, std)
+
+    @tracing.traced('task')
+    def prepareVoltageOffset(self):
+        '''
+            prepareVoltageOffset sets the offset subtracted from the nanovoltmeter readings before a measurement.
+            The tracked offset is used when it is fresh and its uncertainty is within offset_tracking_tolerance,
+            otherwise the offset is calibrated with setVoltageOffset and the calibration feeds the drift model.
+            
+            RETURNS
+            ----------
+            offset (float) - offset in volts
+        '''
+        t = clock.now()
+        if self.preferences['offset_tracking'] and self.offsetTracker.isFresh(t):
+            offset, uncertainty = self.offsetTracker.predict(t)
+            self.hm.applyVoltageOffset(offset)
+            print('TaskManager::prepareVoltageOffset using tracked offset {:4.4e} V +/- {:4.1e} V'.format(offset, uncertainty))
+            return offset
+        offset = self.hm.setVoltageOffset()
+        self.offsetTracker.addSample(t, offset)
+        return offset
+
+    @tracing.traced('telemetry')
     def updateMcReadings(self):
         setpoint_field = self.hm.get_setpoint_magnetic_field_reading()
         field = self.hm.getMagneticFieldReading()
-        self.dm.updateMcReadings(setpoint_field, field)
+        self.dm.updateMcReadings(setpoint_field, field, holding=self.hm.getFieldHolding())
 
+    @tracing.traced('task')
     def connectFourPointProbe(self, connected=True, current_source=HARDWARE_PARAMETERS['LABEL_LS121']):
         """
             connectFourPointProbe connects or disconnects the transport measurement system for Ic, Tc, and Vt measurements.
@@ -101,6 +245,7 @@ class TaskManager(QObject):
                 current_source (str): indicates which current source should be connected.
         """
         if connected:
+            self.measurementCounter += 1
             self.hm.measureSampleWith(device='nanovoltmeter')
         #else:
         #    self.hm.measureSampleWith(device='picoammeter') #
@@ -137,11 +282,12 @@ class TaskManager(QObject):
                 self.hm.connectCurrentSource100mATo(device='sample')
             else:
                 self.hm.connectCurrentSource100mATo(device='hallSensor')
-            time.sleep(1)
+            clock.sleep(1)
         
         if connected:
             self.resetQPS() # this might need to be at the end...Seems likely! Alexis Devitre 2024.09.16
     
+    @tracing.traced('task')
     def measureTc(self, startT, rampRate, stopT, transportCurrent, tag):
         """
         MeasureTc ramps the temperature at a fixed rate, while measuring voltage at fixed transport current.
@@ -151,7 +297,8 @@ class TaskManager(QObject):
         measurement ends.
         
         Each voltage point is half of the difference between the measured voltage in forward bias (vpos), 
-        and that measured in reverse bias (vneg) to remove offset and thermal voltages.
+        and that measured in reverse bias (vneg) to remove offset and thermal voltages. The polarity changes
+        are pipelined by CurrentReversalEngine and the read times of vpos and vneg are stored with each point.
 
         @params
             startT (float): Start temperature in K.
@@ -159,7 +306,7 @@ class TaskManager(QObject):
             transportCurrent (float): magnitude of the current through the sample 100 nA to 100 mA
             tag (str): a descriptive file name
         """
-        tc, self.datapoints, self.acquiring = numpy.nan, [], True
+        tc, self.datapoints, self.acquiring, startTime = numpy.nan, [], True, clock.now()
 
         self.connectFourPointProbe(connected=True, current_source=HARDWARE_PARAMETERS['LABEL_LS121'])
         
@@ -177,17 +324,15 @@ class TaskManager(QObject):
             else:
                 self.hm.rampTemperature(10, rampRate, ramping=True)
         try:
+            reversal = CurrentReversalEngine(self.hm, self.dm, settleTime=self.preferences['tc_settle_time'])
+            reversal.start(transportCurrent)
             while (self.acquiring & (numpy.abs(sampleT - stopT) > 0.1)):
-                sampleT, targetT, spareT, holderT = self.dm.getLatestValue('Sample Temperature'), self.dm.getLatestValue('Target Temperature'), self.dm.getLatestValue('Spare Temperature'), self.dm.getLatestValue('Holder Temperature')
-                
-                self.hm.setSmallCurrent(transportCurrent)
-                vpos = self.hm.getVoltageReading(removeOffset=False)
-                
-                self.hm.setSmallCurrent(-1*transportCurrent)
-                vneg = self.hm.getVoltageReading(removeOffset=False)
+                i, vpos, tpos, vneg, tneg, (sampleT, targetT, holderT, spareT) = reversal.nextPair(transportCurrent)
                 vavg = (vpos-vneg)/2.
-                
-                self.datapoints.append([float(datetime.datetime.now().strftime('%Y%m%d%H%M%S.%f')), time.time()-self.dm.t0, self.hm.getCurrentReading(useDMM=True), vavg, sampleT, targetT, vpos, vneg, holderT, spareT])
+
+                # the forward bias of the next pair settles while this point is stored
+                tmid = (tpos+tneg)/2.
+                self.datapoints.append([float(datetime.datetime.fromtimestamp(tmid).strftime('%Y%m%d%H%M%S.%f')), tmid-self.dm.t0, i, vavg, sampleT, targetT, vpos, vneg, tpos-self.dm.t0, tneg-self.dm.t0, holderT, spareT])
                 if self.sequenceRunning:
                     self.log_signal.emit('SequenceUpdate', 'Measuring Tc (T = {:3.2f} v+ = {:3.3e} v- = {:3.3e} vavg = {:3.3e}) /{}/{}'.format(sampleT, vpos, vneg, vavg, numpy.abs(stopT-startT)-numpy.abs(sampleT-stopT), numpy.abs(stopT-startT)))
                 else:
@@ -197,7 +342,7 @@ class TaskManager(QObject):
             
             self.connectFourPointProbe(connected=False, current_source=HARDWARE_PARAMETERS['LABEL_LS121'])
 
-            if ((self.datapoints is not []) & self.acquiring):
+            if (len(self.datapoints) > 0) and self.acquiring:
                 tData = numpy.transpose(self.datapoints)  # 3 is voltage, 4 is sample temperature
                 tc, _ = self.dm.fitTcMeasurement(tData[3], tData[4], tag)
                 
@@ -215,8 +360,25 @@ class TaskManager(QObject):
 
             tData = numpy.transpose(self.datapoints)
             self.log_signal.emit('Tc', 'Tc = {:4.2f} K, {}'.format(tc, tag))
+            self.reportCancelLatency('MeasureTc', since=startTime)
 
 
+    def triggerLinkEnabled(self):
+        return self.useDMM and (self.preferences['trigger_link'] in ('hardware', 'software'))
+
+    @tracing.traced('task')
+    def readTransportPair(self):
+        '''
+            readTransportPair returns the sample voltage and transport current of one measurement point.
+            When trigger_link is enabled both values come from a single synchronized trigger of the models
+            armed by measureIc, otherwise they are read one after the other.
+        '''
+        if self.triggerLinkEnabled():
+            i, v = self.hm.readArmedPair(mode=self.preferences['trigger_link'])
+            return v, i
+        return self.hm.getVoltageReading(), self.hm.getCurrentReading(useDMM=self.useDMM)
+
+    @tracing.traced('task')
     def measureIc(self, rampStart=0, iStep=0.1, maxV=1e-5, currentSource=HARDWARE_PARAMETERS['LABEL_CS100A'], tag='Pristine', vb=True):
         '''
             Performs Ic measurement. Requests fitting and data output from datamanager object,
@@ -229,12 +391,13 @@ class TaskManager(QObject):
             tag       - (string) Data file label
             vb        - (bool) Verbose enables printouts for debugging
         '''
+        startTime = clock.now()
         self.connectFourPointProbe(connected=True, current_source=currentSource)
         
         try:
             self.datapoints, self.acquiring = [], True
             v, iRequest, control_voltage = 0, 0, 0
-            self.hm.setVoltageOffset() # needs to come after acquiring is set to True to avoid conflicts
+            self.prepareVoltageOffset() # needs to come after acquiring is set to True to avoid conflicts
             
             if rampStart > 10: # Ramp the power in steps slowly to avoid "tail lifting" in IV curve due to induction
                 while (self.acquiring) and (iRequest < rampStart) and (control_voltage is not numpy.nan) and (abs(v) < maxV):
@@ -242,20 +405,29 @@ class TaskManager(QObject):
                     v = self.hm.getVoltageReading()
                     iRequest += 0.2*rampStart
             
-            v, i, iRequest = 0, 0.0, rampStart
-            while(self.acquiring and (abs(v) < maxV) and (iRequest < self.maxI) and (control_voltage != numpy.nan)):
-                
-                control_voltage = self.hm.setLargeCurrent(iRequest, currentSource=currentSource, vb=vb)
-                time.sleep(.3)
-                sampleT, targetT, holderT, spareT = self.dm.getLatestValue('Sample Temperature'), self.dm.getLatestValue('Target Temperature'), self.dm.getLatestValue('Holder Temperature'), self.dm.getLatestValue('Spare Temperature')
-                v = self.hm.getVoltageReading()
-                i = self.hm.getCurrentReading(useDMM=self.useDMM)
-                self.datapoints.append([float(datetime.datetime.now().strftime('%Y%m%d%H%M%S.%f')), time.time()-self.dm.t0, i, v, sampleT, targetT, holderT, spareT])
-                iRequest += iStep
-                if self.sequenceRunning:
-                    pass # In the future we will add sequence updates
-                else:
-                    print('i = {:<4.3f}A, v = {:<4.3e}V, v_control={:<4.3e}, next_request={:<4.3e}'.format(i, v, control_voltage, iRequest))
+            if self.triggerLinkEnabled(): # configured once per IV after the pre-ramp, which reads the voltage on its own; disarmed in finally
+                self.hm.armTriggerLink(mode=self.preferences['trigger_link'])
+            
+            if self.preferences['ic_hardware_timed'] and (currentSource == HARDWARE_PARAMETERS['LABEL_CS100A']):
+                self.rampHardwareTimed(rampStart, iStep, maxV, vb=vb)
+            else:
+                v, i, iRequest = 0, 0.0, rampStart
+                while(self.acquiring and (abs(v) < maxV) and (iRequest < self.maxI) and (control_voltage != numpy.nan)):
+                    
+                    control_voltage = self.hm.setLargeCurrent(iRequest, currentSource=currentSource, vb=vb)
+                    settleEnd = clock.now()+.3
+                    while self.acquiring and (clock.now() < settleEnd): # a stop meant for something else cuts the wait short
+                        self.stopToken.wait(settleEnd-clock.now(), until=lambda: not self.acquiring)
+                    if not self.acquiring: # stopped while the current settled, the point is discarded
+                        break
+                    sampleT, targetT, holderT, spareT = self.dm.getLatestValue('Sample Temperature'), self.dm.getLatestValue('Target Temperature'), self.dm.getLatestValue('Holder Temperature'), self.dm.getLatestValue('Spare Temperature')
+                    v, i = self.readTransportPair()
+                    self.datapoints.append([float(datetime.datetime.now().strftime('%Y%m%d%H%M%S.%f')), clock.now()-self.dm.t0, i, v, sampleT, targetT, holderT, spareT])
+                    iRequest += iStep
+                    if self.sequenceRunning:
+                        pass # In the future we will add sequence updates
+                    else:
+                        print('i = {:<4.3f}A, v = {:<4.3e}V, v_control={:<4.3e}, next_request={:<4.3e}'.format(i, v, control_voltage, iRequest))
             
             if self.datapoints: # [] is False
                 data = numpy.transpose(self.datapoints)
@@ -274,14 +446,67 @@ class TaskManager(QObject):
             print('TaskManager::measureIc raised: ', e)
             
         finally:
+            if self.triggerLinkEnabled():
+                self.hm.disarmTriggerLink()
             self.connectFourPointProbe(connected=False, current_source=currentSource)
             self.datapoints = [] # datapoints must be erased to avoid showing the previous measurement at the start of the next.
+            self.reportCancelLatency('MeasureIc', since=startTime)
             if not self.sequenceRunning: # in case the measurement was requested by the GUI not by a sequence.
                 self.log_signal.emit('nextIV', tag)
 
+    @tracing.traced('task')
+    def rampHardwareTimed(self, rampStart, iStep, maxV, vb=True):
+        '''
+            rampHardwareTimed plays the whole current ramp of the 100 A source as a hardware-paced DAQ scan.
+            Each step lasts ic_step_dwell seconds; the voltage and the current of step k are both read
+            ic_read_delay seconds after the scheduled start of the step, so every point has the same timing.
+            A point is kept only if the DAQ held step k on the output before and after its reads. The scan is
+            stopped and the output set to zero as soon as the reads fall behind the waveform or maxV is reached,
+            so the current never keeps rising on stale readings.
+
+            INPUTS
+            ---------
+            rampStart - (float) Starting value of current ramp
+            iStep     - (float) Current ramp step in amps
+            maxV      - (float) Voltage at which the current ramp is terminated
+        '''
+        currents = numpy.arange(rampStart, self.maxI, iStep)
+        ramp = self.hm.startHardwareRamp(currents, dwell=self.preferences['ic_step_dwell'], simulated=self.preferences['daq_simulated'])
+        if ramp is None:
+            self.log_signal.emit('Exception', 'TaskManager::rampHardwareTimed could not start the DAQ scan')
+            return
+        
+        try:
+            v, k = 0, 0
+            while self.acquiring and (not ramp.stopped) and (k < len(ramp.currents)):
+                onTime = ramp.waitForStep(k, delay=self.preferences['ic_read_delay'])
+                if not (onTime and ramp.isOnStep(k)):
+                    ramp.stop()
+                    self.log_signal.emit('Exception', 'Ic ramp stopped at {:4.2f} A: the reads fell behind the DAQ scan, consider a longer ic_step_dwell'.format(ramp.currents[k]))
+                    break
+                sampleT, targetT, holderT, spareT = self.dm.getLatestTemperatureReading()
+                t = clock.now()
+                v, i = self.readTransportPair()
+                onStep = ramp.isOnStep(k)
+                if (abs(v) >= maxV) or not onStep:
+                    ramp.stop()
+                if not onStep: # the reads may mix step k and step k+1, the point is discarded
+                    self.log_signal.emit('Exception', 'Ic ramp stopped at {:4.2f} A: the reads of the step overran it, consider a longer ic_step_dwell'.format(ramp.currents[k]))
+                    break
+                self.datapoints.append([float(datetime.datetime.fromtimestamp(t).strftime('%Y%m%d%H%M%S.%f')), t-self.dm.t0, i, v, sampleT, targetT, holderT, spareT])
+                if vb and not self.sequenceRunning:
+                    print('i = {:<4.3f}A, v = {:<4.3e}V, v_control={:<4.3e}, step {}/{}'.format(i, v, ramp.controlVoltages[k], k+1, len(ramp.currents)))
+                k += 1
+        finally:
+            ramp.stop()
+            if ramp.overruns > 0:
+                print('TaskManager::rampHardwareTimed: reads overran {} of {} steps, consider a longer ic_step_dwell'.format(ramp.overruns, k))
+
+    @tracing.traced('task')
     def measureVt(self, maxV=1e-5, current_source=HARDWARE_PARAMETERS['LABEL_CS100A'], hall_measurement=False, tag='Pristine'):
         """
-            Performs voltage vs time measurement.
+            Performs voltage vs time measurement. The datapoints are streamed to disk while they are
+            acquired (see DataManager.openMeasurementStream); only the tail used by the live plot is kept in memory.
             
             @params
             tStep (float): Sampling period in seconds
@@ -289,7 +514,9 @@ class TaskManager(QObject):
             tag (string) Data file label
             hall_measurement (bool) - whether to connect the current source to the hall sensor or the four point probe
         """
+        startTime = clock.now()
         self.connectFourPointProbe(connected=True, current_source=current_source)
+        self.vtStream, i = self.dm.openMeasurementStream(measurement='Vt', tag=tag), 0.
 
         try:
             if maxV == 0.: maxV = numpy.inf
@@ -301,30 +528,99 @@ class TaskManager(QObject):
                 self.hm.setVoltageOffset() # needs to come after acquiring is set to True to avoid conflicts
                 self.hm.setSmallCurrent(100e-3)
             else:
-                self.hm.setVoltageOffset() # needs to come after acquiring is set to True to avoid conflicts
+                self.prepareVoltageOffset() # needs to come after acquiring is set to True to avoid conflicts
 
-            while(self.acquiring and (abs(v) < maxV)):
-                t, v, i, sampleT, targetT, holderT, spareT = time.time()-self.dm.t0, self.hm.getVoltageReading(removeOffset=True), self.hm.getCurrentReading(useDMM=self.useDMM), self.dm.getLatestValue('Sample Temperature'), self.dm.getLatestValue('Target Temperature'), self.dm.getLatestValue('Holder Temperature'), self.dm.getLatestValue('Spare Temperature')
-                self.datapoints.append([float(datetime.datetime.now().strftime('%Y%m%d%H%M%S.%f')), t, i, v, sampleT, targetT, holderT, spareT])
+            if self.triggerLinkEnabled():
+                self.measureVtSynchronized(maxV)
             
-            tData = numpy.transpose(self.datapoints)
-            tmax = tData[4][-1]
+            while(self.acquiring and (abs(v) < maxV) and not self.triggerLinkEnabled()):
+                t, v, i, sampleT, targetT, holderT, spareT = clock.now()-self.dm.t0, self.hm.getVoltageReading(removeOffset=True), self.hm.getCurrentReading(useDMM=self.useDMM), self.dm.getLatestValue('Sample Temperature'), self.dm.getLatestValue('Target Temperature'), self.dm.getLatestValue('Holder Temperature'), self.dm.getLatestValue('Spare Temperature')
+                self.vtStream.append([float(datetime.datetime.now().strftime('%Y%m%d%H%M%S.%f')), t, i, v, sampleT, targetT, holderT, spareT])
+            
+            if self.vtStream.lastDatapoint is not None:
+                i = self.vtStream.lastDatapoint[2]
             
         except Exception as e:
-            tmax, self.acquiring = numpy.nan, False
+            self.acquiring = False
             self.log_signal.emit('Exception', 'TaskManager::measureVt raised: {}'.format(str(e)))
             
         finally:
+            if self.triggerLinkEnabled():
+                self.hm.disarmTriggerLink()
             self.connectFourPointProbe(connected=False, current_source=current_source)
-            self.log_signal.emit('Vt', 'TransportCurrent = {:4.2f}, Tavg = {:4.2f} K, {}'.format(i, tmax, tag))
+            self.vtStream.close()
+            self.log_signal.emit('Vt', 'TransportCurrent = {:4.2f}, Tavg = {:4.2f} K, {}'.format(i, self.vtStream.getAverageTemperature(), tag))
+            self.reportCancelLatency('MeasureVt', since=startTime)
+            
+    @tracing.traced('task')
+    def measureVtSynchronized(self, maxV):
+        """
+            measureVtSynchronized acquires the Vt trace in chunks of trigger_link_chunk synchronized pairs,
+            each chunk transferred from the DMM6500 and 2182A buffers in one read. The time of each pair
+            is the DMM buffer timestamp, so the pairs keep their spacing regardless of bus latency.
             
+            @params
+            maxV (float): Voltage at which the measurement is terminated
+        """
+        chunk, period, v = self.preferences['trigger_link_chunk'], self.preferences['trigger_link_period'], 0
+        while self.acquiring and (abs(v) < maxV):
+            t0 = clock.now()
+            sampleT, targetT, holderT, spareT = self.dm.getLatestTemperatureReading()
+            currents, voltages, times = self.hm.acquireSynchronizedPairs(chunk, mode=self.preferences['trigger_link'], period=period)
+            for i, v, dt in zip(currents, voltages, times):
+                t = t0 + (dt if not numpy.isnan(dt) else 0.)
+                self.vtStream.append([float(datetime.datetime.fromtimestamp(t).strftime('%Y%m%d%H%M%S.%f')), t-self.dm.t0, i, v, sampleT, targetT, holderT, spareT])
+            v = numpy.nanmax(numpy.abs(voltages)) if not numpy.all(numpy.isnan(voltages)) else 0
+
     def stopAcquiring(self):
         """
             stopAcquiring allows the user to stop a measurement in progress. 
-            The 'acquiring' attribute is switched to False, which breaks the measurement loop.
+            The 'acquiring' attribute is switched to False, which breaks the measurement loop,
+            and the stop token wakes any wait in progress so that the loop notices it right away.
         """
-        self.acquiring = False
+        self._acquiring = False
+        for state in list(self.branchStates):
+            state['acquiring'] = False
+        tracing.instant('stopAcquiring', 'task')
+        self.globalStopToken.cancel(reason='acquisition')
+        for state in list(self.branchStates):
+            state['stopToken'].cancel(reason='acquisition')
+        self.dm.wakeWaiters()
+
+    def stopSequence(self):
+        """
+            stopSequence stops the sequence in progress and the measurement it is running.
+        """
+        self.sequenceRunning = False
+        self.stopAcquiring()
+
+    def reportCancelLatency(self, step, since):
+        """
+            reportCancelLatency logs how long a step took to return after the user stopped it.
+            Nothing is recorded when the last stop happened before the step started.
+
+            @params
+            step (str): step type, latencies are kept per step type
+            since (float): epoch time at which the step started
+        """
+        cancelTime = self.globalStopToken.getCancelTime()
+        if (cancelTime is not None) and (cancelTime >= since):
+            latency = self.cancelLatency.record(step)
+            print('{} stopped {:4.2f} s after the stop request'.format(step, latency))
+            self.log_signal.emit('CancelLatency', '{} stopped {:4.2f} s after the stop request'.format(step, latency))
         
+    def setTracing(self, enabled=True):
+        tracing.enable(enabled)
+
+    def getTraceEvents(self):
+        '''
+            getTraceEvents returns the timeline of this process, the GUI calls it to export the events of the acquisition process.
+        '''
+        return tracing.getEvents(merged=False)
+
+    def getVtTail(self):
+        return self.vtStream.getTail() if self.vtStream is not None else []
+    
     def pushLastMeasurement(self):
         return self.datapoints, self.corrected_voltage
     
@@ -334,11 +630,12 @@ class TaskManager(QObject):
         else:
             self.hm.connectSampleTo100A(connected=True)
         self.hm.setLargeCurrent(0)
-        offset = self.hm.setVoltageOffset()
+        offset = self.prepareVoltageOffset()
         self.hm.setLargeCurrent(current)
         if logEvent:
             self.log_signal.emit('CurrentSet', 'HTS Current {:4.2f} A, Voltage Offset = {:4.4e}'.format(current, offset))
     
+    @tracing.traced('task')
     def warmup(self):
         '''
             warmup returns target temperature to 300 K
@@ -349,173 +646,307 @@ class TaskManager(QObject):
     
     def stabilize_magnetic_field(self, setpoint):
         self.hm.set_magnetic_field(setpoint)
-        while not self.hm.field_stable():
-            time.sleep(3)
+        reached = self.dm.waitUntil('Magnet Holding', lambda holding: holding == True, fresh=True, keepWaiting=lambda: self.acquiring | self.sequenceRunning)
+        if not reached and (self.acquiring or self.sequenceRunning):
+            self.log_signal.emit('Exception', 'TaskManager::stabilize_magnetic_field could not wait for {:4.2f} T, the magnet is not being read'.format(setpoint))
 
+    @tracing.traced('task')
     def stabilizeTemperature(self, setTemperature, rampRate=9., stabilizationTime=60, stabilizationMargin=.1, vb=False):
+        '''
+            stabilizeTemperature sets the temperature and waits until the PID sensor has settled (see SettlingEstimator).
+            The estimator ends the wait as soon as the fitted thermal response predicts less than settling_tolerance drift
+            over settling_horizon, or at the latest once the sensor stayed within stabilizationMargin for stabilizationTime.
+
+            RETURNS
+            ----------
+            settledSince (float) - epoch time since which the PID sensor is within stabilizationMargin, None without stabilization
+        '''
         if rampRate > 0:
             self.hm.rampTemperature(setTemperature, rampRate, ramping=True)
         else:
             self.hm.setTemperature(setTemperature)
         
+        settledSince = None
         if stabilizationTime > 0:
-            counter = stabilizationTime
-            pidSensor = self.hm.getPIDSensor()
+            pidSignal = PID_SENSOR_SIGNALS[self.hm.getPIDSensor()-1]
+            estimator = SettlingEstimator(setTemperature, margin=stabilizationMargin, holdTime=stabilizationTime, model=self.preferences['settling_model'],
+                                          window=self.preferences['settling_window'], horizon=self.preferences['settling_horizon'],
+                                          tolerance=self.preferences['settling_tolerance'], minPoints=self.preferences['settling_min_points'])
             
-            while (self.acquiring | self.annealing | self.sequenceRunning) and (counter > 0):
-                inputAT, inputBT, inputCT, inputDT = self.dm.getLatestTemperatureReading()
-                pidSensorT = [inputAT, inputBT, inputCT, inputDT][pidSensor-1] # A = 1, B = 2, C = 3, D = 4
-                if numpy.abs(setTemperature - pidSensorT) < stabilizationMargin:
-                    counter -= 1
-                    if vb:
-                        print('Stabilizing temperature. Remaining time: {:4.0f} s.'.format(counter))
-                else:
-                    counter = stabilizationTime
-                time.sleep(1.)
+            def settled(pidSensorT):
+                estimator.addSample(clock.now(), pidSensorT)
+                return estimator.isSettled()
+            
+            report = (lambda pidSensorT: print('Stabilizing temperature. PID sensor at {:4.2f} K, predicted drift {:4.3f} K.'.format(pidSensorT, estimator.drift))) if vb else None
+            start = clock.now()
+            if self.dm.waitUntil(pidSignal, settled, keepWaiting=lambda: self.acquiring | self.annealing | self.sequenceRunning, callback=report):
+                settledSince = estimator.insideSince
+                print('TaskManager::stabilizeTemperature settled at {:4.2f} K after {:4.0f} s'.format(setTemperature, clock.now()-start))
         
         if rampRate > 0:
             self.hm.rampTemperature(setTemperature, rampRate, ramping=False)
+        return settledSince
     
 
-    def runSequence(self, sequence):
-        move_step_index_highlight = True # This parameter is used to prevent loaded subsequences from increasing the index of the highlight in the run queue.
+    def compileSequence(self, items):
+        """
+            compileSequence parses and checks a sequence before it runs, see sequencecompiler.compileSequence.
+            The durations of the IVs measured in the session are used to estimate the MeasureIc steps.
+
+            @params
+            items (list): lines of the sequence and paths to subsequence files
+        """
+        try:
+            temperature = self.dm.getLatestValue('Sample Temperature')
+        except Exception:
+            temperature = numpy.nan
+        return compileSequence(items, CURRENT_SOURCES, ivDurations=self.dm.getMeasurementDurations('Ic'), temperature=temperature, warmupTemperature=self.warmupTemperature)
+
+    def getSequenceCheckpoint(self):
+        """
+            getSequenceCheckpoint returns the checkpoint of a sequence interrupted by a crash, a restart or an
+            exception, None if the last sequence completed or was stopped by the user.
+        """
+        return self.checkpoint.load()
+
+    def discardSequenceCheckpoint(self):
+        self.checkpoint.discard()
+
+    def resumeSequence(self):
+        """
+            resumeSequence runs the sequence of the checkpoint again, starting with the step that was interrupted.
+            Finished steps, finished IVs of a MeasureIc step and finished branches of a parallel group are skipped,
+            and the Label in use is restored.
+        """
+        state = self.checkpoint.load()
+        if state is None:
+            self.log_signal.emit('SequenceStopped', 'Stopped : No sequence to resume.')
+            return
+        try:
+            sequence = compileSequence(state['lines'], CURRENT_SOURCES, warmupTemperature=self.warmupTemperature)
+        except SequenceError as e:
+            self.log_signal.emit('InvalidSequence', 'Sequence not resumed:\n{}/0/0'.format(e))
+            self.log_signal.emit('SequenceStopped', 'Stopped : Sequence could not be resumed.')
+            return
+        for step, item in zip(sequence, state['stepItems']):
+            step.item = item
+        sequence.items = state['items']
+        self.runSequence(sequence, resume=state)
+
+    def runSequence(self, sequence, resume=None):
+        """
+            runSequence executes a compiled sequence step by step. A list of lines is compiled first, so a malformed
+            step stops the sequence before anything runs. The progress is recorded in a checkpoint after each step.
+
+            @params
+            sequence (list): CompiledSequence or SequenceStep objects, or lines of the sequence and paths to subsequence files
+            resume (dict): checkpoint to resume from, see resumeSequence
+        """
+        subsequenceDepth = 0 # the highlight of the run queue only moves for steps that are items of the list, not for the steps of loaded subsequences
+        status = 'failed'
         try:
             self.sequenceRunning, i = True, 0
-            self.log_signal.emit('SequenceStarted', 'Sequence started by user.')
-            commonLabel = ''
+            if sequence and isinstance(sequence[0], str):
+                sequence = self.compileSequence(sequence)
+            elif not isinstance(sequence, CompiledSequence):
+                sequence = CompiledSequence(list(sequence), [], 0., 0)
+            
+            self.sequenceLabel, self.resumeState, self.stepTimes = '', resume, []
+            if resume is None:
+                self.checkpoint.begin(sequence)
+                self.log_signal.emit('SequenceStarted', 'Sequence started by user.')
+            else:
+                i, self.sequenceLabel = resume['index'], resume['label']
+                subsequenceDepth = sum([1 if step.args['marker'] == 'start' else -1 for step in sequence[:i] if step.action == 'Subsequence'])
+                self.checkpoint.resume(resume)
+                self.log_signal.emit('SequenceStarted', 'Sequence resumed at step {} of {}.'.format(i+1, len(sequence)))
 
             while self.sequenceRunning and (i < len(sequence)):
-                params = sequence[i].split()
-                action = params[0]
-
-                if action == 'MeasureIc':
-                    nic, waitBetweenIVs = int(params[8]), int(params[14])
-                    for n in range(nic):
-                        self.measureIc(currentSource=params[-1], rampStart=float(params[18]), iStep=float(params[21]), maxV=float(params[25])*1e-6, tag=params[4]+'-'+commonLabel, vb=True)
-                        if self.sequenceRunning:
-                            self.log_signal.emit('SequenceUpdate', 'Ic measurement /{}/{}'.format(n+1, nic))
-                            time.sleep(waitBetweenIVs) # there must be a delay to write the data to file
-                        else:
-                            self.log_signal.emit('SequenceUpdate', 'Ic measurements stopped by user /{}/{}'.format(n+1, nic))
-                            break
-                    if self.sequenceRunning:
-                        self.log_signal.emit('SequenceUpdate', 'Ic measurements completed! /{}/{}'.format(n+1, nic))
-                    
-                elif action == 'MeasureTc':
-                    self.log_signal.emit('SequenceUpdate', 'Tc measurement started /{}/{}'.format(0, 100))
-                    self.measureTc(startT=float(params[8]), rampRate=float(params[15]), stopT=float(params[12]), transportCurrent=1e-3*float(params[19]), tag=params[4]+'-'+commonLabel)
-                    time.sleep(5)
-                    if self.sequenceRunning:
-                        self.log_signal.emit('SequenceUpdate', 'Tc measurement complete! /{}/{}'.format(100, 100))
-                    else:
-                        self.log_signal.emit('SequenceUpdate', 'Tc measurement stopped by user! /{}/{}'.format(100, 100))
+                step, stepStart = sequence[i], clock.now()
+                action = step.action
+                self.currentStep = (i, action)
+
+                if action == 'Subsequence':
+                    subsequenceDepth += 1 if step.args['marker'] == 'start' else -1
+                    highlight = (subsequenceDepth == 0)
+
+                elif action == 'Parallel':
+                    highlight = (subsequenceDepth == 0)
+                    if step.args['marker'] == 'start':
+                        end = step.args['end']
+                        self.log_signal.emit('SequenceUpdate', ('*' if highlight else '')+action+'(Complete) /0/100')
+                        self.runParallelSteps(sequence[i+1:end], firstIndex=i+1, highlight=highlight)
+                        i = end # continues with the stop marker
 
-                elif action == 'setField':
-                    self.log_signal.emit('SequenceUpdate', 'Set Field /{}/{}'.format(0, 100))
-                    if self.sequenceRunning:
-                        self.stabilize_magnetic_field(setpoint=float(params[1]))
-
-                elif action == 'SetTemperature':
-                    self.log_signal.emit('SequenceUpdate', 'Set Temperature /{}/{}'.format(0, 100))
-                    self.stabilizeTemperature(setTemperature=float(params[4]), rampRate=float(params[16]), stabilizationTime=int(params[12]), stabilizationMargin=float(params[8]), vb=False)
-                    deltaT = 0
-                    pidSensor = self.hm.getPIDSensor()
-                    deltaT = []
-                    for j in range(30):
-                        inputAT, inputBT, inputCT, inputDT = self.dm.getLatestTemperatureReading()
-                        pidSensorT = [inputAT, inputBT, inputCT, inputDT][pidSensor-1] # A = 1, B = 2, C = 3, D = 4
-                        deltaT.append(inputAT-pidSensorT)
-                        if self.sequenceRunning:
-                            time.sleep(1)
-                        else:
-                            break
-                    if self.sequenceRunning:
-                        self.stabilizeTemperature(setTemperature=pidSensorT-numpy.nanmean(deltaT), rampRate=0, stabilizationTime=int(params[12])/2, stabilizationMargin=float(params[8]), vb=False)
-
-                elif action == 'Wait':
-                    waitTime, t = int(params[1]), 0
-
-                    try:
-                        threshold, current = float(params[5]), self.dm.getLatestValue('pressure')
-                    except Exception as e:
-                        threshold, current = 2e3, 0
-
-                    while (t < waitTime+1) | (current > threshold):
-                        current = self.dm.getLatestValue('pressure')
-                        if self.sequenceRunning:
-                            if t < waitTime+1:
-                                time.sleep(1)
-                                t+=1
-                                self.log_signal.emit('SequenceUpdate', 'Seconds elapsed {} of {} /{}/{}'.format(t, waitTime, t, waitTime))
-                            else:
-                                time.sleep(3)
-                                self.log_signal.emit('SequenceUpdate', 'Waiting for pressure threshold {} torr, current {} torr /{}/{}'.format(threshold, current, t, waitTime))
-                        else:
-                            self.log_signal.emit('SequenceUpdate', 'Wait canceled by user. Seconds elapsed /{}/{}'.format(t, waitTime))
-                            break
-                elif action == 'TriggerRelays':
-                    if params[2] == 'On':
-                        self.hm.setCooler(on=True)
-                    else:
-                        self.hm.setCooler(on=False)
-                    if params[5] == 'On':
-                        self.hm.insertFaradayCup(inserted=True)
-                    else:
-                        self.hm.insertFaradayCup(inserted=False)
-                    if params[8] == 'On':
-                        self.hm.openGateValve(opened=True)
-                    else:
-                        self.hm.openGateValve(opened=False)
-
-                elif action == 'Label':
-                    commonLabel = params[1]
-
-                elif action == 'Warmup':
-                    self.warmup()
-                    self.log_signal.emit('SequenceUpdate', 'Warming up the system /{}/{}'.format(self.dm.getLatestValue('Target Temperature'), int(self.warmupTemperature)))
-                            
-                    while (self.dm.getLatestValue('Sample Temperature') < self.warmupTemperature):
-                        if self.sequenceRunning:
-                            time.sleep(1)
-                        else:
-                            break
-
-                elif action == 'Subsequence':
-                    if params[-1] == 'start':
-                        move_step_index_highlight = False
-                    else:
-                        move_step_index_highlight = True
-
-                elif action == 'Play':
-                    if params[-1] == 'Whoop!':
-                        playsound('sounds/proud-fart-288263.mp3')
-                    elif params[-1] == 'Everybody remain calm! The reactor is melting!':
-                        playsound('sounds/proud-fart-288263.mp3')
-                    elif params[-1] == 'What about the neutrons?':
-                        playsound('sounds/proud-fart-288263.mp3')
-                    elif params[-1] == 'It s a trap!': 
-                        playsound('sounds/proud-fart-288263.mp3')
                 else:
-                    self.log_signal.emit('InvalidStep', 'Step {} in Sequence {} is not a valid action.'.format(i, 'SequenceName'))
+                    highlight = (subsequenceDepth == 0)
+                    with tracing.span(action, 'step', index=i, label=self.sequenceLabel, line=step.line, estimate=step.duration):
+                        self.runSequenceStep(step, index=i)
                 
                 i += 1
+                self.stepTimes.append((sequence[i-1], clock.now()-stepStart))
+                if self.sequenceRunning:
+                    self.checkpoint.update(index=i, label=self.sequenceLabel)
+                else:
+                    self.reportCancelLatency('Sequence'+action, since=stepStart)
                 
-                if move_step_index_highlight:
+                if highlight:
                     self.log_signal.emit('SequenceUpdate', '*'+action+'(Complete) /0/100')
                 else:
                     self.log_signal.emit('SequenceUpdate', action+'(Complete) /0/100')
 
+            status = 'completed' if self.sequenceRunning else 'stopped'
+
+        except SequenceError as e:
+            self.log_signal.emit('InvalidSequence', 'Sequence not started:\n{}/0/0'.format(e))
+            print(e)
+
         except Exception as e:
             self.log_signal.emit('Exception', 'Exception while running sequence {} step {}:\n{}/0/0'.format('SequenceName', i, e))
             print(e)
 
         finally:
+            self.checkpoint.finish(status) # a failed sequence can be resumed once the problem is fixed
+            self.resumeState, self.currentStep = None, None
             if self.sequenceRunning:
                 self.sequenceRunning = False
                 self.log_signal.emit('SequenceStopped', 'Stopped : Sequence completed sucessfully!')
             else:
                 self.log_signal.emit('SequenceStopped', 'Stopped : Sequence stopped by user.')
 
+    def runParallelSteps(self, steps, firstIndex, highlight=True):
+        """
+            runParallelSteps runs each step of a parallel group in its own thread and returns once all of them
+            are done. Each branch holds the locks of the instruments it uses (SequenceStep.resources), acquired in a
+            fixed order so that branches cannot deadlock, and has its own acquiring flag and stop token (see acquiring).
+            The first exception raised by a branch is raised again once all branches have returned.
+
+            @params
+            steps (list): SequenceStep objects of the group, between the start and stop markers
+            firstIndex (int): index of the first step of the group in the sequence, branches already done according to the checkpoint are skipped
+            highlight (bool): advance the highlight of the run queue as each branch completes
+        """
+        errors = []
+        done = self.resumeState['parallelDone'] if self.resumeState is not None else []
+
+        def branch(index, step):
+            locks = [self.resourceLocks[resource] for resource in sorted(step.resources)]
+            self.branch.state = {'acquiring': False, 'stopToken': CancellationToken()}
+            self.branchStates.append(self.branch.state)
+            try:
+                for lock in locks:
+                    lock.acquire()
+                if self.sequenceRunning and (index not in done):
+                    with tracing.span(step.action, 'step', index=index, label=self.sequenceLabel, line=step.line, estimate=step.duration, parallel=True):
+                        self.runSequenceStep(step, index=index)
+                    if self.sequenceRunning:
+                        self.checkpoint.parallelStepDone(index)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+                self.branchStates.remove(self.branch.state)
+                self.branch.state = None
+                self.log_signal.emit('SequenceUpdate', ('*' if highlight else '')+step.action+'(Complete) /0/100')
+
+        threads = [threading.Thread(target=branch, args=(firstIndex+k, step), name='SequenceBranch{}'.format(firstIndex+k), daemon=True) for k, step in enumerate(steps)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def runSequenceStep(self, step, index=0):
+        """
+            runSequenceStep executes one step of a sequence.
+
+            @params
+            step (SequenceStep): compiled step, see sequencecompiler
+            index (int): position of the step in the sequence, used in messages
+        """
+        action, args = step.action, step.args
+
+        if action == 'MeasureIc':
+            nic, first = args['repeats'], 0
+            if self.resumeState is not None: # IVs measured before the interruption
+                first = self.resumeState['repeatsDone'].get(str(index), 0)
+            n = first-1
+            for n in range(first, nic):
+                self.measureIc(currentSource=args['currentSource'], rampStart=args['rampStart'], iStep=args['iStep'], maxV=args['maxV']*1e-6, tag=args['label']+'-'+self.sequenceLabel, vb=True)
+                if self.sequenceRunning:
+                    self.checkpoint.repeatDone(index, n+1)
+                    self.log_signal.emit('SequenceUpdate', 'Ic measurement /{}/{}'.format(n+1, nic))
+                    self.stopToken.wait(args['wait'], until=lambda: not self.sequenceRunning) # there must be a delay to write the data to file
+                else:
+                    self.log_signal.emit('SequenceUpdate', 'Ic measurements stopped by user /{}/{}'.format(n+1, nic))
+                    break
+            if self.sequenceRunning:
+                self.log_signal.emit('SequenceUpdate', 'Ic measurements completed! /{}/{}'.format(n+1, nic))
+
+        elif action == 'MeasureTc':
+            self.log_signal.emit('SequenceUpdate', 'Tc measurement started /{}/{}'.format(0, 100))
+            self.measureTc(startT=args['startT'], rampRate=args['rampRate'], stopT=args['stopT'], transportCurrent=1e-3*args['transportCurrent'], tag=args['label']+'-'+self.sequenceLabel)
+            self.stopToken.wait(5, until=lambda: not self.sequenceRunning)
+            if self.sequenceRunning:
+                self.log_signal.emit('SequenceUpdate', 'Tc measurement complete! /{}/{}'.format(100, 100))
+            else:
+                self.log_signal.emit('SequenceUpdate', 'Tc measurement stopped by user! /{}/{}'.format(100, 100))
+
+        elif action == 'setField':
+            self.log_signal.emit('SequenceUpdate', 'Set Field /{}/{}'.format(0, 100))
+            if self.sequenceRunning:
+                self.stabilize_magnetic_field(setpoint=args['field'])
+
+        elif action == 'SetTemperature':
+            self.log_signal.emit('SequenceUpdate', 'Set Temperature /{}/{}'.format(0, 100))
+            settledSince = self.stabilizeTemperature(setTemperature=args['temperature'], rampRate=args['rampRate'], stabilizationTime=args['stabilizationTime'], stabilizationMargin=args['margin'], vb=False)
+            # the sample to PID sensor gradient is averaged over the readings stored since the PID sensor settled
+            inputs = self.dm.getTemperatureReadingsSince(settledSince if settledSince is not None else clock.now()-30)
+            pidSensorTs = inputs[self.hm.getPIDSensor()-1] # A = 1, B = 2, C = 3, D = 4
+            deltaT, pidSensorT = inputs[0]-pidSensorTs, pidSensorTs[-1]
+            if self.sequenceRunning:
+                self.stabilizeTemperature(setTemperature=pidSensorT-numpy.nanmean(deltaT), rampRate=0, stabilizationTime=args['stabilizationTime']/2, stabilizationMargin=args['margin'], vb=False)
+
+        elif action == 'Wait':
+            waitTime, threshold, t, waitStart = int(args['seconds']), args['threshold'], 0, clock.now()
+
+            while self.sequenceRunning and (t < waitTime+1):
+                self.stopToken.wait(1, until=lambda: not self.sequenceRunning)
+                t = int(clock.now()-waitStart) # a stop meant for something else cuts a tick short
+                self.log_signal.emit('SequenceUpdate', 'Seconds elapsed {} of {} /{}/{}'.format(t, waitTime, t, waitTime))
+
+            if self.sequenceRunning and (threshold is not None):
+                report = lambda current: self.log_signal.emit('SequenceUpdate', 'Waiting for pressure threshold {} torr, current {} torr /{}/{}'.format(threshold, current, t, waitTime))
+                self.dm.waitUntil('pressure', lambda current: current <= threshold, keepWaiting=lambda: self.sequenceRunning, callback=report)
+            if not self.sequenceRunning:
+                self.log_signal.emit('SequenceUpdate', 'Wait canceled by user. Seconds elapsed /{}/{}'.format(t, waitTime))
+
+        elif action == 'TriggerRelays':
+            self.hm.setCooler(on=args['cooler'])
+            self.hm.insertFaradayCup(inserted=args['faradayCup'])
+            self.hm.openGateValve(opened=args['gateValve'])
+
+        elif action == 'Label':
+            self.sequenceLabel = args['label']
+            self.checkpoint.update(label=self.sequenceLabel)
+
+        elif action == 'Warmup':
+            self.warmup()
+            self.log_signal.emit('SequenceUpdate', 'Warming up the system /{}/{}'.format(self.dm.getLatestValue('Target Temperature'), int(self.warmupTemperature)))
+
+            self.dm.waitUntil('Sample Temperature', lambda sampleT: sampleT >= self.warmupTemperature, keepWaiting=lambda: self.sequenceRunning)
+
+        elif action == 'Play':
+            from playsound import playsound # only sequences that play a sound need it
+            playsound('sounds/proud-fart-288263.mp3')
+
+        else:
+            self.log_signal.emit('InvalidStep', 'Step {} in Sequence {} is not a valid action.'.format(index, 'SequenceName'))
+
+
+    @tracing.traced('task')
     def calibrate100ACurrentSource(self, currentRangeUpperLimit):
         shuntR = self.hm.getShuntResistance()
 
@@ -0,0 +1,200 @@
+import os, json, time, atexit, inspect, datetime, functools, threading, collections, multiprocessing
+
+'''
+    Timeline tracing.
+
+    span opens a named interval in the current thread, e.g.
+
+        with tracing.span('fitIcMeasurement', 'analysis', points=len(current)):
+            ...
+
+    and traced does the same for a whole function. The measurements, the sequence steps, the sleeps, the bus I/O
+    (see IOMetrics), the fits and saves of the DataManager and the plot updates are traced, so that the timeline of
+    one IV shows where its wall time goes and what overlaps what. The intervals are exported in the Chrome trace
+    event format, which chrome://tracing and ui.perfetto.dev open: one row per thread, the arguments of each span
+    (device, step, tag, ...) shown when it is selected.
+
+    Tracing is off unless the HTS_TRACE environment variable is set (see main.py --trace); while it is off a span
+    costs a function call. The events are kept in memory, the oldest dropped past MAX_EVENTS; they are written with export,
+    at exit with --trace, and from the GUI with Ctrl+T, which also collects the events of the acquisition process.
+
+    @author Alexis Devitre devitre@mit.edu
+    @lastModified October 2026
+'''
+
+MAX_EVENTS = 500000
+EPOCH_OFFSET = time.time()-time.perf_counter() # timestamps are epoch based so that the events of the processes line up
+
+_enabled = False
+_events = collections.deque(maxlen=MAX_EVENTS)
+_threads = {} # native thread id: name
+_merged = []  # events of the other processes, see merge
+
+
+def now():
+    '''
+        RETURNS
+        ----------
+        timestamp (float) - microseconds since the epoch, with the resolution of perf_counter
+    '''
+    return (time.perf_counter()+EPOCH_OFFSET)*1e6
+
+def record(name, category, start, duration, args):
+    '''
+        record stores an event of the current thread, start and duration are in microseconds. An event without
+        duration is an instant.
+    '''
+    thread = threading.current_thread()
+    tid = thread.native_id
+    if tid not in _threads: # threads started by Qt, e.g. those of the executors, are named Dummy-n by threading
+        _threads[tid] = 'QThread {}'.format(tid) if thread.name.startswith('Dummy-') else thread.name
+    if duration is None:
+        _events.append({'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': start, 'pid': os.getpid(), 'tid': tid, 'args': args})
+    else:
+        _events.append({'name': name, 'cat': category, 'ph': 'X', 'ts': start, 'dur': duration, 'pid': os.getpid(), 'tid': tid, 'args': args})
+
+
+class Span:
+    '''
+        Span is the context manager returned by span while tracing is on.
+    '''
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name, category, args):
+        self.name, self.category, self.args = name, category, args
+
+    def set(self, **args):
+        '''
+            set adds arguments known only once the span is running, e.g. the number of points measured.
+        '''
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = now()
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        if excType is not None:
+            self.args['exception'] = repr(exc)
+        record(self.name, self.category, self.start, now()-self.start, self.args)
+        return False
+
+
+class NullSpan:
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        return False
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, category='task', **args):
+    '''
+        INPUTS
+        ----------
+        name (str) - name of the interval on the timeline
+        category (str) - task, step, telemetry, hardware, sleep, wait, io, lock, analysis, file or gui
+        **args - metadata of the span, e.g. device, step, tag
+
+        RETURNS
+        ----------
+        span (Span) - context manager, a shared no-op when tracing is off
+    '''
+    return Span(name, category, args) if _enabled else NULL_SPAN
+
+def traced(category='task', name=None):
+    '''
+        traced is a decorator that wraps each call of the function in a span named after it. The arguments of the
+        call that are numbers, strings or booleans are the metadata of the span.
+    '''
+    def decorator(fn):
+        label, signature = name or fn.__name__, inspect.signature(fn)
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            try:
+                bound = signature.bind(*args, **kwargs).arguments
+            except TypeError: # the call itself will raise
+                bound = {}
+            with Span(label, category, {key: value for key, value in bound.items() if isinstance(value, (str, int, float, bool))}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def complete(name, category, seconds, **args):
+    '''
+        complete records an interval that ended now and lasted seconds, for the calls that are timed elsewhere.
+    '''
+    if _enabled:
+        end = now()
+        record(name, category, end-1e6*seconds, 1e6*seconds, args)
+
+def instant(name, category='task', **args):
+    '''
+        instant records an event without duration, e.g. a cancel.
+    '''
+    if _enabled:
+        record(name, category, now(), None, args)
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+def isEnabled():
+    return _enabled
+
+def clear():
+    _events.clear()
+    del _merged[:]
+
+def merge(events):
+    '''
+        merge keeps the events of another process, they are exported with those of this process. The GUI merges the
+        events of the acquisition process before it stops.
+    '''
+    _merged.extend(events)
+
+def getEvents(merged=True):
+    '''
+        RETURNS
+        ----------
+        events (list) - the events of this process, preceded by the names of the process and of its threads, followed
+                        by the merged events of the other processes if merged is True
+    '''
+    process = multiprocessing.current_process().name
+    events = [{'name': 'process_name', 'ph': 'M', 'pid': os.getpid(), 'tid': 0, 'args': {'name': '{} ({})'.format(process, os.getpid())}}]
+    events += [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}} for tid, name in list(_threads.items())]
+    return events + list(_events) + (_merged if merged else [])
+
+def export(path, events=None):
+    '''
+        export writes events in the Chrome trace event format.
+
+        INPUTS
+        ----------
+        path (str) - JSON file, overwritten
+        events (list) - events to write, those of this process by default, see getEvents
+
+        RETURNS
+        ----------
+        count (int) - number of events written
+    '''
+    events = getEvents() if events is None else events
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'exported': str(datetime.datetime.now())}}, f, default=str)
+    return len(events)
+
+def exportAtExit():
+    path = os.environ.get('HTS_TRACE')
+    if _enabled and path and (multiprocessing.parent_process() is None): # the acquisition process hands its events to the GUI
+        print('Trace of {} events written to {}'.format(export(path), path))
+
+if os.environ.get('HTS_TRACE'):
+    enable()
+    atexit.register(exportAtExit)
@@ -0,0 +1,295 @@
+'''
+
+    A synthetic corpus of Ic and Tc measurements and a benchmark of the fitting routines.
+
+    generateCorpus writes Ic_*.txt and Tc_*.txt files in the format saved by the GUI (mit), with known Ic, n and Tc,
+    a linear background, gaussian noise and, for some files, a reverse bias. benchmarkFitting runs every fitting path
+    on the corpus and reports the throughput (files per second) and the error on the recovered parameters.
+
+        python hts_fitbenchmark.py corpus/ --count 2000 --output results.json
+
+    @author Alexis Devitre (devitre@mit.edu)
+    @modified 2026/10/19
+'''
+import os, sys, json, time, datetime, warnings, argparse
+
+import numpy as np
+import pandas as pd
+from scipy.special import erf
+
+import hts_fitting as hts
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gui', 'src'))
+import fittingFunctions
+
+MIT_HEADER = '#{:30}  {:6}  {:20}  {:20}  {:6}  {:6}  {:6}  {:6}'.format('datetime', 't_s', 'iHTS_A', 'vHTS_V', 'tHTS_K', 'tTAR_K', 'tHOL_K', 'tSPA_K')
+MIT_ROW = '\n{:<30}  {:6.2f}  {:20.8e}  {:20.8e}  {:6.4f}  {:6.4f}  {:6.4f}  {:6.4f}'
+
+
+########################################################################################
+########################################################################################
+######################## SYNTHETIC IV & TV MEASUREMENTS ################################
+########################################################################################
+########################################################################################
+
+
+def writeMeasurementFile(fpath, header, t0, times, current, voltage, sampleT, targetT):
+    '''
+        writeMeasurementFile writes a measurement with the header and columns of DataManager.saveMeasurementToFile.
+    '''
+    with open(fpath, 'w') as f:
+        f.write(header+'\n')
+        f.write(MIT_HEADER)
+        for t, i, v, ts, tt in zip(times, current, voltage, sampleT, targetT):
+            stamp = str(t0+datetime.timedelta(seconds=float(t))).replace(' ', '_')
+            f.write(MIT_ROW.format(stamp, t, i, v, ts, tt, ts, tt))
+
+def getFileName(measurement, t0, tag):
+    return '{}_{}_{}.txt'.format(measurement, str(t0).replace(' ', '_').replace(':', '-').replace('.', ''), tag)
+
+def generateIV(ic, n, vc=2e-7, iStep=.5, maxV=1e-5, background=(0., 0.), noise=5e-8, reverse=False, temperature=20., rng=None):
+    '''
+        generateIV simulates the points of an Ic measurement: the current is ramped by iStep until the voltage exceeds maxV.
+
+        INPUTS
+        ---------------
+        ic, n (float)       - critical current in A and n-value of the power law
+        vc (float)          - voltage criterion in V
+        background (tuple)  - slope in V/A and offset in V of the linear background
+        noise (float)       - standard deviation of the voltage noise in V
+        reverse (bool)      - the current was run in reverse, the voltage is negative
+        temperature (float) - sample temperature in K
+
+        RETURNS
+        ---------------
+        times, current, voltage, sampleT, targetT (float, array)
+    '''
+    rng = np.random.default_rng() if rng is None else rng
+    iMax = ic*(maxV/vc)**(1./n)
+    current = np.arange(0., iMax+iStep, iStep)
+    voltage = vc*(current/ic)**n + background[0]*current + background[1] + rng.normal(0., noise, current.size)
+    if reverse:
+        voltage *= -1
+    times = .8*np.arange(current.size)
+    sampleT = temperature + rng.normal(0., .01, current.size)
+    return times, current, voltage, sampleT, sampleT+.5
+
+def generateTV(tc, width=.5, v0=1e-5, current=1e-3, tStart=80., tStop=95., rampRate=1., background=0., noise=2e-8, reverse=False, rng=None):
+    '''
+        generateTV simulates the points of a Tc measurement, a temperature ramp at fixed current through an error function
+        transition (hts_fitfunctions.modified_erf) to the normal state.
+
+        INPUTS
+        ---------------
+        tc (float)         - critical temperature in K, center of the transition
+        width (float)      - width of the transition in K
+        v0 (float)         - voltage in the normal state at tc in V
+        rampRate (float)   - temperature ramp rate in K/min
+        background (float) - voltage offset in V
+
+        RETURNS
+        ---------------
+        times, current, voltage, sampleT, targetT (float, array)
+    '''
+    rng = np.random.default_rng() if rng is None else rng
+    sampleT = np.arange(tStart, tStop, rampRate/60.*1.7) # one point every 1.7 s, a current reversal pair
+    voltage = .5*v0*sampleT*(erf((sampleT-tc)/width)+1)/tc + background + rng.normal(0., noise, sampleT.size)
+    if reverse:
+        voltage *= -1
+    times = 1.7*np.arange(sampleT.size)
+    return times, np.full(sampleT.size, current), voltage, sampleT+rng.normal(0., .01, sampleT.size), sampleT+.3
+
+def generateCorpus(folder, count=1000, seed=0, reverseFraction=.2):
+    '''
+        generateCorpus writes count Ic and count Tc files with random parameters in folder/Ic and folder/Tc.
+
+        INPUTS
+        ---------------
+        folder (str)            - output folder
+        count (int)             - number of files of each measurement
+        seed (int)              - seed of the random generator, the corpus is reproducible
+        reverseFraction (float) - fraction of the files measured in reverse bias
+
+        RETURNS
+        ---------------
+        manifest (pandas.DataFrame) - file path and true parameters of each file, also written to folder/manifest.csv
+    '''
+    rng, rows = np.random.default_rng(seed), []
+    start = datetime.datetime(2026, 1, 1)
+    for measurement in ('Ic', 'Tc'):
+        os.makedirs(os.path.join(folder, measurement), exist_ok=True)
+
+    for k in range(count):
+        t0 = start + datetime.timedelta(minutes=10*k, microseconds=int(rng.integers(1e6)))
+        ic, n, temperature = rng.uniform(20., 150.), rng.uniform(15., 45.), rng.uniform(20., 80.)
+        slope, offset, noise, reverse = rng.normal(0., 2e-9), rng.normal(0., 1e-7), rng.uniform(1e-8, 8e-8), rng.random() < reverseFraction
+        data = generateIV(ic, n, iStep=ic/rng.uniform(60., 200.), background=(slope, offset), noise=noise, reverse=reverse, temperature=temperature, rng=rng)
+        fpath = os.path.join(folder, 'Ic', getFileName('Ic', t0, 'synthetic'))
+        writeMeasurementFile(fpath, '# Ic = {:4.2f} A, n = {:4.2f} , Tavg = {:4.2f} K, synthetic'.format(ic, n, temperature), t0, *data)
+        rows.append({'fpath': fpath, 'measurement': 'Ic', 'ic': ic, 'n': n, 'tc': np.nan, 'temperature': temperature, 'slope': slope, 'offset': offset, 'noise': noise, 'reverse': reverse})
+
+        t0 = t0 + datetime.timedelta(minutes=5)
+        tc, width, v0 = rng.uniform(84., 92.), rng.uniform(.2, 1.), rng.uniform(5e-6, 3e-5)
+        offset, noise, reverse = rng.normal(0., 1e-7), rng.uniform(5e-9, 5e-8), rng.random() < reverseFraction
+        data = generateTV(tc, width=width, v0=v0, background=offset, noise=noise, reverse=reverse, rng=rng)
+        fpath = os.path.join(folder, 'Tc', getFileName('Tc', t0, 'synthetic'))
+        writeMeasurementFile(fpath, '# Tc = {:4.2f} K, synthetic'.format(tc), t0, *data)
+        rows.append({'fpath': fpath, 'measurement': 'Tc', 'ic': np.nan, 'n': np.nan, 'tc': tc, 'temperature': np.nan, 'slope': 0., 'offset': offset, 'noise': noise, 'reverse': reverse})
+
+    manifest = pd.DataFrame(rows)
+    manifest.to_csv(os.path.join(folder, 'manifest.csv'), index=False)
+    return manifest
+
+
+########################################################################################
+########################################################################################
+######################## BENCHMARK OF THE FITTING PATHS ################################
+########################################################################################
+########################################################################################
+
+
+def readColumns(fpath):
+    '''
+        readColumns returns the raw columns of a measurement, as the GUI holds them before a fit.
+    '''
+    times, current, voltage, sampleT = np.genfromtxt(fpath, usecols=[1, 2, 3, 4], unpack=True)
+    return times, current, voltage, sampleT
+
+def fitIcLinear(fpath, truth):
+    ic, n, current, voltage, chisq, pcov = hts.fitIcMeasurement(fpath, function='linear')
+    return {'ic': ic, 'n': n}
+
+def fitIcPowerLaw(fpath, truth):
+    ic, n, current, voltage, chisq, pcov = hts.fitIcMeasurement(fpath, function='powerLaw')
+    return {'ic': ic, 'n': n}
+
+def fitCorrectBackground(fpath, truth):
+    # seeded like readIV: ic and n are first estimated by a linear fit in logspace, never from the truth
+    vc = .2e-6
+    logdata = hts.readIV(fpath, logIV=True, vc=vc, vThreshold=None)
+    popt, pcov, chisq = hts.fitIV(logdata.current, logdata.voltage, vc=vc, function='linear')
+    ic, n = vc**(1./popt[0])/np.exp(popt[1]/popt[0]), popt[0]
+
+    data = hts.readIV(fpath, logIV=False, vThreshold=None)
+    voltage = hts.correctBackground(data.current.values, data.voltage.values.copy(), vc=vc, ic=ic, n=n)
+    popt, pcov, chisq = hts.fitIV(data.current.values, voltage, vc=vc, function='powerLaw', p0=[ic, n])
+    return {'ic': popt[0], 'n': popt[1]}
+
+def fitIVGUI(fpath, truth):
+    times, current, voltage, sampleT = readColumns(fpath)
+    ic, n, voltage = fittingFunctions.fitIV(current, voltage)
+    return {'ic': ic, 'n': n}
+
+def fitTcDerivative(fpath, truth):
+    return {'tc': hts.fitTcMeasurement(fpath)}
+
+def fitTVErf(fpath, truth):
+    data = hts.readTV(fpath)
+    Tr, Tc, Ts, popt = hts.fitTV(data.sampleT.values, data.voltage.values.copy())
+    return {'tc': Tc}
+
+FITTING_PATHS = { # name: (measurement, function of the file path and the true parameters returning the fitted ones)
+    'hts_fitting.fitIcMeasurement(linear)': ('Ic', fitIcLinear),
+    'hts_fitting.fitIcMeasurement(powerLaw)': ('Ic', fitIcPowerLaw),
+    'hts_fitting.correctBackground': ('Ic', fitCorrectBackground),
+    'fittingFunctions.fitIV': ('Ic', fitIVGUI),
+    'hts_fitting.fitTcMeasurement': ('Tc', fitTcDerivative),
+    'hts_fitting.fitTV': ('Tc', fitTVErf),
+}
+
+def summarizeErrors(fitted, true):
+    fitted, true = np.asarray(fitted, dtype=float), np.asarray(true, dtype=float)
+    valid = np.isfinite(fitted)
+    error = fitted[valid]-true[valid]
+    if not error.size:
+        return {'bias': np.nan, 'mae': np.nan, 'p90': np.nan, 'max': np.nan}
+    return {'bias': float(np.mean(error)), 'mae': float(np.mean(np.abs(error))), 'p90': float(np.percentile(np.abs(error), 90)), 'max': float(np.max(np.abs(error)))}
+
+def benchmarkPath(name, manifest, vb=False):
+    '''
+        benchmarkPath times one fitting path on the files of its measurement and compares the fits with the truth.
+
+        RETURNS
+        ---------------
+        result (dict) - files, seconds, files per second, failures (exception or NaN) and the error of each parameter
+    '''
+    measurement, function = FITTING_PATHS[name]
+    files = manifest[manifest.measurement == measurement]
+    fits, failures, elapsed = [], 0, 0.
+    for truth in files.itertuples():
+        start = time.perf_counter()
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                fit = function(truth.fpath, truth)
+        except Exception as e:
+            if vb: print(name, truth.fpath, e)
+            fit = {}
+        elapsed += time.perf_counter()-start
+        if (not fit) or (not np.all(np.isfinite(list(fit.values())))):
+            failures += 1
+        fits.append(fit)
+
+    result = {'files': len(files), 'seconds': elapsed, 'filesPerSecond': len(files)/elapsed if elapsed > 0 else np.nan, 'failures': failures}
+    for parameter in ('ic', 'n', 'tc'):
+        if any([parameter in fit for fit in fits]):
+            fitted = [fit.get(parameter, np.nan) for fit in fits]
+            result[parameter] = summarizeErrors(fitted, getattr(files, parameter).values)
+            if parameter == 'ic':
+                result['ic_relative'] = summarizeErrors(np.array(fitted, dtype=float)/files.ic.values, np.ones(len(files)))
+    return result
+
+def benchmarkGetIcT(manifest):
+    fpaths = list(manifest[manifest.measurement == 'Ic'].fpath)
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        hts.getIcT(fpaths)
+    elapsed = time.perf_counter()-start
+    return {'files': len(fpaths), 'seconds': elapsed, 'filesPerSecond': len(fpaths)/elapsed if elapsed > 0 else np.nan}
+
+def benchmarkFitting(folder, paths=None, output=None, vb=False):
+    '''
+        benchmarkFitting runs the fitting paths on a corpus written by generateCorpus.
+
+        INPUTS
+        ---------------
+        folder (str) - corpus folder, holding manifest.csv
+        paths (list) - keys of FITTING_PATHS to run, all of them and getIcT if None
+        output (str) - JSON file of the results, not written if None
+
+        RETURNS
+        ---------------
+        results (pandas.DataFrame) - one row per fitting path
+    '''
+    manifest = pd.read_csv(os.path.join(folder, 'manifest.csv'))
+    results = {}
+    for name in (paths if paths is not None else FITTING_PATHS):
+        results[name] = benchmarkPath(name, manifest, vb=vb)
+        if vb: print(name, results[name])
+    if paths is None:
+        results['hts_fitting.getIcT'] = benchmarkGetIcT(manifest)
+
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump({'date': str(datetime.datetime.now()), 'corpus': os.path.abspath(folder), 'paths': results}, f, indent=2, default=float)
+
+    table = pd.DataFrame({name: {'files/s': result['filesPerSecond'], 'failures': result.get('failures', np.nan),
+                                 'ic MAE [%]': 100*result['ic_relative']['mae'] if 'ic_relative' in result else np.nan,
+                                 'n MAE': result['n']['mae'] if 'n' in result else np.nan,
+                                 'Tc MAE [K]': result['tc']['mae'] if 'tc' in result else np.nan} for name, result in results.items()}).T
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Ic and Tc fitting routines on a synthetic corpus')
+    parser.add_argument('folder', help='corpus folder, generated if it has no manifest.csv')
+    parser.add_argument('--count', type=int, default=1000, help='number of Ic and of Tc files to generate')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated corpus')
+    parser.add_argument('--output', default=None, help='JSON file of the results')
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.folder, 'manifest.csv')):
+        generateCorpus(args.folder, count=args.count, seed=args.seed)
+    with pd.option_context('display.width', 200, 'display.max_columns', 10):
+        print(benchmarkFitting(args.folder, output=args.output))
@@ -158,7 +158,7 @@ def aggregateIVs(fpaths):
 def readTV(fpath, fformat='mit', vb=False):
     try:
         cols, names = [1, 3, 4, 5], ['time', 'voltage', 'sampleT', 'targetT']
-        data = pd.read_csv(fpath, usecols=cols, skiprows=2, delim_whitespace=True, names=names)
+        data = pd.read_csv(fpath, usecols=cols, skiprows=2, sep=r'\s+', names=names)
         if data.voltage[data.voltage.abs().argmax()] < 0:
             if vb: print('Sample has been reverse biased: Voltage multiplied by -1')
             data['voltage'] *= -1